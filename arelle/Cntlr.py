@@ -554,6 +554,11 @@ class LogHandlerWithXml(logging.Handler):
     def __init__(self):
         super(LogHandlerWithXml, self).__init__()
         
+    def bufferRecord(self, logRecord):
+        if hasattr(logRecord, "resolveArguments"): # resolve ModelXbrl message arguments while model objects are loaded
+            logRecord.resolveArguments()
+        self.logRecordBuffer.append(logRecord)
+        
     def recordToXml(self, logRec):
         def entityEncode(arg):  # be sure it's a string, vs int, etc, and encode &, <, ".
             return str(arg).replace("&","&amp;").replace("<","&lt;").replace('"','&quot;')
@@ -620,7 +625,7 @@ class LogToXmlHandler(LogHandlerWithXml):
                     fh.write(self.recordToXml(logRec))
                 fh.write('</log>\n')  
     def emit(self, logRecord):
-        self.logRecordBuffer.append(logRecord)
+        self.bufferRecord(logRecord)
 
 class LogToBufferHandler(LogHandlerWithXml):
     """
@@ -654,6 +659,13 @@ class LogToBufferHandler(LogHandlerWithXml):
         
         :returns: str -- json representation of messages in the log buffer
         """
+        return json.dumps( {"log": self.getJsonEntries()} )
+    
+    def getJsonEntries(self):
+        """Returns a list of JSON-serializable dicts representing the messages in the log buffer, and clears the buffer.
+        
+        :returns: [dict] -- code, level, refs and message of each log buffer entry
+        """
         entries = []
         for logRec in self.logRecordBuffer:
             message = { "text": self.format(logRec) }
@@ -666,7 +678,7 @@ class LogToBufferHandler(LogHandlerWithXml):
                      "message": message}
             entries.append(entry)
         self.logRecordBuffer = []
-        return json.dumps( {"log": entries} )
+        return entries
     
     def getLines(self):
         """Returns a list of the message strings in the log buffer, and clears the buffer.
@@ -687,5 +699,5 @@ class LogToBufferHandler(LogHandlerWithXml):
         return separator.join(self.getLines())
     
     def emit(self, logRecord):
-        self.logRecordBuffer.append(logRecord)
+        self.bufferRecord(logRecord)
 
@@ -0,0 +1,152 @@
+'''
+Created on Oct 16, 2013
+
+Batch mode of the command line controller, validating (or otherwise processing per the command line options)
+a list of entry points, such as a day's EDGAR filings, spread over a pool of worker processes.
+
+Each worker process has its own CntlrCmdLine, loads plug-ins and packages once, and keeps its base
+taxonomies warm between filings (by its modelManager's DtsCache).  The result and log of each filing
+are written as one JSON object per line to the batch output, in order of completion.
+
+The batch list may be:
+   an RSS feed (such as an EDGAR monthly XBRL feed), each item's instance (in its zip enclosure when provided),
+   a JSON list of entry points (strings, or objects with a "file" member), or
+   a text file of one entry point per line (blank lines and lines starting with # are ignored).
+
+@author: Mark V Systems Limited
+(c) Copyright 2013 Mark V Systems Limited, All rights reserved.
+'''
+import os, sys, io, json, time, multiprocessing, traceback
+from lxml import etree
+from arelle.UrlUtil import isHttpUrl
+
+edgr = "http://www.sec.gov/Archives/edgar"
+
+def batchEntryPoints(cntlr, batchFile):
+    """Entry points listed by the batch file (RSS feed, JSON list or lines of text).
+
+    :returns: [str] -- entry point files or urls
+    """
+    if isHttpUrl(batchFile):
+        filepath = cntlr.webCache.getfilename(batchFile, reload=True)
+    else:
+        filepath = batchFile
+    with open(filepath, "rb") as fh:
+        content = fh.read()
+    batchDir = os.path.dirname(batchFile) if not isHttpUrl(batchFile) else batchFile.rpartition("/")[0]
+    entryPoints = []
+    if content.lstrip().startswith(b"<"):
+        for itemElt in etree.parse(io.BytesIO(content)).iter("item"):
+            instUrl = None
+            for fileElt in itemElt.iter("{%s}xbrlFile" % edgr):
+                if (fileElt.get("{%s}type" % edgr) or "").endswith(".INS"):
+                    instUrl = fileElt.get("{%s}url" % edgr)
+                    break
+            if instUrl:
+                enclosureElt = itemElt.find("enclosure")
+                if enclosureElt is not None and enclosureElt.get("url"):
+                    instUrl = enclosureElt.get("url") + "/" + instUrl.rpartition("/")[2]
+                entryPoints.append(instUrl)
+    elif content.lstrip().startswith(b"["):
+        for entry in json.loads(content.decode("utf-8")):
+            entryPoints.append(entry.get("file") if isinstance(entry, dict) else entry)
+    else:
+        for line in content.decode("utf-8").splitlines():
+            line = line.strip()
+            if line and not line.startswith("#"):
+                entryPoints.append(line)
+    # relative entries are relative to the batch file
+    return [entryPoint if isHttpUrl(entryPoint) or os.path.isabs(entryPoint)
+            else os.path.join(batchDir, entryPoint) if not isHttpUrl(batchDir)
+            else batchDir + "/" + entryPoint
+            for entryPoint in entryPoints
+            if entryPoint]
+
+def runBatch(cntlr, options):
+    """Processes the entry points of options.batchFile, per the other command line options, in worker processes.
+
+    :returns: bool -- True if all entry points were processed successfully
+    """
+    startedAt = time.time()
+    try:
+        entryPoints = batchEntryPoints(cntlr, options.batchFile)
+    except (EnvironmentError, ValueError, etree.LxmlError) as err:
+        cntlr.addToLog(_("Unable to read batch file: {0}").format(err), messageCode="error", file=options.batchFile)
+        return False
+    numWorkers = min(options.batchWorkers or multiprocessing.cpu_count(), max(len(entryPoints), 1))
+    cntlr.addToLog(_("Batch of {0} entry points, {1} workers").format(len(entryPoints), numWorkers),
+                   messageCode="info", file=options.batchFile)
+    optionValues = dict((name, value) for name, value in vars(options).items() if not name.startswith("_"))
+    optionValues["batchFile"] = None
+    if options.batchOutputFile and options.batchOutputFile != "-":
+        output = io.open(options.batchOutputFile, "wt", encoding="utf-8")
+    else:
+        output = sys.stdout
+    numSuccessful = 0
+    pool = multiprocessing.Pool(numWorkers, initializer=initWorker, initargs=(optionValues,))
+    try:
+        for result in pool.imap_unordered(runEntryPoint, enumerate(entryPoints), 1):
+            if result["success"]:
+                numSuccessful += 1
+            output.write(json.dumps(result, default=str) + "\n")
+            output.flush()
+        pool.close()
+    except KeyboardInterrupt:
+        pool.terminate()
+        raise
+    finally:
+        pool.join()
+        if output is not sys.stdout:
+            output.close()
+    elapsed = time.time() - startedAt
+    cntlr.addToLog(_("Batch completed {0} of {1} entry points successfully in {2:.2f} secs ({3:.2f} per sec)").format(
+                   numSuccessful, len(entryPoints), elapsed, len(entryPoints) / elapsed if elapsed else 0),
+                   messageCode="info", file=options.batchFile)
+    return numSuccessful == len(entryPoints)
+
+class Options():
+    """Class to emulate options needed by CntlrCmdLine.run, from option values sent to a worker"""
+    def __init__(self, optionValues):
+        for option, value in optionValues.items():
+            setattr(self, option, value)
+
+cntlr = None # worker process controller
+filingOptionValues = None # options for each entry point, without one-time setup options
+
+def initWorker(optionValues):
+    global cntlr, filingOptionValues
+    import logging
+    from arelle.CntlrCmdLine import CntlrCmdLine
+    from arelle.DtsCache import DtsCache
+    logger = logging.getLogger("arelle")
+    for handler in logger.handlers[:]: # inherited from batch process when forked
+        logger.removeHandler(handler)
+    cntlr = CntlrCmdLine()
+    cntlr.startLogging(logFileName='logToBuffer')
+    cntlr.modelManager.dtsCache = DtsCache(cntlr.modelManager) # sized by dtsCache options of each run
+    if optionValues.get("proxy") or optionValues.get("plugins") or optionValues.get("packages"):
+        # set up proxy, plug-ins and packages once per worker
+        cntlr.run(Options(dict(optionValues, entrypointFile=None)))
+        cntlr.logHandler.getLines() # discard setup messages
+    filingOptionValues = dict(optionValues, proxy=None, plugins=None, packages=None)
+
+def runEntryPoint(indexedEntryPoint):
+    index, entryPoint = indexedEntryPoint
+    startedAt = time.time()
+    try:
+        success = cntlr.run(Options(dict(filingOptionValues, entrypointFile=entryPoint)))
+    except Exception as err:
+        cntlr.addToLog(_("[Exception] Failed to complete request: \n{0} \n{1}").format(
+                    err,
+                    traceback.format_tb(sys.exc_info()[2])))
+        success = False
+    log = cntlr.logHandler.getJsonEntries()
+    levels = [entry["level"] for entry in log]
+    return {"index": index,
+            "file": entryPoint,
+            "success": bool(success),
+            "errors": sum(1 for level in levels if "error" in level),
+            "warnings": sum(1 for level in levels if "warning" in level or "inconsistency" in level),
+            "time": round(time.time() - startedAt, 3),
+            "worker": os.getpid(),
+            "log": log}
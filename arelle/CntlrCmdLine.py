@@ -15,7 +15,7 @@ from arelle import (Cntlr, FileSource, ModelDocument, XmlUtil, Version,
                     ViewFileDTS, ViewFileFactList, ViewFileFactTable, ViewFileConcepts, 
                     ViewFileFormulae, ViewFileRelationshipSet, ViewFileTests, ViewFileRssFeed,
                     ViewFileRoleTypes,
-                    ModelManager)
+                    ModelManager, Tracing)
 from arelle.ModelValue import qname
 from arelle.Locale import format_string
 from arelle.ModelFormulaObject import FormulaOptions
@@ -99,6 +99,10 @@ def parseAndRun(args):
                              " select disclosure system validation.  "
                              "Enter --disclosureSystem=help for list of names or help-verbose for list of names and descriptions. "))
     parser.add_option("--disclosuresystem", action="store", dest="disclosureSystemName", help=SUPPRESS_HELP)
+    parser.add_option("--textBlockParallel", type="int", dest="textBlockParallel",
+                      help=_("Specify number of worker processes to parse and validate the html of text block facts concurrently, "
+                             "for disclosure system validation (on platforms which fork processes, text blocks are validated serially if not specified)."))
+    parser.add_option("--textblockparallel", type="int", dest="textBlockParallel", help=SUPPRESS_HELP)
     parser.add_option("--hmrc", action="store_true", dest="validateHMRC",
                       help=_("Select U.K. HMRC disclosure system validation."))
     parser.add_option("--utr", action="store_true", dest="utrValidate",
@@ -150,12 +154,27 @@ def parseAndRun(args):
     parser.add_option("--testReportCols", action="store", dest="testReportCols",
                       help=_("Columns for test report file"))
     parser.add_option("--testreportcols", action="store", dest="testReportCols", help=SUPPRESS_HELP)
+    parser.add_option("--testReportJUnit", action="store", dest="testReportJUnit",
+                      help=_("Write test report of testcase variation results as JUnit XML into FILE"))
+    parser.add_option("--testreportjunit", action="store", dest="testReportJUnit", help=SUPPRESS_HELP)
+    parser.add_option("--testcaseParallel", type="int", dest="testcaseParallel",
+                      help=_("Specify number of worker processes to validate the testcases of a testcases index concurrently "
+                             "(on platforms which fork processes, testcases are validated serially if not specified)."))
+    parser.add_option("--testcaseparallel", type="int", dest="testcaseParallel", help=SUPPRESS_HELP)
     parser.add_option("--rssReport", action="store", dest="rssReport",
                       help=_("Write RSS report into FILE"))
     parser.add_option("--rssreport", action="store", dest="rssReport", help=SUPPRESS_HELP)
     parser.add_option("--rssReportCols", action="store", dest="rssReportCols",
                       help=_("Columns for RSS report file"))
     parser.add_option("--rssreportcols", action="store", dest="rssReportCols", help=SUPPRESS_HELP)
+    parser.add_option("--rssParallel", type="int", dest="rssParallel",
+                      help=_("Specify number of worker processes to load and validate RSS feed items concurrently "
+                             "(on platforms which fork processes, items are processed serially if not specified)."))
+    parser.add_option("--rssparallel", type="int", dest="rssParallel", help=SUPPRESS_HELP)
+    parser.add_option("--rssPrefetch", type="int", dest="rssPrefetch",
+                      help=_("Specify number of RSS feed items whose zipped filings are retrieved ahead of their processing, "
+                             "0 to not retrieve ahead (default is one per worker process)."))
+    parser.add_option("--rssprefetch", type="int", dest="rssPrefetch", help=SUPPRESS_HELP)
     parser.add_option("--logFile", action="store", dest="logFile",
                       help=_("Write log messages into file, otherwise they go to standard output.  " 
                              "If file ends in .xml it is xml-formatted, otherwise it is text. "))
@@ -202,6 +221,10 @@ def parseAndRun(args):
     parser.add_option("--formulaVarExpressionResult", action="store_true", dest="formulaVarExpressionResult", help=_("Specify formula tracing."))
     parser.add_option("--formulaVarFilterWinnowing", action="store_true", dest="formulaVarFilterWinnowing", help=_("Specify formula tracing."))
     parser.add_option("--formulaVarFiltersResult", action="store_true", dest="formulaVarFiltersResult", help=_("Specify formula tracing."))
+    parser.add_option("--formulaParallel", type="int", dest="formulaParallel", 
+                      help=_("Specify number of worker processes to evaluate independent assertions concurrently "
+                             "(on platforms which fork processes, assertions are evaluated serially if not specified)."))
+    parser.add_option("--formulaparallel", type="int", dest="formulaParallel", help=SUPPRESS_HELP)
     parser.add_option("--uiLang", action="store", dest="uiLang",
                       help=_("Language for user interface (override system settings, such as program messages).  Does not save setting."))
     parser.add_option("--uilang", action="store", dest="uiLang", help=SUPPRESS_HELP)
@@ -217,6 +240,11 @@ def parseAndRun(args):
     parser.add_option("--internetTimeout", type="int", dest="internetTimeout", 
                       help=_("Specify internet connection timeout in seconds (0 means unlimited)."))
     parser.add_option("--internettimeout", type="int", action="store", dest="internetTimeout", help=SUPPRESS_HELP)
+    parser.add_option("--internetPrefetch", type="int", dest="internetPrefetch", 
+                      help=_("Specify the number of concurrent downloads of web documents found by DTS discovery "
+                             "(default 8, at most 4 from any one host), so that they are cached before they are loaded "
+                             "(0 to download each document only when it is loaded)."))
+    parser.add_option("--internetprefetch", type="int", action="store", dest="internetPrefetch", help=SUPPRESS_HELP)
     parser.add_option("--xdgConfigHome", action="store", dest="xdgConfigHome", 
                       help=_("Specify non-standard location for configuration and cache files (overrides environment parameter XDG_CONFIG_HOME)."))
     parser.add_option("--plugins", action="store", dest="plugins",
@@ -241,11 +269,54 @@ def parseAndRun(args):
                              "If + is omitted from package file nothing is saved (same as temp).  " ))
     parser.add_option("--abortOnMajorError", action="store_true", dest="abortOnMajorError", help=_("Abort process on major error, such as when load is unable to find an entry or discovered file."))
     parser.add_option("--collectProfileStats", action="store_true", dest="collectProfileStats", help=_("Collect profile statistics, such as timing of validation activities and formulae."))
+    parser.add_option("--dtsCache", type="int", dest="dtsCacheSize", 
+                      help=_("Keep up to this number of discovered base taxonomies (such as us-gaap or ifrs) loaded in memory, "
+                             "so that subsequent loads in this process (such as web server requests, RSS feed items or testcase variations) "
+                             "only load the filing's own extension documents."))
+    parser.add_option("--dtscache", type="int", dest="dtsCacheSize", help=SUPPRESS_HELP)
+    parser.add_option("--dtsCacheMemory", type="int", dest="dtsCacheMemory", 
+                      help=_("Limit memory (in MB) of base taxonomies kept loaded by --dtsCache (or by the web server), "
+                             "least recently used base taxonomies are unloaded beyond this limit."))
+    parser.add_option("--dtscachememory", type="int", dest="dtsCacheMemory", help=SUPPRESS_HELP)
+    parser.add_option("--xpathProgCache", choices=("off", "clear", "show"), dest="xpathProgCache", 
+                      help=_("Parsed formula XPath expressions are cached between runs (in the user application directory), "
+                             "so that formula linkbases loaded again skip parsing their expressions.  "
+                             "Enter 'off' to not use the cache, 'clear' to empty it, "
+                             "or 'show' to report its size and use after processing."))
+    parser.add_option("--xpathprogcache", choices=("off", "clear", "show"), dest="xpathProgCache", help=SUPPRESS_HELP)
+    parser.add_option("--traceFile", dest="traceFile", 
+                      help=_("Trace spans of loading (and discovery of each document), validation phases, formula variable sets "
+                             "and database insertion, with their wall and cpu time and memory growth.  "
+                             "If the file name ends in .json the spans are saved as Chrome trace events (for chrome://tracing), "
+                             "otherwise as a summary table of spans totalled by name."))
+    parser.add_option("--tracefile", dest="traceFile", help=SUPPRESS_HELP)
+    parser.add_option("--batch", dest="batchFile",
+                      help=_("Process a batch of entry points, instead of --file, per the other options (such as validation).  "
+                             "The batch file may be an RSS feed (such as an EDGAR XBRL feed), a JSON list of entry points, "
+                             "or a text file with one entry point (file, url or zip archive) per line.  "
+                             "Entry points are processed in worker processes, which keep base taxonomies loaded between filings."))
+    parser.add_option("--batchWorkers", type="int", dest="batchWorkers",
+                      help=_("Number of worker processes for --batch (default is the number of processors)."))
+    parser.add_option("--batchworkers", type="int", dest="batchWorkers", help=SUPPRESS_HELP)
+    parser.add_option("--batchOutput", dest="batchOutputFile",
+                      help=_("File to write --batch results, one JSON object per line for each entry point (with its log messages), "
+                             "in order of completion (default is standard output)."))
+    parser.add_option("--batchoutput", dest="batchOutputFile", help=SUPPRESS_HELP)
     if hasWebServer:
         parser.add_option("--webserver", action="store", dest="webserver",
                           help=_("start web server on host:port[:server] for REST and web access, e.g., --webserver locahost:8080, "
                                  "or specify nondefault a server name, such as cherrypy, --webserver locahost:8080:cherrypy. "
                                  "(It is possible to specify options to be defaults for the web server, such as disclosureSystem and validations, but not including file names.) "))
+        parser.add_option("--webserverWorkers", type="int", dest="webserverWorkers",
+                          help=_("Number of worker processes for the web server to process REST requests concurrently, "
+                                 "each worker having its own controller and log buffer.  "
+                                 "If omitted, requests are processed one at a time in the web server process."))
+        parser.add_option("--webserverworkers", type="int", dest="webserverWorkers", help=SUPPRESS_HELP)
+        parser.add_option("--webserverQueue", type="int", dest="webserverQueue",
+                          help=_("Number of requests which may wait for a web server worker, when all workers are busy, "
+                                 "beyond which requests are refused with HTTP status 503 (Service Unavailable).  "
+                                 "Default is twice the number of workers."))
+        parser.add_option("--webserverqueue", type="int", dest="webserverQueue", help=SUPPRESS_HELP)
     pluginOptionsIndex = len(parser.option_list)
     for optionsExtender in pluginClassMethods("CntlrCmdLine.Options"):
         optionsExtender(parser)
@@ -306,7 +377,7 @@ def parseAndRun(args):
             print(text)
         except UnicodeEncodeError:
             print(text.encode("ascii", "replace").decode("ascii"))
-    elif len(leftoverArgs) != 0 or (options.entrypointFile is None and 
+    elif len(leftoverArgs) != 0 or (options.entrypointFile is None and options.batchFile is None and 
                                     ((not options.proxy) and (not options.plugins) and
                                      (not any(pluginOption for pluginOption in parser.option_list[pluginOptionsIndex:pluginLastOptionIndex])) and
                                      (not hasWebServer or options.webserver is None))):
@@ -323,6 +394,24 @@ def parseAndRun(args):
             cntlr.startLogging(logFileName='logToBuffer')
             from arelle import CntlrWebMain
             CntlrWebMain.startWebserver(cntlr, options)
+    elif options.batchFile:
+        # batch file entry points processed by worker processes, view and output files incompatible
+        # (each entry point's run would write over the same file)
+        if any((options.entrypointFile, options.diffFile, options.versReportFile,
+                options.factsFile, options.factListCols, options.factTableFile,
+                options.conceptsFile, options.preFile, options.calFile, options.dimFile, options.formulaeFile, options.viewArcrole, options.viewFile,
+                options.roleTypesFile, options.arcroleTypesFile,
+                options.testReport, options.testReportJUnit, options.rssReport, options.traceFile
+                )):
+            parser.error(_("incorrect arguments with --batch, please try\n  python CntlrCmdLine.py --help"))
+        else:
+            # batch progress messages on standard error when results are on standard output
+            cntlr.startLogging(logFileName=(options.logFile or 
+                                            ("logToPrint" if options.batchOutputFile not in (None, "-") else "logToStdErr")),
+                               logFormat=(options.logFormat or "[%(messageCode)s] %(message)s - %(file)s"),
+                               logLevel=(options.logLevel or "DEBUG"))
+            from arelle import CntlrBatch
+            CntlrBatch.runBatch(cntlr, options)
     else:
         # parse and run the FILENAME
         cntlr.startLogging(logFileName=(options.logFile or "logToPrint"),
@@ -532,215 +621,257 @@ class CntlrCmdLine(Cntlr.Cntlr):
             self.modelManager.validateUtr = True
         if options.infosetValidate:
             self.modelManager.validateInfoset = True
+        if getattr(options, "textBlockParallel", None):
+            self.modelManager.validateTextBlockWorkers = options.textBlockParallel
+        if getattr(options, "testcaseParallel", None):
+            self.modelManager.validateTestcaseWorkers = options.testcaseParallel
+        if getattr(options, "rssParallel", None):
+            self.modelManager.validateRssWorkers = options.rssParallel
+        if getattr(options, "rssPrefetch", None) is not None:
+            self.modelManager.rssPrefetchFilings = options.rssPrefetch
         if options.abortOnMajorError:
             self.modelManager.abortOnMajorError = True
         if options.collectProfileStats:
             self.modelManager.collectProfileStats = True
-        if options.internetConnectivity == "offline":
-            self.webCache.workOffline = True
-        elif options.internetConnectivity == "online":
-            self.webCache.workOffline = False
-        if options.internetTimeout is not None:
-            self.webCache.timeout = (options.internetTimeout or None)  # use None if zero specified to disable timeout
-        fo = FormulaOptions()
-        if options.parameters:
-            parameterSeparator = (options.parameterSeparator or ',')
-            fo.parameterValues = dict(((qname(key, noPrefixIsNoNamespace=True),(None,value)) 
-                                       for param in options.parameters.split(parameterSeparator) 
-                                       for key,sep,value in (param.partition('='),) ) )   
-        if options.formulaParamExprResult:
-            fo.traceParameterExpressionResult = True
-        if options.formulaParamInputValue:
-            fo.traceParameterInputValue = True
-        if options.formulaCallExprSource:
-            fo.traceCallExpressionSource = True
-        if options.formulaCallExprCode:
-            fo.traceCallExpressionCode = True
-        if options.formulaCallExprEval:
-            fo.traceCallExpressionEvaluation = True
-        if options.formulaCallExprResult:
-            fo.traceCallExpressionResult = True
-        if options.formulaVarSetExprEval:
-            fo.traceVariableSetExpressionEvaluation = True
-        if options.formulaVarSetExprResult:
-            fo.traceVariableSetExpressionResult = True
-        if options.formulaAsserResultCounts:
-            fo.traceAssertionResultCounts = True
-        if options.formulaFormulaRules:
-            fo.traceFormulaRules = True
-        if options.formulaVarsOrder:
-            fo.traceVariablesOrder = True
-        if options.formulaVarExpressionSource:
-            fo.traceVariableExpressionSource = True
-        if options.formulaVarExpressionCode:
-            fo.traceVariableExpressionCode = True
-        if options.formulaVarExpressionEvaluation:
-            fo.traceVariableExpressionEvaluation = True
-        if options.formulaVarExpressionResult:
-            fo.traceVariableExpressionResult = True
-        if options.timeVariableSetEvaluation:
-            fo.timeVariableSetEvaluation = True
-        if options.formulaVarFilterWinnowing:
-            fo.traceVariableFilterWinnowing = True
-        if options.formulaVarFiltersResult:
-            fo.traceVariableFiltersResult = True
-        if options.formulaVarFiltersResult:
-            fo.traceVariableFiltersResult = True
-        self.modelManager.formulaOptions = fo
-        timeNow = XmlUtil.dateunionValue(datetime.datetime.now())
-        firstStartedAt = startedAt = time.time()
-        modelDiffReport = None
-        success = True
-        modelXbrl = None
+        if getattr(options, "traceFile", None):
+            Tracing.start(self)
         try:
-            if filesource:
-                modelXbrl = self.modelManager.load(filesource, _("views loading"))
-        except ModelDocument.LoadingException:
-            pass
-        except Exception as err:
-            self.addToLog(_("[Exception] Failed to complete request: \n{0} \n{1}").format(
-                        err,
-                        traceback.format_tb(sys.exc_info()[2])))
-            success = False    # loading errors, don't attempt to utilize loaded DTS
-        if modelXbrl and modelXbrl.modelDocument:
-            loadTime = time.time() - startedAt
-            modelXbrl.profileStat(_("load"), loadTime)
-            self.addToLog(format_string(self.modelManager.locale, 
-                                        _("loaded in %.2f secs at %s"), 
-                                        (loadTime, timeNow)), 
-                                        messageCode="info", file=self.entrypointFile)
-            if options.importFiles:
-                for importFile in options.importFiles.split("|"):
-                    fileName = importFile.strip()
-                    if sourceZipStream is not None and not (fileName.startswith('http://') or os.path.isabs(fileName)):
-                        fileName = os.path.dirname(modelXbrl.uri) + os.sep + fileName # make relative to sourceZipStream
-                    ModelDocument.load(modelXbrl, fileName)
-                    loadTime = time.time() - startedAt
-                    self.addToLog(format_string(self.modelManager.locale, 
-                                                _("import in %.2f secs at %s"), 
-                                                (loadTime, timeNow)), 
-                                                messageCode="info", file=importFile)
-                    modelXbrl.profileStat(_("import"), loadTime)
-                if modelXbrl.errors:
-                    success = False    # loading errors, don't attempt to utilize loaded DTS
-            if modelXbrl.modelDocument.type in ModelDocument.Type.TESTCASETYPES:
-                for pluginXbrlMethod in pluginClassMethods("Testcases.Start"):
-                    pluginXbrlMethod(self, options, modelXbrl)
-            else: # not a test case, probably instance or DTS
-                for pluginXbrlMethod in pluginClassMethods("CntlrCmdLine.Xbrl.Loaded"):
-                    pluginXbrlMethod(self, options, modelXbrl)
-        else:
-            success = False
-        if success and options.diffFile and options.versReportFile:
+            if getattr(options, "dtsCacheSize", None):
+                if self.modelManager.dtsCache is None:
+                    from arelle.DtsCache import DtsCache
+                    self.modelManager.dtsCache = DtsCache(self.modelManager)
+                self.modelManager.dtsCache.maxEntries = options.dtsCacheSize
+            if getattr(options, "dtsCacheMemory", None) and self.modelManager.dtsCache is not None:
+                self.modelManager.dtsCache.maxMemory = options.dtsCacheMemory
+            if getattr(options, "xpathProgCache", None) and self.modelManager.xpathProgCache is not None:
+                if options.xpathProgCache == "off":
+                    self.modelManager.xpathProgCache = None
+                elif options.xpathProgCache == "clear":
+                    self.modelManager.xpathProgCache.clear()
+                    self.addToLog(_("XPath program cache cleared."), messageCode="info")
+            if options.internetConnectivity == "offline":
+                self.webCache.workOffline = True
+            elif options.internetConnectivity == "online":
+                self.webCache.workOffline = False
+            if options.internetTimeout is not None:
+                self.webCache.timeout = (options.internetTimeout or None)  # use None if zero specified to disable timeout
+            if getattr(options, "internetPrefetch", None) is not None:
+                self.webCache.prefetchWorkers = options.internetPrefetch
+            fo = FormulaOptions()
+            if options.parameters:
+                parameterSeparator = (options.parameterSeparator or ',')
+                fo.parameterValues = dict(((qname(key, noPrefixIsNoNamespace=True),(None,value)) 
+                                           for param in options.parameters.split(parameterSeparator) 
+                                           for key,sep,value in (param.partition('='),) ) )   
+            if options.formulaParamExprResult:
+                fo.traceParameterExpressionResult = True
+            if options.formulaParamInputValue:
+                fo.traceParameterInputValue = True
+            if options.formulaCallExprSource:
+                fo.traceCallExpressionSource = True
+            if options.formulaCallExprCode:
+                fo.traceCallExpressionCode = True
+            if options.formulaCallExprEval:
+                fo.traceCallExpressionEvaluation = True
+            if options.formulaCallExprResult:
+                fo.traceCallExpressionResult = True
+            if options.formulaVarSetExprEval:
+                fo.traceVariableSetExpressionEvaluation = True
+            if options.formulaVarSetExprResult:
+                fo.traceVariableSetExpressionResult = True
+            if options.formulaAsserResultCounts:
+                fo.traceAssertionResultCounts = True
+            if options.formulaFormulaRules:
+                fo.traceFormulaRules = True
+            if options.formulaVarsOrder:
+                fo.traceVariablesOrder = True
+            if options.formulaVarExpressionSource:
+                fo.traceVariableExpressionSource = True
+            if options.formulaVarExpressionCode:
+                fo.traceVariableExpressionCode = True
+            if options.formulaVarExpressionEvaluation:
+                fo.traceVariableExpressionEvaluation = True
+            if options.formulaVarExpressionResult:
+                fo.traceVariableExpressionResult = True
+            if options.timeVariableSetEvaluation:
+                fo.timeVariableSetEvaluation = True
+            if options.formulaVarFilterWinnowing:
+                fo.traceVariableFilterWinnowing = True
+            if options.formulaVarFiltersResult:
+                fo.traceVariableFiltersResult = True
+            if options.formulaVarFiltersResult:
+                fo.traceVariableFiltersResult = True
+            if getattr(options, "formulaParallel", None):
+                fo.parallelWorkers = options.formulaParallel
+            self.modelManager.formulaOptions = fo
+            timeNow = XmlUtil.dateunionValue(datetime.datetime.now())
+            firstStartedAt = startedAt = time.time()
+            modelDiffReport = None
+            success = True
+            modelXbrl = None
             try:
-                diffFilesource = FileSource.FileSource(options.diffFile,self)
-                startedAt = time.time()
-                modelXbrl2 = self.modelManager.load(diffFilesource, _("views loading"))
-                if modelXbrl2.errors:
-                    if not options.keepOpen:
-                        modelXbrl2.close()
-                    success = False
-                else:
-                    loadTime = time.time() - startedAt
-                    modelXbrl.profileStat(_("load"), loadTime)
-                    self.addToLog(format_string(self.modelManager.locale, 
-                                                _("diff comparison DTS loaded in %.2f secs"), 
-                                                loadTime), 
-                                                messageCode="info", file=self.entrypointFile)
-                    startedAt = time.time()
-                    modelDiffReport = self.modelManager.compareDTSes(options.versReportFile)
-                    diffTime = time.time() - startedAt
-                    modelXbrl.profileStat(_("diff"), diffTime)
-                    self.addToLog(format_string(self.modelManager.locale, 
-                                                _("compared in %.2f secs"), 
-                                                diffTime), 
-                                                messageCode="info", file=self.entrypointFile)
+                if filesource:
+                    modelXbrl = self.modelManager.load(filesource, _("views loading"))
             except ModelDocument.LoadingException:
-                success = False
+                pass
             except Exception as err:
-                success = False
-                self.addToLog(_("[Exception] Failed to doad diff file: \n{0} \n{1}").format(
+                self.addToLog(_("[Exception] Failed to complete request: \n{0} \n{1}").format(
                             err,
                             traceback.format_tb(sys.exc_info()[2])))
-        if success:
-            try:
-                modelXbrl = self.modelManager.modelXbrl
-                hasFormulae = modelXbrl.hasFormulae
-                if options.validate:
-                    startedAt = time.time()
-                    if options.formulaAction: # don't automatically run formulas
-                        modelXbrl.hasFormulae = False
-                    self.modelManager.validate()
-                    if options.formulaAction: # restore setting
-                        modelXbrl.hasFormulae = hasFormulae
-                    self.addToLog(format_string(self.modelManager.locale, 
-                                                _("validated in %.2f secs"), 
-                                                time.time() - startedAt),
-                                                messageCode="info", file=self.entrypointFile)
-                if options.formulaAction in ("validate", "run"):  # do nothing here if "none"
-                    from arelle import ValidateXbrlDimensions, ValidateFormula
+                success = False    # loading errors, don't attempt to utilize loaded DTS
+            if modelXbrl and modelXbrl.modelDocument:
+                loadTime = time.time() - startedAt
+                modelXbrl.profileStat(_("load"), loadTime)
+                self.addToLog(format_string(self.modelManager.locale, 
+                                            _("loaded in %.2f secs at %s"), 
+                                            (loadTime, timeNow)), 
+                                            messageCode="info", file=self.entrypointFile)
+                if options.importFiles:
+                    for importFile in options.importFiles.split("|"):
+                        fileName = importFile.strip()
+                        if sourceZipStream is not None and not (fileName.startswith('http://') or os.path.isabs(fileName)):
+                            fileName = os.path.dirname(modelXbrl.uri) + os.sep + fileName # make relative to sourceZipStream
+                        ModelDocument.load(modelXbrl, fileName)
+                        loadTime = time.time() - startedAt
+                        self.addToLog(format_string(self.modelManager.locale, 
+                                                    _("import in %.2f secs at %s"), 
+                                                    (loadTime, timeNow)), 
+                                                    messageCode="info", file=importFile)
+                        modelXbrl.profileStat(_("import"), loadTime)
+                    if modelXbrl.errors:
+                        success = False    # loading errors, don't attempt to utilize loaded DTS
+                if modelXbrl.modelDocument.type in ModelDocument.Type.TESTCASETYPES:
+                    for pluginXbrlMethod in pluginClassMethods("Testcases.Start"):
+                        pluginXbrlMethod(self, options, modelXbrl)
+                else: # not a test case, probably instance or DTS
+                    for pluginXbrlMethod in pluginClassMethods("CntlrCmdLine.Xbrl.Loaded"):
+                        pluginXbrlMethod(self, options, modelXbrl)
+            else:
+                success = False
+            if success and options.diffFile and options.versReportFile:
+                try:
+                    diffFilesource = FileSource.FileSource(options.diffFile,self)
                     startedAt = time.time()
-                    if not options.validate:
-                        ValidateXbrlDimensions.loadDimensionDefaults(modelXbrl)
-                    # setup fresh parameters from formula optoins
-                    modelXbrl.parameters = fo.typedParameters()
-                    ValidateFormula.validate(modelXbrl, compileOnly=(options.formulaAction != "run"))
-                    self.addToLog(format_string(self.modelManager.locale, 
-                                                _("formula validation and execution in %.2f secs")
-                                                if options.formulaAction == "run"
-                                                else _("formula validation only in %.2f secs"), 
-                                                time.time() - startedAt),
-                                                messageCode="info", file=self.entrypointFile)
+                    modelXbrl2 = self.modelManager.load(diffFilesource, _("views loading"))
+                    if modelXbrl2.errors:
+                        if not options.keepOpen:
+                            modelXbrl2.close()
+                        success = False
+                    else:
+                        loadTime = time.time() - startedAt
+                        modelXbrl.profileStat(_("load"), loadTime)
+                        self.addToLog(format_string(self.modelManager.locale, 
+                                                    _("diff comparison DTS loaded in %.2f secs"), 
+                                                    loadTime), 
+                                                    messageCode="info", file=self.entrypointFile)
+                        startedAt = time.time()
+                        modelDiffReport = self.modelManager.compareDTSes(options.versReportFile)
+                        diffTime = time.time() - startedAt
+                        modelXbrl.profileStat(_("diff"), diffTime)
+                        self.addToLog(format_string(self.modelManager.locale, 
+                                                    _("compared in %.2f secs"), 
+                                                    diffTime), 
+                                                    messageCode="info", file=self.entrypointFile)
+                except ModelDocument.LoadingException:
+                    success = False
+                except Exception as err:
+                    success = False
+                    self.addToLog(_("[Exception] Failed to doad diff file: \n{0} \n{1}").format(
+                                err,
+                                traceback.format_tb(sys.exc_info()[2])))
+            if success:
+                try:
+                    modelXbrl = self.modelManager.modelXbrl
+                    hasFormulae = modelXbrl.hasFormulae
+                    if options.validate:
+                        startedAt = time.time()
+                        if options.formulaAction: # don't automatically run formulas
+                            modelXbrl.hasFormulae = False
+                        self.modelManager.validate()
+                        if options.formulaAction: # restore setting
+                            modelXbrl.hasFormulae = hasFormulae
+                        self.addToLog(format_string(self.modelManager.locale, 
+                                                    _("validated in %.2f secs"), 
+                                                    time.time() - startedAt),
+                                                    messageCode="info", file=self.entrypointFile)
+                    if options.formulaAction in ("validate", "run"):  # do nothing here if "none"
+                        from arelle import ValidateXbrlDimensions, ValidateFormula
+                        startedAt = time.time()
+                        if not options.validate:
+                            ValidateXbrlDimensions.loadDimensionDefaults(modelXbrl)
+                        # setup fresh parameters from formula optoins
+                        modelXbrl.parameters = fo.typedParameters()
+                        ValidateFormula.validate(modelXbrl, compileOnly=(options.formulaAction != "run"))
+                        self.addToLog(format_string(self.modelManager.locale, 
+                                                    _("formula validation and execution in %.2f secs")
+                                                    if options.formulaAction == "run"
+                                                    else _("formula validation only in %.2f secs"), 
+                                                    time.time() - startedAt),
+                                                    messageCode="info", file=self.entrypointFile)
                     
 
-                if options.testReport:
-                    ViewFileTests.viewTests(self.modelManager.modelXbrl, options.testReport, options.testReportCols)
+                    if options.testReport:
+                        ViewFileTests.viewTests(self.modelManager.modelXbrl, options.testReport, options.testReportCols)
+                    if getattr(options, "testReportJUnit", None):
+                        ViewFileTests.viewTestsJUnit(self.modelManager.modelXbrl, options.testReportJUnit)
                     
-                if options.rssReport:
-                    ViewFileRssFeed.viewRssFeed(self.modelManager.modelXbrl, options.rssReport, options.rssReportCols)
+                    if options.rssReport:
+                        ViewFileRssFeed.viewRssFeed(self.modelManager.modelXbrl, options.rssReport, options.rssReportCols)
                     
-                if options.DTSFile:
-                    ViewFileDTS.viewDTS(modelXbrl, options.DTSFile)
-                if options.factsFile:
-                    ViewFileFactList.viewFacts(modelXbrl, options.factsFile, labelrole=options.labelRole, lang=options.labelLang, cols=options.factListCols)
-                if options.factTableFile:
-                    ViewFileFactTable.viewFacts(modelXbrl, options.factTableFile, labelrole=options.labelRole, lang=options.labelLang)
-                if options.conceptsFile:
-                    ViewFileConcepts.viewConcepts(modelXbrl, options.conceptsFile, labelrole=options.labelRole, lang=options.labelLang)
-                if options.preFile:
-                    ViewFileRelationshipSet.viewRelationshipSet(modelXbrl, options.preFile, "Presentation Linkbase", "http://www.xbrl.org/2003/arcrole/parent-child", labelrole=options.labelRole, lang=options.labelLang)
-                if options.calFile:
-                    ViewFileRelationshipSet.viewRelationshipSet(modelXbrl, options.calFile, "Calculation Linkbase", "http://www.xbrl.org/2003/arcrole/summation-item", labelrole=options.labelRole, lang=options.labelLang)
-                if options.dimFile:
-                    ViewFileRelationshipSet.viewRelationshipSet(modelXbrl, options.dimFile, "Dimensions", "XBRL-dimensions", labelrole=options.labelRole, lang=options.labelLang)
-                if options.formulaeFile:
-                    ViewFileFormulae.viewFormulae(modelXbrl, options.formulaeFile, "Formulae", lang=options.labelLang)
-                if options.viewArcrole and options.viewFile:
-                    ViewFileRelationshipSet.viewRelationshipSet(modelXbrl, options.viewFile, os.path.basename(options.viewArcrole), options.viewArcrole, labelrole=options.labelRole, lang=options.labelLang)
-                if options.roleTypesFile:
-                    ViewFileRoleTypes.viewRoleTypes(modelXbrl, options.roleTypesFile, "Role Types", isArcrole=False, lang=options.labelLang)
-                if options.arcroleTypesFile:
-                    ViewFileRoleTypes.viewRoleTypes(modelXbrl, options.arcroleTypesFile, "Arcrole Types", isArcrole=True, lang=options.labelLang)
-                for pluginXbrlMethod in pluginClassMethods("CntlrCmdLine.Xbrl.Run"):
-                    pluginXbrlMethod(self, options, modelXbrl)
+                    if options.DTSFile:
+                        ViewFileDTS.viewDTS(modelXbrl, options.DTSFile)
+                    if options.factsFile:
+                        ViewFileFactList.viewFacts(modelXbrl, options.factsFile, labelrole=options.labelRole, lang=options.labelLang, cols=options.factListCols)
+                    if options.factTableFile:
+                        ViewFileFactTable.viewFacts(modelXbrl, options.factTableFile, labelrole=options.labelRole, lang=options.labelLang)
+                    if options.conceptsFile:
+                        ViewFileConcepts.viewConcepts(modelXbrl, options.conceptsFile, labelrole=options.labelRole, lang=options.labelLang)
+                    if options.preFile:
+                        ViewFileRelationshipSet.viewRelationshipSet(modelXbrl, options.preFile, "Presentation Linkbase", "http://www.xbrl.org/2003/arcrole/parent-child", labelrole=options.labelRole, lang=options.labelLang)
+                    if options.calFile:
+                        ViewFileRelationshipSet.viewRelationshipSet(modelXbrl, options.calFile, "Calculation Linkbase", "http://www.xbrl.org/2003/arcrole/summation-item", labelrole=options.labelRole, lang=options.labelLang)
+                    if options.dimFile:
+                        ViewFileRelationshipSet.viewRelationshipSet(modelXbrl, options.dimFile, "Dimensions", "XBRL-dimensions", labelrole=options.labelRole, lang=options.labelLang)
+                    if options.formulaeFile:
+                        ViewFileFormulae.viewFormulae(modelXbrl, options.formulaeFile, "Formulae", lang=options.labelLang)
+                    if options.viewArcrole and options.viewFile:
+                        ViewFileRelationshipSet.viewRelationshipSet(modelXbrl, options.viewFile, os.path.basename(options.viewArcrole), options.viewArcrole, labelrole=options.labelRole, lang=options.labelLang)
+                    if options.roleTypesFile:
+                        ViewFileRoleTypes.viewRoleTypes(modelXbrl, options.roleTypesFile, "Role Types", isArcrole=False, lang=options.labelLang)
+                    if options.arcroleTypesFile:
+                        ViewFileRoleTypes.viewRoleTypes(modelXbrl, options.arcroleTypesFile, "Arcrole Types", isArcrole=True, lang=options.labelLang)
+                    for pluginXbrlMethod in pluginClassMethods("CntlrCmdLine.Xbrl.Run"):
+                        pluginXbrlMethod(self, options, modelXbrl)
                                         
-            except (IOError, EnvironmentError) as err:
-                self.addToLog(_("[IOError] Failed to save output:\n {0}").format(err))
-                success = False
-            except Exception as err:
-                self.addToLog(_("[Exception] Failed to complete request: \n{0} \n{1}").format(
-                            err,
-                            traceback.format_tb(sys.exc_info()[2])))
-                success = False
-        if modelXbrl:
-            modelXbrl.profileStat(_("total"), time.time() - firstStartedAt)
-            if options.collectProfileStats and modelXbrl:
-                modelXbrl.logProfileStats()
-            if not options.keepOpen:
-                if modelDiffReport:
-                    self.modelManager.close(modelDiffReport)
-                elif modelXbrl:
-                    self.modelManager.close(modelXbrl)
+                except (IOError, EnvironmentError) as err:
+                    self.addToLog(_("[IOError] Failed to save output:\n {0}").format(err))
+                    success = False
+                except Exception as err:
+                    self.addToLog(_("[Exception] Failed to complete request: \n{0} \n{1}").format(
+                                err,
+                                traceback.format_tb(sys.exc_info()[2])))
+                    success = False
+            if modelXbrl:
+                modelXbrl.profileStat(_("total"), time.time() - firstStartedAt)
+                if options.collectProfileStats and modelXbrl:
+                    modelXbrl.logProfileStats()
+                if not options.keepOpen:
+                    if modelDiffReport:
+                        self.modelManager.close(modelDiffReport)
+                    elif modelXbrl:
+                        self.modelManager.close(modelXbrl)
+            if getattr(options, "xpathProgCache", None) == "show" and self.modelManager.xpathProgCache is not None:
+                self.addToLog(_("XPath program cache has {programs} programs ({hits} reused and {misses} parsed by this run), "
+                                "file {cacheFile} of {fileSize} bytes.").format(**self.modelManager.xpathProgCache.stats),
+                              messageCode="info")
+        finally:
+            if getattr(options, "traceFile", None):
+                tracer = Tracing.stop() # spans of this run are not kept for later runs
+                if tracer is not None:
+                    try:
+                        tracer.save(options.traceFile)
+                    except (IOError, EnvironmentError) as err:
+                        self.addToLog(_("[IOError] Failed to save trace file {0}:\n {1}").format(options.traceFile, err))
         self.username = self.password = None #dereference password
         return success
 
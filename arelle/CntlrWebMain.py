@@ -12,13 +12,16 @@ from arelle import Version, XmlUtil
 from arelle.FileSource import FileNamedStringIO
 _os_pid = os.getpid()
 
+DEFAULT_DTS_CACHE_SIZE = 4 # base taxonomies kept loaded between web requests
+workerPool = None # CntlrWebWorkers.WorkerPool when --webserverWorkers specified
+
 def startWebserver(_cntlr, options):
     """Called once from main program in CmtlrCmdLine to initiate web server on specified local port.
        
     :param options: OptionParser options from parse_args of main argv arguments (the argument *webserver* provides hostname and port), port being used to startup the webserver on localhost.
     :type options: optparse.Values
     """
-    global imagesDir, cntlr, optionsPrototype
+    global imagesDir, cntlr, optionsPrototype, workerPool
     cntlr = _cntlr
     imagesDir = cntlr.imagesDir
     optionValuesTypes = _STR_NUM_TYPES + (type(None),)
@@ -26,12 +29,31 @@ def startWebserver(_cntlr, options):
                             for option in dir(options)
                             for value in (getattr(options, option),)
                             if isinstance(value,optionValuesTypes) and not option.startswith('_'))
+    numWorkers = getattr(options, "webserverWorkers", None)
+    if numWorkers and not cntlr.isGAE:
+        # validation and view requests are processed by worker processes, each with its own controller
+        from arelle.CntlrWebWorkers import WorkerPool
+        maxQueued = getattr(options, "webserverQueue", None)
+        workerPool = WorkerPool(numWorkers, maxQueued if maxQueued is not None else 2 * numWorkers, optionsPrototype)
+    elif cntlr.modelManager.dtsCache is None and not cntlr.isGAE:
+        # keep base taxonomies (and their compiled formulas) loaded between requests
+        from arelle.DtsCache import DtsCache
+        cntlr.modelManager.dtsCache = DtsCache(cntlr.modelManager,
+                                               maxEntries=getattr(options, "dtsCacheSize", None) or DEFAULT_DTS_CACHE_SIZE,
+                                               maxMemory=getattr(options, "dtsCacheMemory", None))
     host, sep, portServer = options.webserver.partition(":")
     port, sep, server = portServer.partition(":")
-    if server:
-        run(host=host, port=port or 80, server=server)
-    else:
-        run(host=host, port=port or 80)
+    try:
+        if server:
+            run(host=host, port=port or 80, server=server)
+        elif workerPool is not None:
+            from arelle.CntlrWebWorkers import ThreadingWSGIServer
+            run(host=host, port=port or 80, server_class=ThreadingWSGIServer)
+        else:
+            run(host=host, port=port or 80)
+    finally:
+        if workerPool is not None:
+            workerPool.close()
     
 @get('/rest/login')
 def login_form():
@@ -221,7 +243,20 @@ def runOptionsAndGetResult(options, media, viewFile, sourceZipStream=None):
     
     :returns: html, xml, csv, text -- Return per media type argument and request arguments
     """
-    successful = cntlr.run(options, sourceZipStream)
+    if workerPool is not None:
+        from arelle.CntlrWebWorkers import WorkerPoolBusy, WorkerEnded
+        try:
+            successful, result = workerPool.run(options, media, viewFile, sourceZipStream)
+        except WorkerPoolBusy as busy:
+            response.status = 503
+            response.set_header('Retry-After', str(busy.retryAfter))
+            return errorReport([repr(busy)], media)
+        except WorkerEnded as ended:
+            response.status = 500
+            return errorReport([repr(ended)], media)
+    else:
+        successful = cntlr.run(options, sourceZipStream)
+        result = getResult(cntlr, successful, media, viewFile)
     if media == "xml":
         response.content_type = 'text/xml; charset=UTF-8'
     elif media == "csv":
@@ -232,6 +267,14 @@ def runOptionsAndGetResult(options, media, viewFile, sourceZipStream=None):
         response.content_type = 'text/plain; charset=UTF-8'
     else:
         response.content_type = 'text/html; charset=UTF-8'
+    return result
+
+def getResult(cntlr, successful, media, viewFile):
+    """Result of a request run by cntlr (in this web server process or a worker process), from its view file if
+    successful, otherwise from its log buffer.
+    
+    :returns: html, xml, csv, text -- Return per media type argument
+    """
     if successful and viewFile:
         # defeat re-encoding
         result = viewFile.getvalue().replace("&nbsp;","\u00A0").replace("&shy;","\u00AD").replace("&amp;","&")
@@ -259,9 +302,22 @@ def diff():
     setattr(options, "diffFile", request.query.toDTS)
     fh = FileNamedStringIO(request.query.report)
     setattr(options, "versReportFile", fh)
-    cntlr.run(options)
-    reportContents = fh.getvalue()
-    fh.close()
+    if workerPool is not None:
+        from arelle.CntlrWebWorkers import WorkerPoolBusy, WorkerEnded
+        try:
+            successful, reportContents = workerPool.run(options, "xml", fh, rawView=True)
+            fh.close()
+        except WorkerPoolBusy as busy:
+            response.status = 503
+            response.set_header('Retry-After', str(busy.retryAfter))
+            return errorReport([repr(busy)])
+        except WorkerEnded as ended:
+            response.status = 500
+            return errorReport([repr(ended)])
+    else:
+        cntlr.run(options)
+        reportContents = fh.getvalue()
+        fh.close()
     response.content_type = 'text/xml; charset=UTF-8'
     return reportContents
 
@@ -273,6 +329,8 @@ def configure():
     """
     if not request.query.proxy and not request.query.plugins and not request.query.packages:
         return _("proxy, plugins or packages must be specified")
+    if workerPool is not None:
+        return errorReport([_("Configuration of web server worker processes is by the options starting the web server")], "html")
     options = Options()
     if request.query.proxy:
         setattr(options, "proxy", request.query.proxy)
@@ -284,6 +342,58 @@ def configure():
     response.content_type = 'text/html; charset=UTF-8'
     return htmlBody(tableRows(cntlr.logHandler.getLines(), header=_("Configuration Request")))
 
+@route('/rest/status')
+def status():
+    """Report web server status for *get* requests to */rest/status*: worker processes, queue depth and utilization.
+    
+    :param media: html (default), text or json
+    :returns: html, text or json -- Status of web server workers.
+    """
+    if workerPool is not None:
+        stats = workerPool.stats
+    else:
+        stats = {"workers": 0} # requests processed one at a time in the web server process
+    stats["memoryUsed"] = cntlr.memoryUsed
+    if request.query.media == "json":
+        import json
+        response.content_type = 'application/json; charset=UTF-8'
+        return json.dumps(stats, indent=1)
+    lines = ["{0}: {1}".format(name, stats[name]) for name in sorted(stats.keys())]
+    if request.query.media == "text":
+        response.content_type = 'text/plain; charset=UTF-8'
+        return '\n'.join(lines)
+    response.content_type = 'text/html; charset=UTF-8'
+    return htmlBody(tableRows(lines, header=_("Web Server Status")))
+
+@route('/rest/dtsCache')
+def dtsCache():
+    """Report status of base taxonomies kept loaded between requests for *get* requests to */rest/dtsCache*.
+    
+    :param clear: Unload all cached base taxonomies (those in use by requests are unloaded when their requests complete)
+    :param media: html (default), text or json
+    :returns: html, text or json -- Cached base taxonomies, hits, misses and memory used.
+    """
+    _dtsCache = cntlr.modelManager.dtsCache
+    if workerPool is not None:
+        return errorReport([_("DTS caches are kept by each web server worker process")], request.query.media or "html")
+    if _dtsCache is None:
+        return errorReport([_("DTS cache is not enabled")], request.query.media or "html")
+    if "clear" in request.query: # (request.query.clear would be the dict method)
+        _dtsCache.clear()
+    stats = _dtsCache.stats
+    if request.query.media == "json":
+        import json
+        response.content_type = 'application/json; charset=UTF-8'
+        stats["entryUrls"] = [list(key[0]) for key in _dtsCache.entries.keys()]
+        return json.dumps(stats, indent=1)
+    lines = ["{0}: {1}".format(name, stats[name]) for name in sorted(stats.keys())]
+    lines.extend(_("cached: {0}").format(", ".join(key[0])) for key in _dtsCache.entries.keys())
+    if request.query.media == "text":
+        response.content_type = 'text/plain; charset=UTF-8'
+        return '\n'.join(lines)
+    response.content_type = 'text/html; charset=UTF-8'
+    return htmlBody(tableRows(lines, header=_("DTS Cache")))
+
 @route('/rest/stopWebServer')
 def stopWebServer():
     """Stop the web server by *get* requests to */rest/stopWebServer*.
@@ -596,7 +706,7 @@ as follows:</td></tr>
 <tr><td style="text-indent: 1em;">fromDate, toDate</td><td>From &amp to dates for GL transactions</td></tr>
 
 <tr><th colspan="2">Management</th></tr>
-<tr><td>/rest/configure</td><td>Configure settings:</td></tr>
+<tr><td>/rest/configure</td><td>Configure settings (not available with web server worker processes, which are configured by the options starting the web server):</td></tr>
 <tr><td></td><td>Parameters are required following "?" character, and are separated by "&amp;" characters, 
 as follows:</td></tr>
 <tr><td style="text-indent: 1em;">proxy</td><td>Show or modify and re-save proxy settings:<br/>
@@ -613,6 +723,12 @@ Enter 'show' to view packages configuration, , or '|' separated package URLs:
 +url to add package by its full url or filename, ~name to reload a package by its name, -name to remove a package by its name. 
 (Note that packages are transient on Google App Engine, specify with &amp;packages to other rest commands.) 
 </td></tr>
+<tr><td>/rest/status</td><td>Show web server workers (command line option --webserverWorkers), busy workers, queued requests, 
+completed, failed and rejected requests and worker utilization.  When all workers are busy and the queue (--webserverQueue) is full, 
+requests are refused with http status 503 and a Retry-After header.  Parameter: <code>media</code> (html, text or json).</td></tr>
+<tr><td>/rest/dtsCache</td><td>Show base taxonomies kept loaded between requests, with hit, miss and memory counts 
+(sized by command line options --dtsCache and --dtsCacheMemory).  Parameters: 
+<code>media</code> (html, text or json) and <code>clear</code> to unload the cached base taxonomies.</td></tr>
 ''') +
 (_('''
 <tr><td>/rest/stopWebServer</td><td>Shut down (terminate process after 2.5 seconds delay).</td></tr>
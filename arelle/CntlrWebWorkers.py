@@ -0,0 +1,193 @@
+'''
+Created on Oct 15, 2013
+
+Pool of worker processes for the web server, so that REST requests (validation and views)
+are processed concurrently, each in a worker process with its own CntlrCmdLine and log buffer.
+
+The web server process queues each request to the pool and waits (in its request thread) for
+the worker's result.  When all workers are busy and the queue is full, requests are refused
+(HTTP 503 with a Retry-After estimate), so that one slow filing doesn't block every other request.
+A request whose worker process ends (such as when killed for lack of memory) fails (HTTP 500),
+the pool starting a new worker in its place.
+
+@author: Mark V Systems Limited
+(c) Copyright 2013 Mark V Systems Limited, All rights reserved.
+'''
+import io, os, sys, time, threading, logging, multiprocessing, traceback
+try:
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from SocketServer import ThreadingMixIn
+from wsgiref.simple_server import WSGIServer
+from arelle.FormulaScheduler import workerResult, WorkerProcessEnded
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    """wsgiref server handling each request in its own thread (to wait on workers concurrently)"""
+    daemon_threads = True
+
+class WorkerPoolBusy(Exception):
+    def __init__(self, retryAfter):
+        self.retryAfter = retryAfter
+    def __repr__(self):
+        return _("All web server workers are busy, retry after {0} seconds").format(self.retryAfter)
+
+class WorkerEnded(Exception):
+    def __repr__(self):
+        return _("The web server worker process ended while processing the request")
+
+class WorkerPool:
+    """
+    .. class:: WorkerPool(numWorkers, maxQueued, optionsPrototype)
+
+    Worker processes for web server requests.
+
+    :param numWorkers: Number of worker processes
+    :type numWorkers: int
+    :param maxQueued: Number of requests which may wait for a worker before requests are refused
+    :type maxQueued: int
+    :param optionsPrototype: Web server option values (such as dtsCacheSize) for the workers' controllers
+    :type optionsPrototype: dict
+    """
+    def __init__(self, numWorkers, maxQueued, optionsPrototype):
+        self.numWorkers = numWorkers
+        self.maxQueued = maxQueued
+        # each pending request has a slot, in which its worker sets its pid
+        self.startedBy = multiprocessing.Array("i", numWorkers + maxQueued, lock=False)
+        self.freeSlots = list(range(numWorkers + maxQueued))
+        self.pool = multiprocessing.Pool(numWorkers, initializer=initWorker, initargs=(optionsPrototype, self.startedBy))
+        self.lock = threading.Lock()
+        self.startedAt = time.time()
+        self.pending = 0 # requests processing or waiting for a worker
+        self.completed = self.rejected = self.failed = 0
+        self.busyTime = 0.0 # seconds of worker processing of completed requests
+
+    def close(self):
+        self.pool.terminate()
+        self.pool.join()
+
+    @property
+    def busyWorkers(self):
+        return min(self.pending, self.numWorkers)
+
+    @property
+    def queueDepth(self):
+        return max(self.pending - self.numWorkers, 0)
+
+    @property
+    def retryAfter(self):
+        """(int) -- Estimated seconds until a queued request could be accepted"""
+        averageTime = self.busyTime / self.completed if self.completed else 10.0
+        return max(int(averageTime * (self.queueDepth + 1) / self.numWorkers + 0.5), 1)
+
+    @property
+    def stats(self):
+        uptime = time.time() - self.startedAt
+        return {"workers": self.numWorkers,
+                "busyWorkers": self.busyWorkers,
+                "queueDepth": self.queueDepth,
+                "maxQueued": self.maxQueued,
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "utilization": round(self.busyTime / (uptime * self.numWorkers), 3) if uptime > 0 else 0.0,
+                "uptime": int(uptime)}
+
+    def run(self, options, media, viewFile, sourceZipStream=None, rawView=False):
+        """Runs a request in a worker process, blocking the calling (request) thread until completed.
+
+        :param rawView: Result is the contents of viewFile as written (such as a versioning report), if any
+        :returns: (bool, str) -- successful and result in media format per CntlrWebMain.getResult
+        :raises WorkerPoolBusy: when all workers are busy and the queue is full
+        :raises WorkerEnded: when the worker process ended while processing the request
+        """
+        with self.lock:
+            if self.pending >= self.numWorkers + self.maxQueued:
+                self.rejected += 1
+                raise WorkerPoolBusy(self.retryAfter)
+            self.pending += 1
+            slot = self.freeSlots.pop()
+        self.startedBy[slot] = 0
+        duration = 0.0
+        failed = False
+        try:
+            # file-like option values can't be sent to another process, the worker creates the view file
+            optionValues = {}
+            viewOption = viewName = None
+            for name, value in vars(options).items():
+                if viewFile is not None and value is viewFile:
+                    viewOption = name
+                    viewName = viewFile.fileName
+                else:
+                    optionValues[name] = value
+            sourceZip = sourceZipStream.read() if sourceZipStream is not None else None
+            asyncResult = self.pool.apply_async(runRequest,
+                                                (slot, optionValues, viewOption, viewName, rawView,
+                                                 media, sourceZip))
+            try:
+                successful, result, duration = workerResult(asyncResult, self.startedBy, slot)
+            except WorkerProcessEnded:
+                raise WorkerEnded()
+            if viewFile is not None:
+                viewFile.close()
+            return successful, result
+        except Exception:
+            failed = True
+            raise
+        finally:
+            with self.lock:
+                self.pending -= 1
+                self.freeSlots.append(slot)
+                if failed:
+                    self.failed += 1
+                else:
+                    self.completed += 1
+                self.busyTime += duration
+
+class Options():
+    """Class to emulate options needed by CntlrCmdLine.run, from option values sent to a worker"""
+    def __init__(self, optionValues):
+        for option, value in optionValues.items():
+            setattr(self, option, value)
+
+cntlr = None # worker process controller
+startedBy = None # shared slots of pending requests
+
+def initWorker(optionsPrototype, _startedBy):
+    global cntlr, startedBy
+    startedBy = _startedBy
+    from arelle.CntlrCmdLine import CntlrCmdLine
+    logger = logging.getLogger("arelle")
+    for handler in logger.handlers[:]: # inherited from web server process when forked
+        logger.removeHandler(handler)
+    cntlr = CntlrCmdLine()
+    cntlr.startLogging(logFileName='logToBuffer')
+    # each worker keeps its own warm base DTSes
+    from arelle.DtsCache import DtsCache
+    from arelle.CntlrWebMain import DEFAULT_DTS_CACHE_SIZE
+    cntlr.modelManager.dtsCache = DtsCache(cntlr.modelManager,
+                                           maxEntries=optionsPrototype.get("dtsCacheSize") or DEFAULT_DTS_CACHE_SIZE,
+                                           maxMemory=optionsPrototype.get("dtsCacheMemory"))
+
+def runRequest(slot, optionValues, viewOption, viewName, rawView, media, sourceZip):
+    startedBy[slot] = os.getpid()
+    from arelle.FileSource import FileNamedStringIO
+    from arelle.CntlrWebMain import getResult
+    startedAt = time.time()
+    options = Options(optionValues)
+    viewFile = None
+    if viewOption:
+        viewFile = FileNamedStringIO(viewName)
+        setattr(options, viewOption, viewFile)
+    try:
+        successful = cntlr.run(options, io.BytesIO(sourceZip) if sourceZip is not None else None)
+    except Exception as err:
+        cntlr.addToLog(_("[Exception] Failed to complete request: \n{0} \n{1}").format(
+                    err,
+                    traceback.format_tb(sys.exc_info()[2])))
+        successful = False
+    if rawView and viewFile is not None:
+        result = viewFile.getvalue()
+        viewFile.close()
+    else:
+        result = getResult(cntlr, successful, media, viewFile)
+    return successful, result, time.time() - startedAt
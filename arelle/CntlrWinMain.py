@@ -1015,13 +1015,15 @@ class CntlrWinMain (Cntlr.Cntlr):
                 rssModelXbrl.watchRss.stop()
 
     # for ui thread option updating
-    def rssWatchUpdateOption(self, latestPubDate=None):
-        self.uiThreadQueue.put((self.uiRssWatchUpdateOption, [latestPubDate]))
+    def rssWatchUpdateOption(self, latestPubDate=None, latestPubDateAccessionNumbers=None):
+        self.uiThreadQueue.put((self.uiRssWatchUpdateOption, [latestPubDate, latestPubDateAccessionNumbers]))
         
     # ui thread addToLog
-    def uiRssWatchUpdateOption(self, latestPubDate): 
+    def uiRssWatchUpdateOption(self, latestPubDate, latestPubDateAccessionNumbers=None): 
         if latestPubDate:
             self.modelManager.rssWatchOptions["latestPubDate"] = latestPubDate
+            # items processed of the latest pubDate
+            self.modelManager.rssWatchOptions["latestPubDateAccessionNumbers"] = latestPubDateAccessionNumbers or []
         self.config["rssWatchOptions"] = self.modelManager.rssWatchOptions
         self.saveConfig()
     
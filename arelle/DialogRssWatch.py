@@ -104,6 +104,17 @@ class DialogRssWatch(Toplevel):
         clearPubDateButton.grid(row=row, column=3, sticky=W)
         ToolTip(clearPubDateButton, text=_("Clear pub dateTime so that next cycle processes all entries in RSS feed."), wraplength=240)
         row += 1
+        label(frame, 1, row, "Worker processes:")
+        self.cellWorkers = gridCell(frame,2, row, str(options.get("validateRssWorkers") or ""))
+        ToolTip(self.cellWorkers, text=_("Specify a number of worker processes to process feed items concurrently (not available on Windows).  "
+                                         "Leave blank to process the items one at a time."), wraplength=240)
+        row += 1
+        label(frame, 1, row, "Prefetch filings:")
+        prefetch = options.get("rssPrefetchFilings")
+        self.cellPrefetch = gridCell(frame,2, row, str(prefetch) if prefetch is not None else "")
+        ToolTip(self.cellPrefetch, text=_("Specify a number of feed items whose filings are retrieved ahead of their processing.  "
+                                          "Leave blank for one per worker process."), wraplength=240)
+        row += 1
         label(frame, 2, row, "Validate:")
         row += 1
         self.checkboxes = (
@@ -206,6 +217,10 @@ class DialogRssWatch(Toplevel):
                 errors.append(_("E-mail address format error").format(self.cellLogFile.value))
         if self.cellLatestPubDate.value and dateTime(self.cellLatestPubDate.value) is None:
             errors.append(_("Latest pub date field contents invalid"))
+        if self.cellWorkers.value and not self.cellWorkers.value.isdigit():
+            errors.append(_("Worker processes field contents invalid"))
+        if self.cellPrefetch.value and not self.cellPrefetch.value.isdigit():
+            errors.append(_("Prefetch filings field contents invalid"))
         if errors:
             messagebox.showwarning(_("Dialog validation error(s)"),
                                 "\n ".join(errors), parent=self)
@@ -228,6 +243,8 @@ class DialogRssWatch(Toplevel):
             self.options["latestPubDate"] = XmlUtil.datetimeValue(self.cellLatestPubDate.value)
         else:
             self.options["latestPubDate"] = None
+        self.options["validateRssWorkers"] = int(self.cellWorkers.value) if self.cellWorkers.value else None
+        self.options["rssPrefetchFilings"] = int(self.cellPrefetch.value) if self.cellPrefetch.value else None
         for checkbox in self.checkboxes:
             self.options[checkbox.attr] = checkbox.value
         
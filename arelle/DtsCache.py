@@ -0,0 +1,387 @@
+'''
+Created on Oct 14, 2013
+
+Caches discovered base taxonomy DTSes (such as us-gaap or ifrs) in memory, so that
+repeated loads of filings (web server requests, RSS feed items, batch validation) only
+parse and discover the filing's own extension documents.
+
+A cache entry is keyed by the published (http) entry points that the filing's local
+documents reference (by schemaRef, import or include), and is discarded when any of
+its document files is modified on disk.
+
+The cached documents are lxml proxy trees bound to a holder modelXbrl.  When a
+filing is loaded, the documents are attached to the filing's modelXbrl (so that
+modelObject.modelXbrl resolves to the filing) and indexes (qnameConcepts, baseSets, etc)
+are copied into the filing's modelXbrl.  Discovery of an already cached url then
+finds it in modelXbrl.urlDocs and does not load it again.  On closing the filing's
+modelXbrl the documents are detached and any discovery state modified by the filing
+is restored.  An entry can be attached to only one modelXbrl at a time.
+
+Errors in the base taxonomy documents are reported when the cache entry is loaded,
+and are not reported again for each filing which reuses it.
+
+Formula and table linkbase objects of the base taxonomy stay in the cache with their
+compiled XPath programs, so that formulas are only compiled by the first filing using
+the entry.  Attributes derived from a filing's relationship sets (such as filter
+relationships) are removed on detaching, as each filing's DTS may add arcs to them.
+
+@author: Mark V Systems Limited
+(c) Copyright 2013 Mark V Systems Limited, All rights reserved.
+'''
+import os, sys
+from collections import OrderedDict
+from lxml import etree
+from arelle import XbrlConst
+from arelle.ModelDocument import schemaBottom
+from arelle.UrlUtil import isHttpUrl, splitDecodeFragment
+
+refElementTags = {"{http://www.xbrl.org/2003/linkbase}schemaRef": "{http://www.w3.org/1999/xlink}href",
+                  "{http://www.w3.org/2001/XMLSchema}import": "schemaLocation",
+                  "{http://www.w3.org/2001/XMLSchema}include": "schemaLocation"}
+
+class DtsCache:
+    """
+    .. class:: DtsCache(modelManager, maxEntries)
+
+    In-memory least-recently-used cache of discovered base taxonomy DTSes, owned by the modelManager
+    (as modelManager.dtsCache) when enabled.
+
+    :param modelManager: The controller's modelManager
+    :type modelManager: ModelManager
+    :param maxEntries: Maximum number of base DTSes to keep loaded
+    :type maxEntries: int
+    :param maxMemory: Maximum memory (in MB) of loaded base DTSes, or None for no limit
+    :type maxMemory: int
+
+        .. attribute:: hits, misses, stale, evictions
+
+        Counts of attach requests reusing an entry, loading a new entry, reloading a modified entry,
+        and of entries discarded to meet the entries or memory limits
+
+    The limits are soft: entries attached to a modelXbrl are not evicted, so the cache may stay over
+    its limits until they are detached.  Memory of an entry is the growth of the process's resident
+    memory while loading it, which is not measured where the platform doesn't report it.
+    """
+    def __init__(self, modelManager, maxEntries=4, maxMemory=None):
+        self.modelManager = modelManager
+        self.maxEntries = maxEntries
+        self.maxMemory = maxMemory
+        self.entries = OrderedDict()
+        self.hits = self.misses = self.stale = self.evictions = 0
+
+    def close(self):
+        while self.entries:
+            self.entries.popitem()[1].close()
+
+    def clear(self):
+        """Discards all entries, those in use by a modelXbrl are closed when it detaches them"""
+        while self.entries:
+            self.entries.popitem()[1].discard()
+
+    @property
+    def memoryUsed(self):
+        """(int) -- Memory in KB measured as used by loading the cached entries"""
+        return sum(entry.memoryUsed for entry in self.entries.values())
+
+    @property
+    def stats(self):
+        return {"entries": len(self.entries),
+                "maxEntries": self.maxEntries,
+                "memoryUsed": self.memoryUsed // 1024, # MB
+                "maxMemory": self.maxMemory,
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "evictions": self.evictions}
+
+    def isOverLimits(self):
+        return (len(self.entries) > self.maxEntries or
+                (self.maxMemory and self.memoryUsed > self.maxMemory * 1024))
+
+    def evict(self):
+        """Closes least recently used entries, which are not attached, until within entries and memory limits
+        (or until only attached entries remain)"""
+        for key, entry in list(self.entries.items()):
+            if not self.isOverLimits():
+                break
+            if not entry.isAttached: # least recently used not in use
+                del self.entries[key]
+                entry.close()
+                self.evictions += 1
+
+    def baseEntryUrls(self, modelXbrl, url, base=None):
+        """Scans the (local) entry document and the local schemas it references, without building
+        a model, to find the published (http) schemas the DTS is based on.
+
+        :returns: set -- normalized http urls referenced from local documents
+        """
+        webCache = self.modelManager.cntlr.webCache
+        fileSource = modelXbrl.fileSource
+        entryUrls = set()
+        visited = set()
+        pending = [(url, base)]
+        while pending:
+            _url, _base = pending.pop()
+            normalizedUri = webCache.normalizeUrl(_url, _base)
+            if not normalizedUri or normalizedUri in visited:
+                continue
+            visited.add(normalizedUri)
+            if isHttpUrl(normalizedUri):
+                entryUrls.add(normalizedUri)
+                continue
+            try:
+                if fileSource.isInArchive(normalizedUri):
+                    file = fileSource.file(normalizedUri, binary=True)[0]
+                elif os.path.isfile(normalizedUri):
+                    file = open(normalizedUri, "rb")
+                else:
+                    continue
+                try:
+                    for href in referencedSchemaUrls(file):
+                        pending.append((href, normalizedUri))
+                finally:
+                    file.close()
+            except (EnvironmentError, KeyError, etree.LxmlError):
+                return set() # let normal loading report the problem
+        return entryUrls
+
+    def attach(self, modelXbrl, url, base=None):
+        """Attaches a cached base DTS, loading it if not yet cached, to a newly created modelXbrl
+        before loading its entry document.
+
+        :returns: DtsCacheEntry -- entry attached, or None if no base DTS applies
+        """
+        entryUrls = self.baseEntryUrls(modelXbrl, url, base)
+        if not entryUrls:
+            return None
+        disclosureSystem = self.modelManager.disclosureSystem
+        key = (tuple(sorted(entryUrls)),
+               self.modelManager.validateDisclosureSystem and disclosureSystem.name)
+        entry = self.entries.get(key)
+        if entry is not None and not entry.isCurrent:
+            self.stale += 1
+            del self.entries[key]
+            entry.discard()
+            entry = None
+        if entry is None:
+            self.misses += 1
+            entry = DtsCacheEntry(self, key)
+            if not entry.load():
+                return None
+            self.entries[key] = entry
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            if entry.isAttached:
+                return None # in use by another modelXbrl, load without cache
+        entry.attach(modelXbrl)
+        self.evict() # after attaching, so the entry being used isn't evicted
+        return entry
+
+def referencedSchemaUrls(file):
+    """Yields schemaRef, import and include hrefs of a document, stopping where no more
+    such references may occur (at instance contents or schema components)."""
+    depth = 0
+    rootTag = None
+    for event, elt in etree.iterparse(file, events=("start", "end"), huge_tree=True):
+        if event == "end":
+            depth -= 1
+            if elt.tag in ("{http://www.xbrl.org/2008/inlineXBRL}header",
+                           "{http://www.xbrl.org/CR-2013-08-21/inlineXBRL}header"):
+                break # ix references are in the (first) ix header
+            continue
+        depth += 1
+        tag = elt.tag
+        if not isinstance(tag, str):
+            continue
+        if depth == 1:
+            rootTag = tag
+            if tag == "{http://www.xbrl.org/2003/linkbase}linkbase":
+                break # linkbases are not followed
+        elif depth == 2:
+            ns, sep, ln = tag[1:].partition("}")
+            if rootTag == "{http://www.xbrl.org/2003/instance}xbrl" and ns != XbrlConst.link:
+                break # contexts, units and facts follow schemaRefs
+            if rootTag == "{http://www.w3.org/2001/XMLSchema}schema" and ln in schemaBottom:
+                break # imports and includes precede schema components
+        if tag in refElementTags:
+            href = elt.get(refElementTags[tag])
+            if href:
+                href = splitDecodeFragment(href)[0]
+                if href:
+                    yield href
+
+relationshipDerivedAttributes = ("_groupFilterRelationships", "_filterRelationships", "_isFilterShared",
+                                 "_hasNoVariableDependencies", "_variableRefs", "_parentDefinitionNode",
+                                 "_parameters")
+
+class DtsCacheEntry:
+    """
+    .. class:: DtsCacheEntry(dtsCache, key)
+
+    A base DTS loaded into a holder modelXbrl, with a snapshot of the holder's discovery indexes.
+    """
+    def __init__(self, dtsCache, key):
+        self.dtsCache = dtsCache
+        self.key = key
+        self.modelXbrl = None
+        self.attachedModelXbrl = None
+        self.memoryUsed = 0
+        self.isDiscarded = False
+
+    def load(self):
+        from arelle import ModelXbrl, ModelDocument, XmlValidateSchema
+        from arelle.ModelDocument import Type, ModelDocumentReference
+        modelManager = self.dtsCache.modelManager
+        memoryAtStart = residentMemory()
+        entryUrls = self.key[0]
+        self.modelXbrl = modelXbrl = ModelXbrl.create(modelManager, Type.DTSENTRIES,
+                                                      entryUrls[0] + "#dtsCache", isEntry=True)
+        dtsDoc = modelXbrl.modelDocument
+        dtsDoc.inDTS = True
+        try:
+            for url in entryUrls:
+                doc = ModelDocument.load(modelXbrl, url, isDiscovered=True)
+                if doc is not None:
+                    dtsDoc.referencesDocument[doc] = ModelDocumentReference("import", None)
+                    doc.inDTS = True
+            while modelXbrl.schemaDocsToValidate:
+                doc = modelXbrl.schemaDocsToValidate.pop()
+                XmlValidateSchema.validate(doc, doc.xmlRootElement, doc.targetNamespace)
+        except ModelDocument.LoadingException:
+            pass
+        if modelXbrl.errors or len(modelXbrl.urlDocs) <= 1:
+            self.close() # don't share a DTS with problems, let each filing report them
+            return False
+        self.snapshot()
+        memoryUsed = residentMemory()
+        if memoryUsed is not None and memoryAtStart is not None:
+            self.memoryUsed = max(memoryUsed - memoryAtStart, 0)
+        return True
+
+    def snapshot(self):
+        from arelle.ModelFormulaObject import ModelFormulaResource
+        from arelle.ModelRenderingObject import ModelEuAxisCoord
+        modelXbrl = self.modelXbrl
+        dtsDoc = modelXbrl.modelDocument
+        self.docs = dict((url, doc) for url, doc in modelXbrl.urlDocs.items() if doc is not dtsDoc)
+        self.docStates = dict((doc, (doc.inDTS,
+                                     dict(doc.referencesDocument),
+                                     list(doc.hrefObjects),
+                                     set(doc.referencedNamespaces)))
+                              for doc in set(self.docs.values()))
+        self.fileMtimes = {}
+        for doc in self.docStates.keys():
+            if doc.filepath and os.path.exists(doc.filepath):
+                self.fileMtimes[doc.filepath] = os.path.getmtime(doc.filepath)
+        self.urlUnloadableDocs = dict(modelXbrl.urlUnloadableDocs)
+        self.dictIndexes = dict((name, dict(getattr(modelXbrl, name)))
+                                for name in ("qnameConcepts", "qnameAttributes", "qnameAttributeGroups",
+                                             "qnameGroupDefinitions", "qnameTypes"))
+        self.listIndexes = dict((name, dict((k, list(v)) for k, v in getattr(modelXbrl, name).items()))
+                                for name in ("namespaceDocs", "nameConcepts", "roleTypes", "arcroleTypes", "baseSets"))
+        self.setIndexes = dict((name, set(getattr(modelXbrl, name)))
+                               for name in ("modelVariableSets", "modelCustomFunctionImplementations", "modelRenderingTables"))
+        self.dictIndexes["qnameParameters"] = dict(modelXbrl.qnameParameters)
+        self.dictIndexes["modelCustomFunctionSignatures"] = dict(modelXbrl.modelCustomFunctionSignatures)
+        self.modelObjects = list(modelXbrl.modelObjects)
+        self.formulaObjects = [modelObject for modelObject in self.modelObjects
+                               if isinstance(modelObject, (ModelFormulaResource, ModelEuAxisCoord))]
+        self.langs = set(modelXbrl.langs)
+        self.labelroles = set(modelXbrl.labelroles)
+        self.flags = dict((name, getattr(modelXbrl, name))
+                          for name in ("hasXDT", "hasTableRendering", "hasTableIndexing", "hasFormulae"))
+
+    @property
+    def isCurrent(self):
+        try:
+            return all(os.path.getmtime(filepath) == mtime
+                       for filepath, mtime in self.fileMtimes.items())
+        except EnvironmentError:
+            return False
+
+    @property
+    def isAttached(self):
+        return self.attachedModelXbrl is not None
+
+    def attach(self, modelXbrl):
+        for doc in self.docStates.keys():
+            doc.modelXbrl = modelXbrl
+        modelXbrl.urlDocs.update(self.docs)
+        modelXbrl.urlUnloadableDocs.update(self.urlUnloadableDocs)
+        for name, index in self.dictIndexes.items():
+            getattr(modelXbrl, name).update(index)
+        for name, index in self.listIndexes.items():
+            modelXbrlIndex = getattr(modelXbrl, name)
+            for k, v in index.items():
+                modelXbrlIndex[k] = list(v)
+        for name, index in self.setIndexes.items():
+            getattr(modelXbrl, name).update(index)
+        modelXbrl.modelObjects = list(self.modelObjects) # keeps objectIndex of cached objects, filing's objects follow
+        modelXbrl.langs |= self.langs
+        modelXbrl.labelroles |= self.labelroles
+        for name, value in self.flags.items():
+            setattr(modelXbrl, name, value)
+        modelXbrl.dtsCacheEntry = self
+        self.attachedModelXbrl = modelXbrl
+
+    def detach(self):
+        """Restores cached documents to the holder modelXbrl, and removes references to them from
+        the documents of the attached modelXbrl, which is about to be closed or reloaded."""
+        modelXbrl = self.attachedModelXbrl
+        if modelXbrl is None:
+            return
+        for modelObject in self.formulaObjects:
+            # compiled programs are kept, results of the filing's relationship sets are not
+            for name in relationshipDerivedAttributes:
+                if name in modelObject.__dict__:
+                    delattr(modelObject, name)
+            if "customFunctionImplementation" in modelObject.__dict__:
+                modelObject.customFunctionImplementation = None
+        for doc, state in self.docStates.items():
+            doc.modelXbrl = self.modelXbrl
+            doc.inDTS, referencesDocument, hrefObjects, referencedNamespaces = state
+            doc.referencesDocument.clear()
+            doc.referencesDocument.update(referencesDocument)
+            doc.hrefObjects[:] = hrefObjects
+            doc.referencedNamespaces.clear()
+            doc.referencedNamespaces.update(referencedNamespaces)
+        for url, doc in self.docs.items():
+            if modelXbrl.urlDocs.get(url) is doc:
+                del modelXbrl.urlDocs[url]
+        for doc in set(modelXbrl.urlDocs.values()):
+            for cachedDoc in [d for d in doc.referencesDocument.keys() if d in self.docStates]:
+                del doc.referencesDocument[cachedDoc]
+        del modelXbrl.dtsCacheEntry
+        self.attachedModelXbrl = None
+        if self.isDiscarded: # no longer cached
+            self.close()
+
+    def discard(self):
+        """Closes the entry, or if it is attached, marks it to be closed when detached"""
+        if self.isAttached:
+            self.isDiscarded = True
+        else:
+            self.close()
+
+    def close(self):
+        self.detach()
+        if self.modelXbrl is not None:
+            self.modelXbrl.close()
+            self.modelXbrl = None
+
+def residentMemory():
+    """(int) -- Current resident memory of this process in KB, or None if not available
+    (unlike Cntlr.memoryUsed, which on unix is the peak memory of the process)"""
+    try:
+        if sys.platform.startswith("linux"):
+            with open("/proc/self/statm") as fh:
+                return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") // 1024
+        elif sys.platform.startswith("win"):
+            import win32process
+            return int(win32process.GetProcessMemoryInfo(win32process.GetCurrentProcess())['WorkingSetSize']) // 1024
+        else: # mac os x, sunos
+            import subprocess
+            return int(subprocess.check_output(["ps", "-o", "rss=", "-p", str(os.getpid())]).strip())
+    except Exception:
+        return None
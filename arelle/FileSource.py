@@ -4,7 +4,7 @@ Created on Oct 20, 2010
 @author: Mark V Systems Limited
 (c) Copyright 2010 Mark V Systems Limited, All rights reserved.
 '''
-import zipfile, os, io, base64, gzip, zlib, re, struct, random, time
+import zipfile, os, io, base64, gzip, zlib, re, struct, random, time, tempfile, threading
 from lxml import etree
 from arelle import XmlUtil
 from arelle.PackageManager import parsePackage
@@ -66,7 +66,136 @@ class ArchiveFileIOError(IOError):
         
     def __str__(self):
         return _("Archive does not contain file: {0}, archive: {1}").format(self.fileName, self.url)
-            
+
+class NotArchiveError(Exception):
+    pass
+
+ARCHIVE_READ_SIZE = 65536
+ARCHIVE_MEMBERS_MAX_MEMORY = 16 * 1024 * 1024 # decoded members beyond this size are spilled to a temporary file
+
+def eisBlocks(file):
+    # blocks of the xml of an EIS file, which is either uncompressed xml, or zlib compressed segments
+    isFirst = True
+    while True:
+        l = file.read(8)
+        if len(l) < 8:
+            break
+        if isFirst and l.startswith(b"<?xml "): # not compressed
+            yield l
+            while True:
+                block = file.read(ARCHIVE_READ_SIZE)
+                if not block:
+                    return
+                yield block
+        compressedBytes = file.read( struct.unpack(">L", l[0:4])[0])
+        if len(compressedBytes) <= 0:
+            break
+        block = zlib.decompress(compressedBytes)
+        if isFirst and not block.startswith(b"<?xml "):
+            raise NotArchiveError()
+        isFirst = False
+        yield block
+    if isFirst:
+        raise NotArchiveError()
+
+def xfdBlocks(file):
+    # blocks of the xml of an XFD file, which is either xml, or base64 encoded gzipped segments
+    firstline = file.readline()
+    if firstline.startswith(b"application/x-xfdl;content-encoding=\"asc-gzip\""):
+        # file has been gzipped
+        fb = base64.b64decode(file.read(-1))
+        i = 0
+        while i < len(fb):
+            lenCompr = fb[i + 0] * 256 + fb[i + 1]
+            lenUncomp = fb[i + 2] * 256 + fb[i + 3]
+            lenRead = 0
+            readBlocks = []
+
+            gzchunk = (bytes((31,139,8,0)) + fb[i:i+lenCompr])
+            try:
+                with gzip.GzipFile(fileobj=io.BytesIO(gzchunk)) as gf:
+                    while True:
+                        readSize = min(16384, lenUncomp - lenRead)
+                        readBytes = gf.read(size=readSize)
+                        lenRead += len(readBytes)
+                        readBlocks.append(readBytes)
+                        if len(readBytes) == 0 or (lenUncomp - lenRead) <= 0:
+                            break
+            except IOError as err:
+                pass # provide error message later
+            yield b"".join(readBlocks)
+
+            i += lenCompr + 4
+    else:
+        # position to start of file
+        file.seek(0,io.SEEK_SET)
+        while True:
+            block = file.read(ARCHIVE_READ_SIZE)
+            if not block:
+                break
+            yield block
+
+class ArchiveMembers:
+    """
+    .. class:: ArchiveMembers(blocks, memberTag, nameTag, dataTag, recover)
+
+    Index of the (base64 encoded) documents of an EIS or XFD archive, built by one pass of a pull parser
+    over the archive's xml.  Each document is decoded once, when indexed, into a temporary file shared by
+    all documents (in memory until ARCHIVE_MEMBERS_MAX_MEMORY, then spilled to disk), and the parsed
+    elements are discarded as indexed, so neither the archive's xml nor its base64 text is kept.
+
+        .. attribute:: names
+
+        Document names, in archive order
+    """
+    def __init__(self, blocks, memberTag, nameTag, dataTag, recover=False):
+        self.names = []
+        self.members = {} # (offset, length) in file by name
+        self.file = tempfile.SpooledTemporaryFile(max_size=ARCHIVE_MEMBERS_MAX_MEMORY)
+        self.lock = threading.Lock()
+        parser = etree.XMLPullParser(events=("end",), tag=memberTag, recover=recover, huge_tree=True)
+        try:
+            for block in blocks:
+                parser.feed(block)
+                self.index(parser, nameTag, dataTag)
+            parser.close()
+            self.index(parser, nameTag, dataTag)
+        except:
+            self.close()
+            raise
+
+    def index(self, parser, nameTag, dataTag):
+        for event, elt in parser.read_events():
+            name = elt.findtext(nameTag)
+            if name:
+                self.names.append(name)
+                b64data = elt.findtext(dataTag)
+                if b64data and name not in self.members:
+                    b = base64.b64decode(b64data.encode("latin-1"))
+                    # remove BOM codes if present
+                    start = 3 if len(b) > 3 and b[0] == 239 and b[1] == 187 and b[2] == 191 else 0
+                    self.file.seek(0, io.SEEK_END)
+                    self.members[name] = (self.file.tell(), len(b) - start)
+                    self.file.write(b[start:] if start else b)
+            # discard indexed elements
+            elt.clear()
+            while elt.getprevious() is not None:
+                del elt.getparent()[0]
+
+    def read(self, name):
+        """Decoded bytes of the named document, or None if not in the archive (or empty)"""
+        try:
+            offset, length = self.members[name]
+        except KeyError:
+            return None
+        with self.lock:
+            self.file.seek(offset)
+            return self.file.read(length)
+
+    def close(self):
+        self.file.close()
+        self.members.clear()
+
 class FileSource:
     def __init__(self, url, cntlr=None, checkIfXmlIsEis=False):
         self.url = str(url)  # allow either string or FileNamedStringIO
@@ -123,94 +252,27 @@ class FileSource:
                     self.logError(err)
                     pass
             elif self.isEis:
-                # check first line of file
-                buf = b''
                 try:
-                    file = open(self.basefile, 'rb')
-                    more = True
-                    while more:
-                        l = file.read(8)
-                        if len(l) < 8:
-                            break
-                        if len(buf) == 0 and l.startswith(b"<?xml "): # not compressed
-                            buf = l + file.read()  # not compressed
-                            break
-                        compressedBytes = file.read( struct.unpack(">L", l[0:4])[0])
-                        if len(compressedBytes) <= 0:
-                            break
-                        buf += zlib.decompress(compressedBytes)
-                    file.close()
+                    with open(self.basefile, 'rb') as file:
+                        self.archiveMembers = ArchiveMembers(eisBlocks(file),
+                                                             "{http://www.sec.gov/edgar/common}document",
+                                                             "{http://www.sec.gov/edgar/common}conformedName",
+                                                             "{http://www.sec.gov/edgar/common}contents",
+                                                             recover=True)
+                    self.isOpen = True
                 except EnvironmentError as err:
                     self.logError(err)
-                    pass
-                #uncomment to save for debugging
-                #with open("c:/temp/test.xml", "wb") as f:
-                #    f.write(buf)
-                
-                if buf.startswith(b"<?xml "):
-                    try:
-                        # must strip encoding
-                        str = buf.decode(XmlUtil.encoding(buf))
-                        endEncoding = str.index("?>", 0, 128)
-                        if endEncoding > 0:
-                            str = str[endEncoding+2:]
-                        file = io.StringIO(initial_value=str)
-                        parser = etree.XMLParser(recover=True, huge_tree=True)
-                        self.eisDocument = etree.parse(file, parser=parser)
-                        file.close()
-                        self.isOpen = True
-                    except EnvironmentError as err:
-                        self.logError(err)
-                        return # provide error message later
-                    except etree.LxmlError as err:
-                        self.logError(err)
-                        return # provide error message later
+                    return # provide error message later
+                except etree.LxmlError as err:
+                    self.logError(err)
+                    return # provide error message later
+                except NotArchiveError:
+                    return # not an EIS (uncompressed and not xml)
                 
             elif self.isXfd:
-                # check first line of file
-                file = open(self.basefile, 'rb')
-                firstline = file.readline()
-                if firstline.startswith(b"application/x-xfdl;content-encoding=\"asc-gzip\""):
-                    # file has been gzipped
-                    base64input = file.read(-1)
-                    file.close();
-                    file = None;
-    
-                    fb = base64.b64decode(base64input)
-                    ungzippedBytes = b""
-                    totalLenUncompr = 0
-                    i = 0
-                    while i < len(fb):
-                        lenCompr = fb[i + 0] * 256 + fb[i + 1]
-                        lenUncomp = fb[i + 2] * 256 + fb[i + 3]
-                        lenRead = 0
-                        totalLenUncompr += lenUncomp
-
-                        gzchunk = (bytes((31,139,8,0)) + fb[i:i+lenCompr])
-                        try:
-                            with gzip.GzipFile(fileobj=io.BytesIO(gzchunk)) as gf:
-                                while True:
-                                    readSize = min(16384, lenUncomp - lenRead)
-                                    readBytes = gf.read(size=readSize)
-                                    lenRead += len(readBytes)
-                                    ungzippedBytes += readBytes
-                                    if len(readBytes) == 0 or (lenUncomp - lenRead) <= 0:
-                                        break
-                        except IOError as err:
-                            pass # provide error message later
-
-                        i += lenCompr + 4
-                    #for learning the content of xfd file, uncomment this:
-                    #with open("c:\\temp\\test.xml", "wb") as fh:
-                    #    fh.write(ungzippedBytes)
-                    file = io.StringIO(initial_value=ungzippedBytes.decode("utf-8"))
-                else:
-                    # position to start of file
-                    file.seek(0,io.SEEK_SET)
-                    
                 try:
-                    self.xfdDocument = etree.parse(file)
-                    file.close()
+                    with open(self.basefile, 'rb') as file:
+                        self.archiveMembers = ArchiveMembers(xfdBlocks(file), "data", "filename", "mimedata")
                     self.isOpen = True
                 except EnvironmentError as err:
                     self.logError(err)
@@ -267,14 +329,11 @@ class FileSource:
             self.fs.close()
             self.isOpen = False
             self.isZip = False
-        if self.isEis and self.isOpen:
-            self.eisDocument.getroot().clear() # unlink nodes
-            self.eisDocument = None
-            self.isEis = False
-        if self.isXfd and self.isOpen:
-            self.xfdDocument.getroot().clear() # unlink nodes
-            self.xfdDocument = None
-            self.isXfd = False
+        if (self.isEis or self.isXfd) and self.isOpen:
+            self.archiveMembers.close()
+            self.archiveMembers = None
+            self.isEis = self.isXfd = False
+            self.isOpen = False
         if self.isRss and self.isOpen:
             self.rssDocument.getroot().clear() # unlink nodes
             self.rssDocument = None
@@ -352,57 +411,26 @@ class FileSource:
             else: # filepath.startswith(self.baseurl)
                 archiveFileName = filepath[len(archiveFileSource.baseurl) + 1:]
             if archiveFileSource.isZip:
+                # member is streamed from the archive (decompressed as read), not read into memory
                 try:
-                    b = archiveFileSource.fs.read(archiveFileName.replace("\\","/"))
-                    if binary:
-                        return (io.BytesIO(b), )
-                    encoding = XmlUtil.encoding(b)
-                    return (io.TextIOWrapper(io.BytesIO(b), encoding=encoding), 
-                            encoding)
+                    zipInfo = archiveFileSource.fs.getinfo(archiveFileName.replace("\\","/"))
                 except KeyError:
                     raise ArchiveFileIOError(self, archiveFileName)
-            elif archiveFileSource.isEis:
-                for docElt in self.eisDocument.iter(tag="{http://www.sec.gov/edgar/common}document"):
-                    outfn = docElt.findtext("{http://www.sec.gov/edgar/common}conformedName")
-                    if outfn == archiveFileName:
-                        b64data = docElt.findtext("{http://www.sec.gov/edgar/common}contents")
-                        if b64data:
-                            b = base64.b64decode(b64data.encode("latin-1"))
-                            # remove BOM codes if present
-                            if len(b) > 3 and b[0] == 239 and b[1] == 187 and b[2] == 191:
-                                start = 3;
-                                length = len(b) - 3;
-                                b = b[start:start + length]
-                            else:
-                                start = 0;
-                                length = len(b);
-                            if binary:
-                                return (io.BytesIO(b), )
-                            encoding = XmlUtil.encoding(b, default="latin-1")
-                            return (io.TextIOWrapper(io.BytesIO(b), encoding=encoding), 
-                                    encoding)
-                raise ArchiveFileIOError(self, archiveFileName)
-            elif archiveFileSource.isXfd:
-                for data in archiveFileSource.xfdDocument.iter(tag="data"):
-                    outfn = data.findtext("filename")
-                    if outfn == archiveFileName:
-                        b64data = data.findtext("mimedata")
-                        if b64data:
-                            b = base64.b64decode(b64data.encode("latin-1"))
-                            # remove BOM codes if present
-                            if len(b) > 3 and b[0] == 239 and b[1] == 187 and b[2] == 191:
-                                start = 3;
-                                length = len(b) - 3;
-                                b = b[start:start + length]
-                            else:
-                                start = 0;
-                                length = len(b);
-                            if binary:
-                                return (io.BytesIO(b), )
-                            encoding = XmlUtil.encoding(b, default="latin-1")
-                            return (io.TextIOWrapper(io.BytesIO(b), encoding=encoding), 
-                                    encoding)
-                raise ArchiveFileIOError(self, archiveFileName)
+                if binary:
+                    return (archiveFileSource.fs.open(zipInfo), )
+                with archiveFileSource.fs.open(zipInfo) as fh:
+                    encoding = XmlUtil.encoding(fh.read(512))
+                return (io.TextIOWrapper(archiveFileSource.fs.open(zipInfo), encoding=encoding), 
+                        encoding)
+            elif archiveFileSource.isEis or archiveFileSource.isXfd:
+                b = archiveFileSource.archiveMembers.read(archiveFileName)
+                if b is None:
+                    raise ArchiveFileIOError(self, archiveFileName)
+                if binary:
+                    return (io.BytesIO(b), )
+                encoding = XmlUtil.encoding(b, default="latin-1")
+                return (io.TextIOWrapper(io.BytesIO(b), encoding=encoding), 
+                        encoding)
             elif archiveFileSource.isInstalledTaxonomyPackage:
                 # remove TAXONOMY_PACKAGE_FILE_NAME from file path
                 if filepath.startswith(archiveFileSource.basefile):
@@ -427,21 +455,14 @@ class FileSource:
                 files.append(zipinfo.filename)
             self.filesDir = files
         elif self.isEis:
-            files = []
-            for docElt in self.eisDocument.iter(tag="{http://www.sec.gov/edgar/common}document"):
-                outfn = docElt.findtext("{http://www.sec.gov/edgar/common}conformedName")
-                if outfn:
-                    files.append(outfn);
-            self.filesDir = files
+            self.filesDir = list(self.archiveMembers.names)
         elif self.isXfd:
             files = []
-            for data in self.xfdDocument.iter(tag="data"):
-                outfn = data.findtext("filename")
-                if outfn:
-                    if len(outfn) > 2 and outfn[0].isalpha() and \
-                        outfn[1] == ':' and outfn[2] == '\\':
-                        continue
-                    files.append(outfn);
+            for outfn in self.archiveMembers.names:
+                if len(outfn) > 2 and outfn[0].isalpha() and \
+                    outfn[1] == ':' and outfn[2] == '\\':
+                    continue
+                files.append(outfn);
             self.filesDir = files
         elif self.isRss:
             files = []  # return title, descr, pubdate, linst doc
@@ -4,7 +4,7 @@ Created on Jan 9, 2011
 @author: Mark V Systems Limited
 (c) Copyright 2011 Mark V Systems Limited, All rights reserved.
 '''
-from arelle import (XPathContext, XbrlConst, XmlUtil, XbrlUtil, XmlValidate)
+from arelle import (XPathContext, XbrlConst, XmlUtil, XbrlUtil, XmlValidate, Tracing)
 from arelle.FunctionXs import xsString
 from arelle.ModelObject import ModelObject
 from arelle.ModelFormulaObject import (aspectModels, Aspect, aspectModelAspect,
@@ -19,6 +19,10 @@ from arelle.Locale import format_string
 from collections import defaultdict
 ModelDimensionValue = None
 
+@Tracing.traced("variableSet", "formula", spanArgs=lambda xpCtx, varSet, *args, **kwargs: 
+                {"variableSet": varSet.id or varSet.xlinkLabel, "type": varSet.localName},
+                # variable sets evaluated in scope of another (per evaluation of it) are within its span
+                isTraced=lambda xpCtx, varSet, variablesInScope=False, *args, **kwargs: not variablesInScope)
 def evaluate(xpCtx, varSet, variablesInScope=False, uncoveredAspectFacts=None):
     # for each dependent variable, find bindings
     if variablesInScope:
@@ -277,7 +281,8 @@ def evaluateVar(xpCtx, varSet, varIndex, cachedFilteredFacts, uncoveredAspectFac
                 uncoveredAspects = vb.aspectsDefined - vb.aspectsCovered - {Aspect.DIMENSIONS}
                 if any((_vb.isFactVar and not _vb.isFallback) for _vb in xpCtx.varBindings.values()):
                     factCount = len(facts)
-                    facts = implicitFilter(xpCtx, vb, facts, uncoveredAspects, uncoveredAspectFacts)
+                    facts = implicitFilter(xpCtx, vb, facts, uncoveredAspects, uncoveredAspectFacts,
+                                           cachedFilteredFacts if varHasNoVariableDependencies else None)
                     if (considerFallback and varHasNoVariableDependencies and 
                         factCount and
                         factCount - len(facts) == 0 and
@@ -378,7 +383,7 @@ def coverAspectCoverFilterDims(xpCtx, vb, filterRelationships):
         elif isinstance(_filter,ModelBooleanFilter) and varFilterRel.isCovered:
             coverAspectCoverFilterDims(xpCtx, vb, _filter.filterRelationships)
             
-def implicitFilter(xpCtx, vb, facts, aspects, uncoveredAspectFacts):
+def implicitFilter(xpCtx, vb, facts, aspects, uncoveredAspectFacts, factsIndexes=None):
     if xpCtx.formulaOptions.traceVariableFilterWinnowing:  # trace shows by aspect by bound variable match    
         for aspect in aspects:
             if uncoveredAspectFacts.get(aspect, "none") is not None:
@@ -397,10 +402,27 @@ def implicitFilter(xpCtx, vb, facts, aspects, uncoveredAspectFacts):
         #                       if not vb.hasAspectValueCovered(aspect)]
         if testableAspectFacts:
             # not tracing, do bulk aspect filtering
-            facts = [fact
-                     for fact in facts
-                     if all(aspectMatches(xpCtx, uncoveredAspectFact, fact, aspect)
-                            for (aspect, uncoveredAspectFact) in testableAspectFacts)]
+            if any(uncoveredAspectFact is None for aspect, uncoveredAspectFact in testableAspectFacts):
+                return [] # aspect not in uncoveredAspectFacts, no fact matches
+            uncoveredFacts = set(uncoveredAspectFact for aspect, uncoveredAspectFact in testableAspectFacts)
+            testableAspects = [aspect for aspect, uncoveredAspectFact in testableAspectFacts]
+            factsIndex = aspectKeyIndex(facts, testableAspects, factsIndexes, vb.qname)
+            if factsIndex.modelXbrl is not None and aspectKeyInstance(uncoveredFacts) is factsIndex.modelXbrl:
+                # dict lookup of facts with uncovered facts' aspect keys
+                key = tuple(aspectKey(uncoveredAspectFact, aspect)
+                            for aspect, uncoveredAspectFact in testableAspectFacts)
+                inexactAspectFacts = [(aspect, uncoveredAspectFact)
+                                      for (aspect, uncoveredAspectFact), _aspectKey in zip(testableAspectFacts, key)
+                                      if isinstance(_aspectKey, InexactKey)]
+                facts = [fact
+                         for fact in factsIndex.get(key, ())
+                         if all(aspectMatches(xpCtx, uncoveredAspectFact, fact, aspect)
+                                for (aspect, uncoveredAspectFact) in inexactAspectFacts)]
+            else:
+                facts = [fact
+                         for fact in facts
+                         if all(aspectMatches(xpCtx, uncoveredAspectFact, fact, aspect)
+                                for (aspect, uncoveredAspectFact) in testableAspectFacts)]
     return facts
     
 def aspectsMatch(xpCtx, fact1, fact2, aspects):
@@ -518,17 +540,144 @@ def aspectMatches(xpCtx, fact1, fact2, aspect):
                 # else if both are None, matches True for single and multiple instance
     return True
 
+# aspect keys
+#   a hashable key of each aspect value of a fact (cached on the fact), equal for facts whose aspect matches,
+#   so that facts (items of a single instance) are partitioned and implicitly filtered by dict lookup.
+#   Keys of aspect values which can't be fully keyed (such as typed dimensions or non-XDT segment contents)
+#   are InexactKeys, facts with equal keys are further compared by aspectMatches for those aspects.
+#   Tuples and facts of multiple instances (where aspectMatches isn't an equivalence) are matched by aspectMatches.
+
+class InexactKey(tuple):
+    pass
+
+noContextKey = InexactKey(("no context",))
+noPeriodKey = InexactKey(("no period",))
+completeSegScenKey = InexactKey(("complete segment or scenario",))
+typedDimensionKey = InexactKey(("typed dimension",))
+
+def aspectKey(fact, aspect):
+    try:
+        return fact._aspectKeys[aspect]
+    except AttributeError:
+        fact._aspectKeys = {}
+    except KeyError:
+        pass
+    key = fact._aspectKeys[aspect] = aspectKey_(fact, aspect)
+    return key
+
+def aspectKey_(fact, aspect):
+    if aspect == 1: # Aspect.LOCATION:
+        return fact.getparent()
+    elif aspect == 2: # Aspect.CONCEPT:
+        return fact.qname
+    elif aspect == 5: # Aspect.UNIT:
+        unit = fact.unit
+        if unit is not None:
+            mul, div = unit.measures
+            return (tuple(mul), tuple(div))
+        return None
+    # rest of keys are of context
+    c = fact.context
+    if c is None:
+        return noContextKey # never matches
+    if aspect == 4: # Aspect.PERIOD:
+        if c.isForeverPeriod:
+            return "forever"
+        elif c.isStartEndPeriod:
+            return (c.startDatetime, c.endDatetime)
+        elif c.isInstantPeriod:
+            return (c.instantDatetime,)
+        return noPeriodKey
+    elif aspect == 3: # Aspect.ENTITY_IDENTIFIER:
+        return c.entityIdentifierHash
+    elif aspect == 6 or aspect == 7: # aspect in (Aspect.COMPLETE_SEGMENT, Aspect.COMPLETE_SCENARIO):
+        return completeSegScenKey
+    elif aspect == 8 or aspect == 9: # aspect in (Aspect.NON_XDT_SEGMENT, Aspect.NON_XDT_SCENARIO):
+        lXs = len(c.nonDimValues(aspect))
+        if lXs:
+            return InexactKey((lXs,))
+        return 0
+    elif isinstance(aspect, QName):
+        global ModelDimensionValue
+        if ModelDimensionValue is None:
+            from arelle.ModelInstanceObject import ModelDimensionValue
+        dimValue = c.dimValue(aspect)
+        if isinstance(dimValue, (ModelDimensionValue,DimValuePrototype)):
+            if dimValue.isExplicit:
+                return dimValue.memberQname
+            return typedDimensionKey
+        return dimValue # QName of default or None if absent
+    return None # Aspect.DIMENSIONS and other aspects always match
+
+def aspectKeyInstance(facts):
+    """Instance of the facts, if they are items (not tuples) of a single instance (so matchable by aspect keys), else None"""
+    modelXbrl = None
+    for fact in facts:
+        if fact.isTuple:
+            return None
+        if modelXbrl is None:
+            modelXbrl = fact.modelXbrl
+        elif fact.modelXbrl is not modelXbrl:
+            return None
+    return modelXbrl
+
+class AspectKeyIndex(dict):
+    """Facts (in their order) indexed by tuple of their aspect keys, empty (with modelXbrl None) if facts aren't matchable by aspect keys"""
+    def __init__(self, facts, aspects):
+        super(AspectKeyIndex, self).__init__()
+        self.facts = facts
+        self.modelXbrl = aspectKeyInstance(facts)
+        if self.modelXbrl is not None:
+            for fact in facts:
+                key = tuple(aspectKey(fact, aspect) for aspect in aspects)
+                try:
+                    self[key].append(fact)
+                except KeyError:
+                    self[key] = [fact]
+        
+def aspectKeyIndex(facts, aspects, factsIndexes=None, varQname=None):
+    """AspectKeyIndex of facts, kept in factsIndexes (when provided) for nested evaluations reusing the same facts"""
+    indexKey = ("idx:", varQname, tuple(aspects))
+    if factsIndexes is not None:
+        factsIndex = factsIndexes.get(indexKey)
+        if factsIndex is not None and factsIndex.facts is facts:
+            return factsIndex
+    factsIndex = AspectKeyIndex(facts, aspects)
+    if factsIndexes is not None:
+        factsIndexes[indexKey] = factsIndex
+    return factsIndex
+
 def factsPartitions(xpCtx, facts, aspects):
     factsPartitions = []
+    if aspectKeyInstance(facts) is None: # tuples or multi-instance, partition by matching aspects
+        for fact in facts:
+            matched = False
+            for partition in factsPartitions:
+                if aspectsMatch(xpCtx, fact, partition[0], aspects):
+                    partition.append(fact)
+                    matched = True
+                    break
+            if not matched:
+                factsPartitions.append([fact,])
+        return factsPartitions
+    aspects = list(aspects)
+    keyPartitions = {}
     for fact in facts:
-        matched = False
-        for partition in factsPartitions:
-            if aspectsMatch(xpCtx, fact, partition[0], aspects):
-                partition.append(fact)
-                matched = True
-                break
-        if not matched:
-            factsPartitions.append([fact,])
+        key = tuple(aspectKey(fact, aspect) for aspect in aspects)
+        if key in keyPartitions:
+            inexactAspects = [aspect for aspect, _aspectKey in zip(aspects, key) if isinstance(_aspectKey, InexactKey)]
+            for partition in keyPartitions[key]:
+                if not inexactAspects or aspectsMatch(xpCtx, fact, partition[0], inexactAspects):
+                    partition.append(fact)
+                    break
+            else:
+                partition = [fact,]
+                keyPartitions[key].append(partition)
+                factsPartitions.append(partition)
+        else:
+            partition = [fact,]
+            keyPartitions[key] = [partition]
+            factsPartitions.append(partition)
     return factsPartitions
 
 def evaluationIsUnnecessary(thisEval, otherEvalHashDicts, otherEvals):
@@ -0,0 +1,212 @@
+'''
+Created on Oct 17, 2013
+
+Scheduler of formula variable set evaluations, evaluating independent assertions concurrently
+in worker processes (formulaOptions.parallelWorkers).
+
+Assertions are evaluated after all formulas producing output instances, so each assertion,
+with the variable sets it chains to by variables-scope relationships, depends only on the
+input and output instances already produced.  These are evaluated by worker processes forked
+at that point, each with its own copy of the model and XPathContext.  Variable set chains
+which produce output instance facts are evaluated in the process of the validation.
+
+Log entries of each worker evaluation are replayed, and message counts, errors and assertion
+satisfied/not satisfied counts merged, in the order of serial evaluation, so results don't depend
+on the workers.  Messages are counted by the workers as in serial evaluation, including those not
+logged at the logger's level.
+
+Worker processes are forked, so concurrent evaluation is not available on Windows or from a process
+which is itself a (daemonic) worker, such as of the web server or batch mode, which evaluate serially.
+
+@author: Mark V Systems Limited
+(c) Copyright 2013 Mark V Systems Limited, All rights reserved.
+'''
+import os, sys, time, logging, multiprocessing
+from threading import Timer
+from arelle import XPathContext, XbrlConst
+from arelle.ModelFormulaObject import ModelVariableSetAssertion
+
+def scopeChain(modelXbrl, modelVariableSet):
+    """Variable set and variable sets it chains to by variables-scope relationships (in evaluation order)"""
+    chain = [modelVariableSet]
+    for varSet in chain: # extended while iterating
+        for varScopeRel in modelXbrl.relationshipSet(XbrlConst.variablesScope).fromModelObject(varSet):
+            if varScopeRel.toModelObject is not None and varScopeRel.toModelObject not in chain:
+                chain.append(varScopeRel.toModelObject)
+    return chain
+
+def isConcurrent(chain):
+    """True if the chain of variable sets produces no output instance facts (all are value or existence assertions)"""
+    return all(isinstance(varSet, ModelVariableSetAssertion) for varSet in chain)
+
+def forkingPool():
+    """multiprocessing module (or context) which forks worker processes, or None if unavailable"""
+    if not hasattr(os, "fork") or multiprocessing.current_process().daemon:
+        return None
+    try:
+        return multiprocessing.get_context("fork")
+    except AttributeError: # before python 3.4, fork is the only posix start method
+        return multiprocessing
+    except ValueError:
+        return None
+
+class WorkerProcessEnded(Exception):
+    """Raised by workerResult when the worker process of a task ended without its result"""
+
+def isProcessRunning(pid):
+    if sys.platform == "win32": # os.kill would terminate the process
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.OpenProcess(0x1000, False, pid) # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return False
+        exitCode = ctypes.c_ulong()
+        kernel32.GetExitCodeProcess(handle, ctypes.byref(exitCode))
+        kernel32.CloseHandle(handle)
+        return exitCode.value == 259 # STILL_ACTIVE
+    try:
+        os.kill(pid, 0)
+        return True
+    except OSError:
+        return False
+
+def workerResult(asyncResult, startedBy, index, pollInterval=1.0):
+    """Waits for the result of a task of a pool, which is not sent if its worker process ends
+    (such as when killed for lack of memory).
+
+    :param asyncResult: Result of pool.apply_async of the task
+    :param startedBy: Shared array (multiprocessing.Array) in which the task sets its worker's pid at index
+        (zero until then)
+    :raises WorkerProcessEnded: if the worker process of the task ended without its result
+    """
+    while not asyncResult.ready():
+        asyncResult.wait(pollInterval)
+        if not asyncResult.ready() and startedBy[index] and not isProcessRunning(startedBy[index]):
+            asyncResult.wait(pollInterval) # result may have been sent before the worker ended
+            if not asyncResult.ready():
+                raise WorkerProcessEnded()
+    return asyncResult.get()
+
+def evaluateVariableSets(val, xpathContext, modelVariableSets, numWorkers, deadline=None):
+    """Evaluates variable sets, in the order given, evaluating independent assertions concurrently.
+
+    :param modelVariableSets: Variable sets to evaluate (without variables-scope relationships to them)
+    :type modelVariableSets: [ModelVariableSet]
+    :param numWorkers: Number of worker processes
+    :type numWorkers: int
+    :param deadline: Time (per time.time()) when the maximum formula run time is exceeded, if any
+    :type deadline: float
+    """
+    global scheduledEvaluations
+    from arelle.ValidateFormula import evaluateVariableSet
+    modelXbrl = val.modelXbrl
+    concurrentEvaluations = [] # (variableSet, scope chain of variable sets)
+    mp = forkingPool() if numWorkers > 1 else None
+    if mp is not None:
+        for modelVariableSet in modelVariableSets:
+            chain = scopeChain(modelXbrl, modelVariableSet)
+            if isConcurrent(chain):
+                concurrentEvaluations.append((modelVariableSet, chain))
+        if len(concurrentEvaluations) < 2:
+            mp = None
+    if mp is None:
+        for modelVariableSet in modelVariableSets:
+            evaluateVariableSet(val, xpathContext, modelVariableSet)
+        return
+    concurrentVariableSets = set(varSet for varSet, chain in concurrentEvaluations)
+    if modelXbrl.modelManager.formulaOptions.traceVariablesOrder:
+        modelXbrl.info("formula:trace",
+                       _("Evaluating %(concurrentCount)s of %(count)s variable sets concurrently in %(workers)s worker processes"),
+                       modelObject=modelXbrl, concurrentCount=len(concurrentEvaluations), count=len(modelVariableSets),
+                       workers=min(numWorkers, len(concurrentEvaluations)))
+    # workers are forked with the scheduled evaluations (and current model and xpathContext state)
+    scheduledEvaluations = (val, xpathContext, concurrentEvaluations, deadline)
+    pool = mp.Pool(min(numWorkers, len(concurrentEvaluations)), initializer=initWorker)
+    try:
+        results = pool.imap(evaluateConcurrently, range(len(concurrentEvaluations)), 1)
+        for modelVariableSet in modelVariableSets:
+            if modelVariableSet in concurrentVariableSets:
+                mergeResult(val, concurrentEvaluations, next(results))
+            else:
+                evaluateVariableSet(val, xpathContext, modelVariableSet)
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+        scheduledEvaluations = None
+
+def mergeResult(val, concurrentEvaluations, result):
+    index, logRecords, logCounts, errors, counts, duration, runTimeExceeded = result
+    modelXbrl = val.modelXbrl
+    modelVariableSet, chain = concurrentEvaluations[index]
+    for level, count in logCounts.items():
+        modelXbrl.logCount[level] = modelXbrl.logCount.get(level, 0) + count
+    modelXbrl.errors.extend(errors)
+    logger = modelXbrl.logger
+    for record in logRecords:
+        logger.handle(record)
+    for varSet, (countSatisfied, countNotSatisfied) in zip(chain, counts):
+        varSet.countSatisfied += countSatisfied
+        varSet.countNotSatisfied += countNotSatisfied
+    modelXbrl.profileStat(modelVariableSet.localName + "_" + (modelVariableSet.id or modelVariableSet.xlinkLabel), duration)
+    if runTimeExceeded:
+        raise XPathContext.RunTimeExceededException()
+
+class LogToResultHandler(logging.Handler):
+    """Keeps log records of a worker evaluation, with arguments which can be sent to the validation process"""
+    def __init__(self):
+        super(LogToResultHandler, self).__init__()
+        self.logRecords = []
+
+    def emit(self, logRecord):
+        if isinstance(logRecord.args, dict):
+            logRecord.args = dict((name, value if value is None or isinstance(value, _STR_NUM_TYPES) else str(value))
+                                  for name, value in logRecord.args.items())
+        logRecord.exc_info = None # tracebacks can't be sent
+        self.logRecords.append(logRecord)
+
+scheduledEvaluations = None # (val, xpathContext, concurrentEvaluations, deadline) of forked worker
+logHandler = None
+
+def initWorker():
+    global logHandler
+    val = scheduledEvaluations[0]
+    logger = val.modelXbrl.logger
+    for handler in logger.handlers[:]: # inherited from validation process
+        logger.removeHandler(handler)
+    logger.propagate = False
+    logHandler = LogToResultHandler()
+    logger.addHandler(logHandler)
+
+def evaluateConcurrently(index):
+    from arelle.ValidateFormula import evaluateVariableSet
+    val, xpathContext, concurrentEvaluations, deadline = scheduledEvaluations
+    modelVariableSet, chain = concurrentEvaluations[index]
+    modelXbrl = val.modelXbrl
+    startedAt = time.time()
+    priorLogCount = dict(modelXbrl.logCount)
+    priorNumErrors = len(modelXbrl.errors)
+    priorCounts = [(varSet.countSatisfied, varSet.countNotSatisfied) for varSet in chain]
+    runTimeExceeded = False
+    maxFormulaRunTimeTimer = None
+    try:
+        if deadline is not None:
+            if startedAt >= deadline:
+                raise XPathContext.RunTimeExceededException()
+            maxFormulaRunTimeTimer = Timer(deadline - startedAt, xpathContext.runTimeExceededCallback)
+            maxFormulaRunTimeTimer.start()
+        evaluateVariableSet(val, xpathContext, modelVariableSet)
+    except XPathContext.RunTimeExceededException:
+        runTimeExceeded = True
+    finally:
+        if maxFormulaRunTimeTimer is not None:
+            maxFormulaRunTimeTimer.cancel()
+    counts = [(varSet.countSatisfied - priorCountSatisfied, varSet.countNotSatisfied - priorCountNotSatisfied)
+              for varSet, (priorCountSatisfied, priorCountNotSatisfied) in zip(chain, priorCounts)]
+    logCounts = dict((level, count - priorLogCount.get(level, 0))
+                     for level, count in modelXbrl.logCount.items()
+                     if count != priorLogCount.get(level, 0))
+    errors = modelXbrl.errors[priorNumErrors:]
+    logRecords = logHandler.logRecords
+    logHandler.logRecords = []
+    return (index, logRecords, logCounts, errors, counts, time.time() - startedAt, runTimeExceeded)
@@ -0,0 +1,170 @@
+'''
+Created on Oct 23, 2013
+
+Persistent (keep-alive) http and https connections of the web cache, pooled by host, so that
+retrieving or revalidating the many documents of a taxonomy from the same server doesn't open
+(and for https, negotiate) a new connection for each document.
+
+Responses are decoded if gzip transfer encoded, and redirects are followed.  Responses have the
+methods of urllib responses used by WebCache (info, geturl, read and close), and a connection is
+returned to its pool when its response has been completely read and closed.
+
+@author: Mark V Systems Limited
+(c) Copyright 2013 Mark V Systems Limited, All rights reserved.
+'''
+import sys, socket, threading, zlib
+from collections import defaultdict
+if sys.version[0] >= '3':
+    from http import client as httpclient
+    from urllib.parse import urlsplit, urljoin, unquote
+    from urllib.error import ContentTooShortError
+else: # python 2.7.2
+    import httplib as httpclient
+    from urlparse import urlsplit, urljoin
+    from urllib import unquote
+    from urllib import ContentTooShortError
+
+MAX_REDIRECTS = 5
+REDIRECT_STATUSES = {301, 302, 303, 307, 308}
+
+class HttpConnectionPool:
+    """
+    .. class:: HttpConnectionPool(maxIdlePerHost)
+
+    Pool of idle (kept alive) connections by scheme and host, usable by concurrent threads (such as
+    those of the web cache prefetcher).
+
+    :param maxIdlePerHost: Maximum number of idle connections kept for any one host
+    :type maxIdlePerHost: int
+    """
+    def __init__(self, maxIdlePerHost=8):
+        self.maxIdlePerHost = maxIdlePerHost
+        self.lock = threading.Lock()
+        self.idleConnections = defaultdict(list) # by (scheme, host:port)
+
+    def request(self, url, headers=None, timeout=None):
+        """GET of url, following redirects, returns the HttpResponse (of any status, other than a redirect)"""
+        for i in range(MAX_REDIRECTS + 1):
+            key, connection, response = self.getresponse(url, headers or {}, timeout)
+            location = response.getheader("Location")
+            if response.status not in REDIRECT_STATUSES or not location or i == MAX_REDIRECTS:
+                return HttpResponse(self, key, connection, response, url)
+            response.read()
+            self.release(key, connection, response)
+            url = urljoin(url, location)
+
+    def getresponse(self, url, headers, timeout):
+        scheme, netloc, path, query, fragment = urlsplit(url)
+        key = (scheme, unquote(netloc)) # (quoted urls of the web cache have a quoted port separator)
+        selector = (path or "/") + ("?" + query if query else "")
+        connection = self.connection(key, timeout)
+        isReused = connection.sock is not None
+        try:
+            connection.request("GET", selector, headers=headers)
+            return key, connection, connection.getresponse()
+        except (httpclient.HTTPException, socket.error):
+            connection.close()
+            if not isReused:
+                raise
+        # server closed the idle (kept alive) connection, retry on a new connection
+        connection = self.newConnection(key, timeout)
+        try:
+            connection.request("GET", selector, headers=headers)
+            return key, connection, connection.getresponse()
+        except (httpclient.HTTPException, socket.error):
+            connection.close()
+            raise
+
+    def connection(self, key, timeout):
+        with self.lock:
+            idleConnections = self.idleConnections.get(key)
+            connection = idleConnections.pop() if idleConnections else None
+        if connection is None:
+            return self.newConnection(key, timeout)
+        connection.timeout = timeout
+        if connection.sock is not None:
+            connection.sock.settimeout(timeout)
+        return connection
+
+    def newConnection(self, key, timeout):
+        scheme, netloc = key
+        if scheme == "https":
+            return httpclient.HTTPSConnection(netloc, timeout=timeout)
+        return httpclient.HTTPConnection(netloc, timeout=timeout)
+
+    def release(self, key, connection, response):
+        """Keeps connection for reuse if its response was completely read and the server keeps it alive"""
+        if response.isclosed() and not response.will_close and connection.sock is not None:
+            with self.lock:
+                idleConnections = self.idleConnections[key]
+                if len(idleConnections) < self.maxIdlePerHost:
+                    idleConnections.append(connection)
+                    return
+        connection.close()
+
+    def close(self):
+        with self.lock:
+            connections = [connection
+                           for idleConnections in self.idleConnections.values()
+                           for connection in idleConnections]
+            self.idleConnections.clear()
+        for connection in connections:
+            connection.close()
+
+class HttpResponse:
+    """Response of a pooled connection, with the urllib response methods used by WebCache.
+
+    The body is decoded if gzip encoded (the Content-Encoding and Content-Length headers are then removed
+    from info(), as they don't apply to the decoded body).
+    """
+    def __init__(self, pool, key, connection, response, url):
+        self.pool = pool
+        self.key = key
+        self.connection = connection
+        self.response = response
+        self.url = url
+        self.status = self.code = response.status
+        self.reason = self.msg = response.reason
+        self.headers = response.msg
+        if (self.headers.get("Content-Encoding") or "").lower() in ("gzip", "x-gzip"):
+            self.decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            for header in ("Content-Encoding", "Content-Length"):
+                if header in self.headers:
+                    del self.headers[header]
+        else:
+            self.decompressor = None
+
+    def info(self):
+        return self.headers
+
+    def geturl(self):
+        return self.url
+
+    def getcode(self):
+        return self.status
+
+    def read(self, size=-1):
+        try:
+            return self.readDecoded(size)
+        except httpclient.IncompleteRead as err:
+            raise ContentTooShortError(_("retrieval incomplete: got only {0} bytes").format(len(err.partial)), None)
+        
+    def readDecoded(self, size):
+        if self.decompressor is None:
+            if size is None or size < 0:
+                return self.response.read()
+            return self.response.read(size)
+        if size is None or size < 0:
+            return self.decompressor.decompress(self.response.read()) + self.decompressor.flush()
+        while True:
+            block = self.response.read(size)
+            if not block:
+                return self.decompressor.flush()
+            data = self.decompressor.decompress(block)
+            if data:
+                return data
+
+    def close(self):
+        if self.connection is not None:
+            self.pool.release(self.key, self.connection, self.response)
+            self.connection = None
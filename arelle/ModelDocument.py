@@ -9,7 +9,7 @@ from collections import defaultdict
 from lxml import etree
 from xml.sax import SAXParseException
 from arelle import (PackageManager, XbrlConst, XmlUtil, UrlUtil, ValidateFilingText, 
-                    XhtmlValidate, XmlValidate, XmlValidateSchema)
+                    XhtmlValidate, XmlValidate, XmlValidateSchema, Tracing)
 from arelle.ModelObject import ModelObject, ModelComment
 from arelle.ModelValue import qname
 from arelle.ModelDtsObject import ModelLink, ModelResource, ModelRelationship
@@ -18,6 +18,7 @@ from arelle.ModelObjectFactory import parser
 from arelle.PrototypeDtsObject import LinkPrototype, LocPrototype, ArcPrototype
 from arelle.PluginManager import pluginClassMethods
 
+@Tracing.traced("document", "discovery", spanArgs=lambda modelXbrl, uri, *args, **kwargs: {"uri": getattr(uri, "url", uri)})
 def load(modelXbrl, uri, base=None, referringElement=None, isEntry=False, isDiscovered=False, isIncluded=None, namespace=None, reloadCache=False):
     """Returns a new modelDocument, performing DTS discovery for instance, inline XBRL, schema, 
     linkbase, and versioning report entry urls.
@@ -60,12 +61,7 @@ def load(modelXbrl, uri, base=None, referringElement=None, isEntry=False, isDisc
             modelXbrl.urlUnloadableDocs[normalizedUri] = blocked
         if blocked:
             return None
-    if modelXbrl.fileSource.isMappedUrl(normalizedUri):
-        mappedUri = modelXbrl.fileSource.mappedUrl(normalizedUri)
-    elif PackageManager.isMappedUrl(normalizedUri):
-        mappedUri = PackageManager.mappedUrl(normalizedUri)
-    else:
-        mappedUri = modelXbrl.modelManager.disclosureSystem.mappedUrl(normalizedUri)
+    mappedUri = mappedUrl(modelXbrl, normalizedUri)
         
     if isEntry:
         modelXbrl.entryLoadingUrl = mappedUri   # for error loggiong during loading
@@ -174,6 +170,7 @@ def load(modelXbrl, uri, base=None, referringElement=None, isEntry=False, isDisc
     
     rootNode = xmlDocument.getroot()
     if rootNode is not None:
+        prefetchReferencedDocuments(modelXbrl, rootNode, normalizedUri)
         ln = rootNode.localName
         ns = rootNode.namespaceURI
         
@@ -297,6 +294,51 @@ def load(modelXbrl, uri, base=None, referringElement=None, isEntry=False, isDisc
 
     return modelDocument
 
+def mappedUrl(modelXbrl, normalizedUri):
+    """Url to load for normalizedUri, per the file source, package or disclosure system url mappings"""
+    if modelXbrl.fileSource.isMappedUrl(normalizedUri):
+        return modelXbrl.fileSource.mappedUrl(normalizedUri)
+    elif PackageManager.isMappedUrl(normalizedUri):
+        return PackageManager.mappedUrl(normalizedUri)
+    return modelXbrl.modelManager.disclosureSystem.mappedUrl(normalizedUri)
+
+prefetchedElementTags = ("{http://www.w3.org/2001/XMLSchema}import",
+                         "{http://www.w3.org/2001/XMLSchema}include",
+                         "{http://www.w3.org/2001/XMLSchema}redefine",
+                         "{http://www.xbrl.org/2003/linkbase}linkbaseRef",
+                         "{http://www.xbrl.org/2003/linkbase}schemaRef",
+                         "{http://www.xbrl.org/2003/linkbase}roleRef",
+                         "{http://www.xbrl.org/2003/linkbase}arcroleRef",
+                         "{http://www.xbrl.org/2003/linkbase}loc")
+
+def prefetchReferencedDocuments(modelXbrl, rootNode, baseUri):
+    """Queues retrieval (into the web cache) of web documents referenced by a parsed document, such as 
+    its imported schemas, linkbaseRefs and locators, so that they are already cached when discovered.
+    """
+    webCache = modelXbrl.modelManager.cntlr.webCache
+    prefetcher = webCache.prefetcher
+    if prefetcher is None:
+        return
+    hrefs = set()
+    for element in rootNode.iter(*prefetchedElementTags):
+        href = element.get("schemaLocation") or element.get("{http://www.w3.org/1999/xlink}href")
+        if href:
+            hrefs.add(href.partition("#")[0])
+    disclosureSystem = modelXbrl.modelManager.disclosureSystem
+    for href in hrefs:
+        if not href:
+            continue
+        normalizedUri = webCache.normalizeUrl(href, baseUri)
+        if normalizedUri in modelXbrl.urlDocs or normalizedUri in modelXbrl.urlUnloadableDocs:
+            continue
+        if modelXbrl.modelManager.validateDisclosureSystem and \
+           not normalizedUri.startswith(modelXbrl.uriDir) and \
+           not disclosureSystem.hrefValid(normalizedUri):
+            continue # prohibited file, not loaded
+        url = mappedUrl(modelXbrl, normalizedUri)
+        if UrlUtil.isHttpUrl(url) and not modelXbrl.fileSource.isInArchive(url):
+            prefetcher.prefetch(url)
+
 def loadSchemalocatedSchema(modelXbrl, element, relativeUrl, namespace, baseUrl):
     importSchemaLocation = modelXbrl.modelManager.cntlr.webCache.normalizeUrl(relativeUrl, baseUrl)
     doc = load(modelXbrl, importSchemaLocation, isIncluded=False, isDiscovered=False, namespace=namespace, referringElement=element)
@@ -379,6 +379,19 @@ class ModelConcept(ModelNamableTerm, ModelParticle):
         """(dict) -- Facets declared for element type"""
         return self.type.facets if self.type is not None else None
     
+    @property
+    def valueValidator(self):
+        """(function) -- Validator of values of the element type (per baseXsdType and facets), see XmlValidate.valueValidator"""
+        try:
+            return self._valueValidator
+        except AttributeError:
+            facets = self.facets
+            if facets: # kept by this type definition, not by XmlValidate for the life of the process
+                self._valueValidator = XmlValidate.compileValueValidator(self.baseXsdType, facets)
+            else:
+                self._valueValidator = XmlValidate.valueValidator(self.baseXsdType)
+            return self._valueValidator
+    
     ''' unused, remove???
     def baseXsdAttrType(self,attrName):
         try:
@@ -791,11 +804,12 @@ class ModelAttribute(ModelNamableTerm):
         except AttributeError:
             typeqname = self.typeQname
             if typeqname is None:   # anyType is default type
-                return "anyType"
-            if typeqname.namespaceURI == XbrlConst.xsd:
-                return typeqname.localName
-            type = self.type
-            self._baseXsdType = type.baseXsdType if type is not None else None
+                self._baseXsdType = "anyType"
+            elif typeqname.namespaceURI == XbrlConst.xsd:
+                self._baseXsdType = typeqname.localName
+            else:
+                type = self.type
+                self._baseXsdType = type.baseXsdType if type is not None else None
             return self._baseXsdType
     
     @property
@@ -808,6 +822,19 @@ class ModelAttribute(ModelNamableTerm):
             self._facets = type.facets if type is not None else None
             return self._facets
     
+    @property
+    def valueValidator(self):
+        """(function) -- Validator of values of the attribute type (per baseXsdType and facets), see XmlValidate.valueValidator"""
+        try:
+            return self._valueValidator
+        except AttributeError:
+            facets = self.facets
+            if facets: # kept by this type definition, not by XmlValidate for the life of the process
+                self._valueValidator = XmlValidate.compileValueValidator(self.baseXsdType, facets)
+            else:
+                self._valueValidator = XmlValidate.valueValidator(self.baseXsdType)
+            return self._valueValidator
+    
     @property
     def isNumeric(self):
         """(bool) -- True for a numeric xsd base type (not including xbrl fractions)"""
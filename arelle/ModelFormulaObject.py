@@ -146,6 +146,7 @@ class FormulaOptions():
         self.traceVariableExpressionCode = False
         self.traceVariableExpressionEvaluation = False
         self.traceVariableExpressionResult = False
+        self.parallelWorkers = 0 # worker processes to evaluate assertions concurrently (if more than 1)
         if isinstance(savedValues, dict):
             self.__dict__.update(savedValues)
             
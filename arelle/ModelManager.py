@@ -44,6 +44,14 @@ class ModelManager:
         .. attribute:: defaultLang
         
         The default language code for labels selection and views (e.g. 'en-US'), set from the operating system defaults on startup.
+
+        .. attribute:: dtsCache
+        
+        DtsCache of discovered base taxonomies shared by successive loads, or None if not enabled (see DtsCache.py).
+
+        .. attribute:: xpathProgCache
+        
+        XPathProgCache of parsed formula XPath programs persisted between runs, or None if disabled or there is no file system (see XPathProgCache.py).
     """
     
     def __init__(self, cntlr):
@@ -54,8 +62,18 @@ class ModelManager:
         self.validateInferDecimals = False
         self.validateInfoset = False
         self.validateUtr = False
+        self.validateTextBlockWorkers = 0 # worker processes to validate text block facts concurrently (if more than 1)
+        self.validateTestcaseWorkers = 0 # worker processes to validate testcases of a testcases index concurrently (if more than 1)
+        self.validateRssWorkers = 0 # worker processes to process RSS feed items concurrently (if more than 1)
+        self.rssPrefetchFilings = None # RSS items whose filings are retrieved ahead of processing (default one per worker)
         self.abortOnMajorError = False
         self.collectProfileStats = False
+        self.dtsCache = None
+        if cntlr.hasFileSystem:
+            from arelle.XPathProgCache import XPathProgCache
+            self.xpathProgCache = XPathProgCache(cntlr)
+        else:
+            self.xpathProgCache = None
         self.loadedModelXbrls = []
         from arelle import Locale
         self.locale = Locale.getUserLocale(cntlr.config.get("userInterfaceLocaleOverride",""))
@@ -63,6 +81,11 @@ class ModelManager:
 
     def shutdown(self):
         self.status = "shutdown"
+        if self.dtsCache is not None:
+            self.dtsCache.close()
+            self.dtsCache = None
+        if self.xpathProgCache is not None:
+            self.xpathProgCache.save()
         
     def addToLog(self, message, messageCode="", file="", level=logging.INFO):
         """Add a simple info message to the default logger
@@ -82,6 +82,67 @@ def baseSetRelationship(arcElement):
             return rel
     return None
 
+class LinkArcs:
+    """Arcs of an extended link, indexed by arcrole, and their relationships (built on first use)"""
+    __slots__ = ("modelLink", "arcs", "arcroles", "arcRelationships")
+    
+    def __init__(self, modelLink):
+        self.modelLink = modelLink
+        self.arcs = [] # arc elements in document order
+        self.arcroles = defaultdict(list) # indexes of arcs by arcrole
+        for linkChild in modelLink:
+            linkChildArcrole = linkChild.get("{http://www.w3.org/1999/xlink}arcrole")
+            if linkChild.get("{http://www.w3.org/1999/xlink}type") == "arc" and linkChildArcrole:
+                self.arcroles[linkChildArcrole].append(len(self.arcs))
+                self.arcs.append(linkChild)
+        self.arcRelationships = {} # by index of arc
+        
+    def relationships(self, i):
+        """Relationships of the arc with index i, as (modelRelationship, equivalenceKey) tuples"""
+        try:
+            return self.arcRelationships[i]
+        except KeyError:
+            modelLink = self.modelLink
+            arcElement = self.arcs[i]
+            fromLabel = arcElement.get("{http://www.w3.org/1999/xlink}from")
+            toLabel = arcElement.get("{http://www.w3.org/1999/xlink}to")
+            rels = []
+            for fromResource in modelLink.labeledResources[fromLabel]:
+                for toResource in modelLink.labeledResources[toLabel]:
+                    if isinstance(fromResource,(ModelResource,LocPrototype)) and isinstance(toResource,(ModelResource,LocPrototype)):
+                        modelRel = ModelDtsObject.ModelRelationship(modelLink.modelDocument, arcElement, fromResource.dereference(), toResource.dereference())
+                        rels.append((modelRel, modelRel.equivalenceKey)) # equivalenceKey is a complex tuple to compute, get once
+            self.arcRelationships[i] = rels
+            return rels
+
+class ArcIndex:
+    """
+    .. class:: ArcIndex(modelXbrl)
+
+    Index of the arcs of each extended link of the DTS (modelXbrl.arcIndex), so that building relationship sets 
+    (of each arcrole, linkrole, link and arc qname, and collective arcroles) doesn't scan the children of each base set's 
+    links again, and relationships are resolved (with their equivalence keys) once, shared by all relationship sets 
+    including the arc.  The index is discarded when documents have been added to the DTS since it was built (such
+    as by importing), as locators may then resolve differently.
+    """
+    def __init__(self, modelXbrl):
+        self.numDocuments = len(modelXbrl.urlDocs)
+        self.links = {} # LinkArcs by modelLink
+        
+    @staticmethod
+    def of(modelXbrl):
+        arcIndex = modelXbrl.arcIndex
+        if arcIndex is None or arcIndex.numDocuments != len(modelXbrl.urlDocs):
+            modelXbrl.arcIndex = arcIndex = ArcIndex(modelXbrl)
+        return arcIndex
+        
+    def linkArcs(self, modelLink):
+        try:
+            return self.links[modelLink]
+        except KeyError:
+            self.links[modelLink] = linkArcs = LinkArcs(modelLink)
+            return linkArcs
+
 class ModelRelationshipSet:
     __slots__ = ("isChanged", "modelXbrl", "arcrole", "linkrole", "linkqname", "arcqname",
                  "modelRelationshipsFrom", "modelRelationshipsTo", "modelConceptRoots", "modellinkRoleUris",
@@ -114,42 +175,37 @@ class ModelRelationshipSet:
         isFootnoteRel =  self.arcrole == "XBRL-footnotes" # all footnote relationship arcroles
         if not isinstance(arcrole,(tuple,frozenset)):
             arcrole = (arcrole,)
+        arcIndex = ArcIndex.of(modelXbrl)
         
         for modelLink in modelLinks:
-            arcs = []
+            linkArcs = arcIndex.linkArcs(modelLink)
             linkEltQname = modelLink.qname
-            for linkChild in modelLink:
-                linkChildArcrole = linkChild.get("{http://www.w3.org/1999/xlink}arcrole")
-                if linkChild.get("{http://www.w3.org/1999/xlink}type") == "arc" and linkChildArcrole:
-                    linkChildQname = linkChild
-                    if isFootnoteRel:
-                        arcs.append(linkChild)
-                    elif isDimensionRel: 
-                        if XbrlConst.isDimensionArcrole(linkChildArcrole):
-                            arcs.append(linkChild)
-                    elif isFormulaRel:
-                        if XbrlConst.isFormulaArcrole(linkChildArcrole):
-                            arcs.append(linkChild)
-                    elif isTableRenderingRel:
-                        if XbrlConst.isTableRenderingArcrole(linkChildArcrole):
-                            arcs.append(linkChild)
-                    elif (linkChildArcrole in arcrole and 
-                          (arcqname is None or arcqname == linkChildQname) and 
-                          (linkqname is None or linkqname == linkEltQname)):
-                        arcs.append(linkChild)
+            if isFootnoteRel:
+                linkArcroles = linkArcs.arcroles
+            elif isDimensionRel: 
+                linkArcroles = [ar for ar in linkArcs.arcroles if XbrlConst.isDimensionArcrole(ar)]
+            elif isFormulaRel:
+                linkArcroles = [ar for ar in linkArcs.arcroles if XbrlConst.isFormulaArcrole(ar)]
+            elif isTableRenderingRel:
+                linkArcroles = [ar for ar in linkArcs.arcroles if XbrlConst.isTableRenderingArcrole(ar)]
+            elif linkqname is None or linkqname == linkEltQname:
+                linkArcroles = [ar for ar in arcrole if ar in linkArcs.arcroles]
+            else:
+                continue
+            if len(linkArcroles) == 1:
+                arcIndexes = linkArcs.arcroles[linkArcroles[0]]
+            else: # arcs of several arcroles in document order
+                arcIndexes = sorted(i for ar in linkArcroles for i in linkArcs.arcroles[ar])
                         
             # build network
-            for arcElement in arcs:
-                fromLabel = arcElement.get("{http://www.w3.org/1999/xlink}from")
-                toLabel = arcElement.get("{http://www.w3.org/1999/xlink}to")
-                for fromResource in modelLink.labeledResources[fromLabel]:
-                    for toResource in modelLink.labeledResources[toLabel]:
-                        if isinstance(fromResource,(ModelResource,LocPrototype)) and isinstance(toResource,(ModelResource,LocPrototype)):
-                            modelRel = ModelDtsObject.ModelRelationship(modelLink.modelDocument, arcElement, fromResource.dereference(), toResource.dereference())
-                            modelRelEquivalenceKey = modelRel.equivalenceKey    # this is a complex tuple to compute, get once for below
-                            if modelRelEquivalenceKey not in relationships or \
-                               modelRel.priorityOver(relationships[modelRelEquivalenceKey]):
-                                relationships[modelRelEquivalenceKey] = modelRel
+            isArcqnameFiltered = arcqname is not None and not (isFootnoteRel or isDimensionRel or isFormulaRel or isTableRenderingRel)
+            for i in arcIndexes:
+                if isArcqnameFiltered and arcqname != linkArcs.arcs[i]:
+                    continue
+                for modelRel, modelRelEquivalenceKey in linkArcs.relationships(i):
+                    if modelRelEquivalenceKey not in relationships or \
+                       modelRel.priorityOver(relationships[modelRelEquivalenceKey]):
+                        relationships[modelRelEquivalenceKey] = modelRel
 
         #reduce effective arcs and order relationships...
         self.modelRelationshipsFrom = None
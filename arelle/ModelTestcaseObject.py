@@ -16,6 +16,7 @@ class ModelTestcaseVariation(ModelObject):
         self.status = ""
         self.actual = []
         self.assertions = None
+        self.duration = None # seconds to validate the variation
         
     @property
     def id(self):
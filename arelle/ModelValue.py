@@ -86,6 +86,8 @@ class QName:
         self.qnameValueHash = ((hash(namespaceURI) * 1000003) & 0xffffffff) ^ hash(localName)
     def __hash__(self):
         return self.qnameValueHash
+    def __reduce__(self): # unpickled with hash of the unpickling process (string hashes may be randomized)
+        return (QName, (self.prefix, self.namespaceURI, self.localName))
     @property
     def clarkNotation(self):
         if self.namespaceURI:
@@ -262,17 +264,16 @@ class DateTime(datetime.datetime):
                 return DateTime(dt.year, dt.month, dt.day, dt.hour, dt.minute, dt.second, dt.microsecond, dt.tzinfo, self.dateOnly)
     
 def dateUnionEqual(dateUnion1, dateUnion2, instantEndDate=False):
-    if isinstance(dateUnion1,DateTime):
-        if instantEndDate and dateUnion1.dateOnly:
-            dateUnion1 += datetime.timedelta(1)
-    elif isinstance(dateUnion1,datetime.date):
-        dateUnion1 = dateTime(dateUnion1, addOneDay=instantEndDate)
-    if isinstance(dateUnion2,DateTime):
-        if instantEndDate and dateUnion2.dateOnly:
-            dateUnion2 += datetime.timedelta(1)
-    elif isinstance(dateUnion2,datetime.date):
-        dateUnion2 = dateTime(dateUnion2, addOneDay=instantEndDate)
-    return dateUnion1 == dateUnion2
+    return dateUnionKey(dateUnion1, instantEndDate) == dateUnionKey(dateUnion2, instantEndDate)
+        
+def dateUnionKey(dateUnion, instantEndDate=False):
+    # datetime value which is equal (and hashes equal) for dateUnionEqual date unions
+    if isinstance(dateUnion,DateTime):
+        if instantEndDate and dateUnion.dateOnly:
+            dateUnion += datetime.timedelta(1)
+    elif isinstance(dateUnion,datetime.date):
+        dateUnion = dateTime(dateUnion, addOneDay=instantEndDate)
+    return dateUnion
         
 def dateunionDate(datetimeValue, subtractOneDay=False):
     isDate = (hasattr(datetimeValue,'dateOnly') and datetimeValue.dateOnly) or not hasattr(datetimeValue, 'hour')
@@ -7,7 +7,7 @@ Created on Oct 3, 2010
 from collections import defaultdict
 import os, sys, traceback, uuid
 import logging
-from arelle import UrlUtil, XmlUtil, ModelValue, XbrlConst, XmlValidate
+from arelle import UrlUtil, XmlUtil, ModelValue, XbrlConst, XmlValidate, Tracing
 from arelle.FileSource import FileNamedStringIO
 from arelle.ModelObject import ModelObject, ObjectPropertyViewWrapper
 from arelle.Locale import format_string
@@ -22,8 +22,44 @@ AUTO_LOCATE_ELEMENT = '771407c0-1d0c-11e1-be5e-028037ec0200' # singleton meaning
 DEFAULT = sys.intern(_STR_8BIT("default"))
 NONDEFAULT = sys.intern(_STR_8BIT("non-default"))
 DEFAULTorNONDEFAULT = sys.intern(_STR_8BIT("default-or-non-default"))
+NIL = sys.intern(_STR_8BIT("nil"))
+    
+def periodKey(periodType, periodStart, periodEndInstant):
+    """Hashable period which is equal for dateUnionEqual periods of the periodType (for matching contexts)"""
+    if periodType == "instant":
+        return (periodType, None, ModelValue.dateUnionKey(periodEndInstant, instantEndDate=True))
+    elif periodType == "duration":
+        return (periodType, ModelValue.dateUnionKey(periodStart), ModelValue.dateUnionKey(periodEndInstant, instantEndDate=True))
+    return (periodType, None, None)
+
+def dimsKey(dims):
+    """Hashable set of dimension QNames with explicit member QNames (typed members are compared when matching contexts)
+    
+    :param dims: dict by dimension QName of ModelDimensionValue, DimValuePrototype, explicit member QName, or typed member nodes
+    """
+    return frozenset((dimQname, 
+                      dimValue if isinstance(dimValue, ModelValue.QName) else
+                      dimValue.memberQname if getattr(dimValue, "isExplicit", False) else
+                      None)
+                     for dimQname, dimValue in dims.items())
+
+def factKey(fact):
+    """Hashable values which are equal for facts which may be v-equal (items) or duplicates (tuples), 
+    (for matching facts of different instances)"""
+    if fact.isTuple:
+        return (fact.qname,)
+    if fact.isNil: # nil items are v-equal regardless of context and unit
+        return (fact.qname, NIL)
+    context = fact.context
+    if context is None:
+        return (fact.qname, None)
+    concept = fact.concept
+    unit = fact.unit if concept is not None and concept.isNumeric else None
+    return (fact.qname, context.periodHash, context.entityIdentifierHash, 
+            unit.hash if unit is not None else None)
     
 
+@Tracing.traced("load", "load", spanArgs=lambda modelManager, url, *args, **kwargs: {"url": getattr(url, "url", url)})
 def load(modelManager, url, nextaction=None, base=None, useFileSource=None, errorCaptureLevel=None):
     """Each loaded instance, DTS, testcase, testsuite, versioning report, or RSS feed, is represented by an 
     instance of a ModelXbrl object. The ModelXbrl object has a collection of ModelDocument objects, each 
@@ -54,6 +90,9 @@ def load(modelManager, url, nextaction=None, base=None, useFileSource=None, erro
     else:
         modelXbrl.fileSource = FileSource.FileSource(url, modelManager.cntlr)
         modelXbrl.closeFileSource= True
+    if modelManager.dtsCache is not None:
+        # attach already discovered base taxonomy documents, only the filing's own documents are loaded
+        modelManager.dtsCache.attach(modelXbrl, url, base)
     modelXbrl.modelDocument = ModelDocument.load(modelXbrl, url, base, isEntry=True)
     del modelXbrl.entryLoadingUrl
     if modelXbrl.modelDocument is not None and modelXbrl.modelDocument.type < ModelDocument.Type.DTSENTRIES:
@@ -146,6 +185,10 @@ class ModelXbrl:
 
         Dict of effective relationship sets indexed same as baseSets (including collective indices), but lazily resolved when requested.
 
+        .. attribute:: arcIndex
+
+        ModelRelationshipSet.ArcIndex of the arcs of base set links and their relationships, shared by relationship sets (None until a relationship set is resolved).
+
         .. attribute:: qnameDimensionDefaults
 
         Dict of dimension defaults by qname of dimension
@@ -250,6 +293,7 @@ class ModelXbrl:
         self.qnameTypes = {} # contains ModelTypes by qname key of type
         self.baseSets = defaultdict(list) # contains ModelLinks for keys arcrole, arcrole#linkrole
         self.relationshipSets = {} # contains ModelRelationshipSets by bas set keys
+        self.arcIndex = None # arcs and relationships of base set links, when relationship sets are resolved
         self.qnameDimensionDefaults = {} # contains qname of dimension (index) and default member(value)
         self.facts = []
         self.factsInInstance = set()
@@ -286,6 +330,8 @@ class ModelXbrl:
                 self.formulaOutputInstance.close()
             if hasattr(self,"fileSource") and self.closeFileSource:
                 self.fileSource.close()
+            if hasattr(self,"dtsCacheEntry"):
+                self.dtsCacheEntry.detach() # cached documents are not closed with this modelXbrl
             modelDocument = getattr(self,"modelDocument",None)
             urlDocs = getattr(self,"urlDocs",None)
             for relSet in self.relationshipSets.values():
@@ -310,6 +356,8 @@ class ModelXbrl:
         :param reloadCache: bool
         """
         from arelle import ModelDocument
+        if hasattr(self,"dtsCacheEntry"):
+            self.dtsCacheEntry.detach()
         self.init(keepViews=True)
         self.modelDocument = ModelDocument.load(self, self.fileSource.url, isEntry=True, reloadCache=reloadCache)
         self.modelManager.showStatus(_("xbrl loading finished, {0}...").format(nextaction),5000)
@@ -453,16 +501,20 @@ class ModelXbrl:
         :returns: ModelContext -- Matching context or None
         """
         from arelle.ModelFormulaObject import Aspect
-        from arelle.ModelValue import dateUnionEqual
         from arelle.XbrlUtil import sEqual
         if dims: segAspect, scenAspect = (Aspect.NON_XDT_SEGMENT, Aspect.NON_XDT_SCENARIO)
         else: segAspect, scenAspect = (Aspect.COMPLETE_SEGMENT, Aspect.COMPLETE_SCENARIO)
-        for c in self.contexts.values():
-            if (c.entityIdentifier == (entityIdentScheme, entityIdentValue) and
-                ((c.isInstantPeriod and periodType == "instant" and dateUnionEqual(c.instantDatetime, periodEndInstant, instantEndDate=True)) or
-                 (c.isStartEndPeriod and periodType == "duration" and dateUnionEqual(c.startDatetime, periodStart) and dateUnionEqual(c.endDatetime, periodEndInstant, instantEndDate=True)) or
-                 (c.isForeverPeriod and periodType == "forever")) and
-                 # dimensions match if dimensional model
+        # candidates have equal entity identifier, period and (if dimensional) explicit dimension members
+        cntxsByDims = self.contextIndex.get(((entityIdentScheme, entityIdentValue),
+                                             periodKey(periodType, periodStart, periodEndInstant)))
+        if not cntxsByDims:
+            return None
+        if dims is None:
+            cntxs = sorted((c for _cntxs in cntxsByDims.values() for c in _cntxs), key=lambda c: c.objectIndex)
+        else:
+            cntxs = cntxsByDims.get(dimsKey(dims), ())
+        for c in cntxs:
+            if (# dimensions match if dimensional model
                  (dims is None or (
                     (c.qnameDims.keys() == dims.keys()) and
                         all([cDim.isEqualTo(dims[cDimQn]) for cDimQn, cDim in c.qnameDims.items()]))) and
@@ -475,6 +527,36 @@ class ModelXbrl:
                 ):
                     return c
         return None
+    
+    @property
+    def contextIndex(self):
+        """Contexts indexed by entity identifier and period, and then by explicit dimension members (for matchContext),
+        maintained as contexts are created, and rebuilt if contexts were otherwise added or removed
+        
+        :returns: dict -- index is (entityIdentifier, periodKey), value is dict of lists of contexts by dimsKey
+        """
+        try:
+            if self._contextIndexCount == len(self.contexts):
+                return self._contextIndex
+        except AttributeError:
+            pass
+        self._contextIndex = defaultdict(lambda: defaultdict(list))
+        self._contextIndexCount = 0
+        for c in self.contexts.values():
+            self.indexContext(c)
+        return self._contextIndex
+    
+    def indexContext(self, cntx):
+        if cntx.isInstantPeriod:
+            key = periodKey("instant", None, cntx.instantDatetime)
+        elif cntx.isStartEndPeriod:
+            key = periodKey("duration", cntx.startDatetime, cntx.endDatetime)
+        elif cntx.isForeverPeriod:
+            key = periodKey("forever", None, None)
+        else:
+            key = None
+        self._contextIndex[cntx.entityIdentifier, key][dimsKey(cntx.qnameDims)].append(cntx)
+        self._contextIndexCount += 1
                  
     def createContext(self, entityIdentScheme, entityIdentValue, periodType, periodStart, periodEndInstant, priItem, dims, segOCCs, scenOCCs,
                       afterSibling=None, beforeSibling=None, id=None):
@@ -588,6 +670,11 @@ class ModelXbrl:
                 
         self.modelDocument.contextDiscover(newCntxElt)
         XmlValidate.validate(self, newCntxElt)
+        if hasattr(self, "_contextIndex"):
+            if self._contextIndexCount + 1 == len(self.contexts):
+                self.indexContext(newCntxElt)
+            else: # id of an existing context was reused
+                del self._contextIndex
         return newCntxElt
         
         
@@ -602,10 +689,30 @@ class ModelXbrl:
         """
         multiplyBy.sort()
         divideBy.sort()
+        return self.unitIndex.get( (tuple(multiplyBy), tuple(divideBy)) )
+    
+    @property
+    def unitIndex(self):
+        """First unit of each measures (for matchUnit), maintained as units are created, and rebuilt
+        if units were otherwise added or removed
+        
+        :returns: dict -- index is tuple of multiply and tuple of divide measures, value is ModelUnit
+        """
+        try:
+            if self._unitIndexCount == len(self.units):
+                return self._unitIndex
+        except AttributeError:
+            pass
+        self._unitIndex = {}
+        self._unitIndexCount = 0
         for u in self.units.values():
-            if u.measures == (multiplyBy,divideBy):
-                return u
-        return None
+            self.indexUnit(u)
+        return self._unitIndex
+    
+    def indexUnit(self, unit):
+        multiplyBy, divideBy = unit.measures
+        self._unitIndex.setdefault( (tuple(multiplyBy), tuple(divideBy)), unit )
+        self._unitIndexCount += 1
 
     def createUnit(self, multiplyBy, divideBy, afterSibling=None, beforeSibling=None, id=None):
         """Creates new unit, by measures, as in formula usage, if any
@@ -641,6 +748,11 @@ class ModelXbrl:
                 XmlUtil.addChild(denElt, XbrlConst.xbrli, "measure", text=XmlUtil.addQnameValue(xbrlElt, divide))
         self.modelDocument.unitDiscover(newUnitElt)
         XmlValidate.validate(self, newUnitElt)
+        if hasattr(self, "_unitIndex"):
+            if self._unitIndexCount + 1 == len(self.units):
+                self.indexUnit(newUnitElt)
+            else: # id of an existing unit was reused
+                del self._unitIndex
         return newUnitElt
     
     @property
@@ -748,7 +860,7 @@ class ModelXbrl:
         :type otherFact: ModelFact
         :returns: ModelFact -- Matching fact or None
         """
-        for fact in self.facts:
+        for fact in self.factIndex.get(factKey(otherFact), ()): # candidates in document order
             if (fact.isTuple):
                 if otherFact.isDuplicateOf(fact, unmatchedFactsStack=unmatchedFactsStack):
                     return fact
@@ -761,6 +873,32 @@ class ModelXbrl:
                         fact.precision == otherFact.precision):
                         return fact
         return None
+    
+    @property
+    def factIndex(self):
+        """Top level facts indexed by factKey (for matchFact), maintained as facts are created, and rebuilt
+        if facts were otherwise removed
+        
+        :returns: dict -- index is factKey, value is list of ModelFacts in document order
+        """
+        try:
+            if self._factIndexCount == len(self.facts):
+                return self._factIndex
+            if self._factIndexCount < len(self.facts): # facts appended (such as by loading or createFact)
+                for fact in self.facts[self._factIndexCount:]:
+                    self.indexFact(fact)
+                return self._factIndex
+        except AttributeError:
+            pass
+        self._factIndex = defaultdict(list)
+        self._factIndexCount = 0
+        for fact in self.facts:
+            self.indexFact(fact)
+        return self._factIndex
+    
+    def indexFact(self, fact):
+        self._factIndex[factKey(fact)].append(fact)
+        self._factIndexCount += 1
             
     def createFact(self, conceptQname, attributes=None, text=None, parent=None, afterSibling=None, beforeSibling=None):
         """Creates new fact, as in formula output instance creation, and validates into object model
@@ -783,6 +921,8 @@ class ModelXbrl:
                                    afterSibling=afterSibling, beforeSibling=beforeSibling)
         self.modelDocument.factDiscover(newFact, parentElement=parent)
         XmlValidate.validate(self, newFact)
+        if hasattr(self, "_factIndex") and self._factIndexCount + 1 == len(self.facts): 
+            self.indexFact(newFact) # top level fact (facts in tuples aren't indexed)
         return newFact    
         
     def modelObject(self, objectId):
@@ -820,18 +960,12 @@ class ModelXbrl:
                             modelObject,
                             err, traceback.format_tb(sys.exc_info()[2])))
 
-    def logArguments(self, codes, msg, codedArgs):
-        """ Prepares arguments for logger function as per info() below.
+    def effectiveMessageCode(self, codes):
+        """Message code to log of codes (an error code or tuple of error codes).
         
         If codes includes EFM, GFM, HMRC, or SBR-coded error then the code chosen (if a sequence)
         corresponds to whether EFM, GFM, HMRC, or SBR validation is in effect.
         """
-        def propValues(properties):
-            # deref objects in properties
-            return [(p[0],str(p[1])) if len(p) == 2 else (p[0],str(p[1]),propValues(p[2]))
-                    for p in properties if 2 <= len(p) <= 3]
-        # determine logCode
-        messageCode = None
         for argCode in codes if isinstance(codes,tuple) else (codes,):
             if (isinstance(argCode, ModelValue.QName) or
                 (self.modelManager.disclosureSystem.EFM and argCode.startswith("EFM")) or
@@ -839,22 +973,52 @@ class ModelXbrl:
                 (self.modelManager.disclosureSystem.HMRC and argCode.startswith("HMRC")) or
                 (self.modelManager.disclosureSystem.SBRNL and argCode.startswith("SBR.NL")) or
                 argCode[0:3] not in ("EFM", "GFM", "HMR", "SBR")):
-                messageCode = argCode
-                break
+                return argCode
+        return None
+    
+    @property
+    def logEntryUrl(self):
+        """Url which refs of log messages are relative to (entry document, or entry being loaded)"""
+        try:
+            return self.modelDocument.uri
+        except AttributeError:
+            try:
+                return self.entryLoadingUrl
+            except AttributeError:
+                try:
+                    return self.fileSource.url
+                except AttributeError:
+                    return None
+
+    def logArguments(self, codes, msg, codedArgs):
+        """ Prepares arguments for logger function as per info() below.
         
+        If codes includes EFM, GFM, HMRC, or SBR-coded error then the code chosen (if a sequence)
+        corresponds to whether EFM, GFM, HMRC, or SBR validation is in effect.
+        """
+        messageCode = self.effectiveMessageCode(codes)
+        fmtArgs, extras = self.logArgumentsAndRefs(codedArgs, self.logEntryUrl)
+        extras["messageCode"] = messageCode
+        return (messageCode, 
+                (msg, fmtArgs) if fmtArgs else (msg,), 
+                extras)
+        
+    def logArgumentsAndRefs(self, codedArgs, entryUrl):
+        """Resolves message arguments (to strings) and refs (of model objects and source files) of logged 
+        message arguments, as per info() below.
+        
+        :returns: (dict, dict) -- message format arguments, and extras with refs (and any sourceLine) 
+        """
+        def propValues(properties):
+            # deref objects in properties
+            return [(p[0],str(p[1])) if len(p) == 2 else (p[0],str(p[1]),propValues(p[2]))
+                    for p in properties if 2 <= len(p) <= 3]
         # determine message and extra arguments
         fmtArgs = {}
-        extras = {"messageCode":messageCode}
+        extras = {}
         logHrefObjectProperties = getattr(self.logger, "logHrefObjectProperties", False)
         for argName, argValue in codedArgs.items():
             if argName in ("modelObject", "modelXbrl", "modelDocument"):
-                try:
-                    entryUrl = self.modelDocument.uri
-                except AttributeError:
-                    try:
-                        entryUrl = self.entryLoadingUrl
-                    except AttributeError:
-                        entryUrl = self.fileSource.url
                 refs = []
                 for arg in (argValue if isinstance(argValue, (tuple,list,set)) else (argValue,)):
                     if arg is not None:
@@ -938,9 +1102,7 @@ class ModelXbrl:
                 except:
                     file = ""
             extras["refs"] = [{"href": file}]
-        return (messageCode, 
-                (msg, fmtArgs) if fmtArgs else (msg,), 
-                extras)
+        return (fmtArgs, extras)
         
     def info(self, codes, msg, **args):
         """Same as error(), but as info
@@ -956,7 +1118,7 @@ class ModelXbrl:
         """Same as error(), but level passed in as argument
         """
         logger = self.logger
-        messageCode, logArgs, extras = self.logArguments(codes, msg, args)
+        messageCode = self.effectiveMessageCode(codes)
         if messageCode == "asrtNoLog":
             self.errors.append(args["assertionResults"])
         elif (messageCode and
@@ -966,7 +1128,12 @@ class ModelXbrl:
             self.logCount[numericLevel] = self.logCount.get(numericLevel, 0) + 1
             if numericLevel >= self.errorCaptureLevel:
                 self.errors.append(messageCode)
-            logger.log(numericLevel, *logArgs, exc_info=args.get("exc_info"), extra=extras)
+            if logger.isEnabledFor(numericLevel):
+                # message arguments and refs are resolved when the record is formatted (or kept) by a handler
+                exc_info = args.get("exc_info")
+                if exc_info and not isinstance(exc_info, tuple):
+                    exc_info = sys.exc_info()
+                logger.handle(ModelXbrlLogRecord(self, logger.name, numericLevel, messageCode, msg, args, exc_info))
                     
     def error(self, codes, msg, **args):
         """Logs a message as info, by code, logging-system message text (using %(name)s named arguments 
@@ -1015,6 +1182,8 @@ class ModelXbrl:
         5xx validation
         6xx formula
         '''
+        if Tracing.tracer is not None and stat is None:
+            Tracing.tracer.phase(self, name)
         if self.modelManager.collectProfileStats:
             import time
             global profileStatNumber
@@ -1043,6 +1212,8 @@ class ModelXbrl:
         :type minTimeToShow: seconds
         """
         import time
+        if Tracing.tracer is not None:
+            Tracing.tracer.phase(self, activityCompleted, "activity")
         try:
             if activityCompleted:
                 timeTaken = time.time() - self._startedProfiledActivity
@@ -1072,3 +1243,59 @@ class ModelXbrl:
                   _("DTS of %(entryFile)s has %(numberOfFiles)s files packaged into %(packageOutputFile)s"), 
                 modelObject=self,
                 entryFile=os.path.basename(entryFilename), packageOutputFile=pkgFilename, numberOfFiles=numFiles)
+
+class ModelXbrlLogRecord(logging.LogRecord):
+    """
+    .. class:: ModelXbrlLogRecord(modelXbrl, name, level, messageCode, msg, codedArgs, exc_info)
+    
+    Log record of a ModelXbrl message (see ModelXbrl.error), which passed the message code and level filters.
+    Its message arguments and refs (of model objects) are resolved when first used by a handler (when formatted, 
+    or when kept by a buffering handler).  The record's refs are relative to the entry url at the time of logging.
+
+        .. attribute:: args, refs
+        
+        Message format arguments (dict) and refs (list of dicts of href, sourceLine, etc), resolved on first use
+    """
+    def __init__(self, modelXbrl, name, level, messageCode, msg, codedArgs, exc_info):
+        self._codedArgs = None # not resolvable while LogRecord initializes args
+        self._refs = None
+        super(ModelXbrlLogRecord, self).__init__(name, level, "", 0, msg, None, exc_info)
+        self._modelXbrl = modelXbrl
+        self._codedArgs = codedArgs
+        self._entryUrl = modelXbrl.logEntryUrl
+        self.messageCode = messageCode
+        sourceLine = codedArgs.get("sourceLine")
+        if isinstance(sourceLine, _INT_TYPES): # must be sortable with int's in logger
+            self.sourceLine = sourceLine
+        
+    def resolveArguments(self):
+        """Resolves message arguments and refs, if not yet resolved, and dereferences the model objects"""
+        if self._codedArgs is not None:
+            fmtArgs, extras = self._modelXbrl.logArgumentsAndRefs(self._codedArgs, self._entryUrl)
+            self._args = fmtArgs or ()
+            self._refs = extras["refs"]
+            self._modelXbrl = self._codedArgs = None
+        
+    @property
+    def args(self):
+        self.resolveArguments()
+        return self._args
+    
+    @args.setter
+    def args(self, args):
+        self.resolveArguments()
+        self._args = args
+        
+    @property
+    def refs(self):
+        self.resolveArguments()
+        return self._refs
+    
+    @refs.setter
+    def refs(self, refs):
+        self.resolveArguments()
+        self._refs = refs
+        
+    def __getstate__(self):
+        self.resolveArguments() # such as for sending to another process
+        return self.__dict__
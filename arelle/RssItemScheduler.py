@@ -0,0 +1,213 @@
+'''
+Created on Oct 23, 2013
+
+Pipelined processing of the items of an RSS feed (by WatchRss and Validate.validateRssFeed).
+
+The zipped filings of the items are retrieved into the web cache ahead of their processing, up to
+modelManager.rssPrefetchFilings items ahead, by the web cache prefetcher (with its bounded number of
+concurrent downloads), while the items are loaded and validated, concurrently in worker processes
+when requested (modelManager.validateRssWorkers).
+
+Worker processes are forked with the loaded feed, and each processes whole items (by the item
+processing function of the caller), as soon as a worker is free.  The results (setResults) and log
+entries of each item are merged back into the rss items of the watching (or validating) process, in
+order, where the finishing function of the caller reports them (and records the latest processed item,
+for resuming).  If a worker process ends while processing an item, the item is reported as an error and
+finished without result, and processing continues.
+
+Plug-in actions on the loaded filing of an item (the caller's item action, such as storing the filing
+by Validate.RssItem or RssWatch.DoWatchAction) see the items in order, each just before the item is
+finished.  A loaded filing can't be sent from a worker process, so when processing concurrently the
+worker only notes that the action is due, and the filing is loaded again (from the web cache) in the
+watching (or validating) process for the action; the action sees the item's merged results, but not
+the worker's validation of the filing.
+
+Worker processes are forked, so concurrent processing is not available on Windows or from a process
+which is itself a (daemonic) worker, such as of the web server or batch mode, which process the
+items in the watching (or validating) process (retrieving the filings ahead of processing as above).
+
+@author: Mark V Systems Limited
+(c) Copyright 2013 Mark V Systems Limited, All rights reserved.
+'''
+import os, logging, threading
+from collections import deque
+from arelle.FileSource import archiveFilenameParts
+from arelle.FormulaScheduler import forkingPool, LogToResultHandler, workerResult, WorkerProcessEnded
+from arelle.UrlUtil import isHttpUrl
+
+RESULT_ATTRIBUTES = ("status", "results", "assertions", "assertionUnsuccessful")
+
+def processRssItems(rssModelXbrl, rssItems, processItem, finishItem, itemAction=None, isStopRequested=None,
+                    numWorkers=None, numPrefetch=None):
+    """Processes rss items, in the order given, per modelManager.validateRssWorkers and rssPrefetchFilings.
+
+    :param rssItems: Items to process
+    :type rssItems: [ModelRssItem]
+    :param processItem: Function (rssItem, itemAction) to process an item (in a worker process if concurrent),
+        calling itemAction(rssItem, modelXbrl), if not None, when due on the loaded filing, and returning a
+        result (which can be sent from a worker process) for finishItem
+    :param finishItem: Function (rssItem, result) to complete an item, in order, in this process
+    :param itemAction: Function (rssItem, modelXbrl) of plug-in actions on the loaded filing of an item, which
+        are run in order, in this process, before the item is finished; None if there are no actions
+    :param isStopRequested: Function returning True when processing is to stop (after the current item)
+    :param numWorkers: Worker processes, if not modelManager.validateRssWorkers
+    :param numPrefetch: Items retrieved ahead of processing, if not modelManager.rssPrefetchFilings
+    """
+    global scheduledItems
+    modelManager = rssModelXbrl.modelManager
+    if numWorkers is None:
+        numWorkers = modelManager.validateRssWorkers
+    numWorkers = min(numWorkers or 0, len(rssItems))
+    if numPrefetch is None:
+        numPrefetch = modelManager.rssPrefetchFilings
+    if numPrefetch is None: # ahead of each worker
+        numPrefetch = max(numWorkers, 1)
+    if isStopRequested is None:
+        isStopRequested = lambda: False
+    mp = forkingPool() if numWorkers > 1 else None
+    if mp is None:
+        for index in prefetchedItems(rssModelXbrl, rssItems, numPrefetch, isStopRequested):
+            finishItem(rssItems[index], processItem(rssItems[index], itemAction))
+            if isStopRequested():
+                break
+        return
+    rssModelXbrl.info("info",
+                      _("Processing %(count)s RSS items concurrently in %(workers)s worker processes"),
+                      modelObject=rssModelXbrl, count=len(rssItems), workers=numWorkers)
+    # workers are forked with the scheduled items (and loaded feed), items are dispatched (after retrieval)
+    # while fewer than numWorkers + numPrefetch items are being processed or waiting to be finished
+    startedBy = mp.Array("i", len(rssItems), lock=False) # pid of worker processing each item
+    scheduledItems = (rssModelXbrl, rssItems, processItem, itemAction is not None, startedBy)
+    pool = mp.Pool(numWorkers, initializer=initWorker)
+    try:
+        dispatched = deque()
+        for index in prefetchedItems(rssModelXbrl, rssItems, numPrefetch, isStopRequested):
+            dispatched.append((index, pool.apply_async(processConcurrently, (index,))))
+            while dispatched and (dispatched[0][1].ready() or len(dispatched) >= numWorkers + numPrefetch):
+                finishConcurrently(rssModelXbrl, rssItems, startedBy, finishItem, itemAction, *dispatched.popleft())
+                if isStopRequested():
+                    return
+        while dispatched:
+            finishConcurrently(rssModelXbrl, rssItems, startedBy, finishItem, itemAction, *dispatched.popleft())
+            if isStopRequested():
+                return
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+        scheduledItems = None
+
+def finishConcurrently(rssModelXbrl, rssItems, startedBy, finishItem, itemAction, index, asyncResult):
+    """Waits for the result of an item from its worker process, merges it into the rss item, runs its
+    item action (if due) and finishes it"""
+    rssItem = rssItems[index]
+    try:
+        index, logRecords, itemResults, isActionDue, result = workerResult(asyncResult, startedBy, index)
+    except WorkerProcessEnded:
+        rssModelXbrl.error("arelle.rssError",
+                           _("RSS item %(company)s, %(form)s, %(date)s, worker process ended while processing the item"),
+                           modelXbrl=rssModelXbrl, company=rssItem.companyName,
+                           form=rssItem.formType, date=rssItem.filingDate)
+        finishItem(rssItem, None)
+        return
+    logger = rssModelXbrl.logger
+    for record in logRecords:
+        logger.handle(record)
+    for attribute, value in itemResults.items():
+        setattr(rssItem, attribute, value)
+    if isActionDue:
+        actOnItem(rssModelXbrl, rssItem, itemAction)
+    finishItem(rssItem, result)
+
+def actOnItem(rssModelXbrl, rssItem, itemAction):
+    """Loads the filing of an item (retrieved into the web cache by its worker) for its item action"""
+    from arelle import ModelXbrl
+    from arelle.FileSource import openFileSource
+    modelManager = rssModelXbrl.modelManager
+    modelXbrl = None
+    try:
+        # messages of loading the filing again were reported by its worker
+        logFilter = ThreadLogFilter(threading.current_thread().ident)
+        rssModelXbrl.logger.addFilter(logFilter)
+        try:
+            modelXbrl = ModelXbrl.load(modelManager, openFileSource(rssItem.zippedUrl, modelManager.cntlr))
+        finally:
+            rssModelXbrl.logger.removeFilter(logFilter)
+        itemAction(rssItem, modelXbrl)
+    except Exception as err:
+        rssModelXbrl.error("arelle.rssError",
+                           _("RSS item %(company)s, %(form)s, %(date)s, exception: %(error)s"),
+                           modelXbrl=rssModelXbrl, company=rssItem.companyName,
+                           form=rssItem.formType, date=rssItem.filingDate, error=err,
+                           exc_info=True)
+    if modelXbrl is not None:
+        modelXbrl.close()
+
+class ThreadLogFilter(logging.Filter):
+    """Filter discarding the log records of a thread"""
+    def __init__(self, threadId):
+        super(ThreadLogFilter, self).__init__()
+        self.threadId = threadId
+    def filter(self, record):
+        return record.thread != self.threadId
+
+def filingUrl(webCache, rssItem):
+    """Url of the zipped filing (or instance, if not zipped) of an rss item"""
+    url = rssItem.zippedUrl
+    archivepathSelection = archiveFilenameParts(url)
+    if archivepathSelection is not None:
+        url = archivepathSelection[0]
+    return webCache.normalizeUrl(url)
+
+def prefetchedItems(rssModelXbrl, rssItems, numPrefetch, isStopRequested):
+    """Yields the index of each item, in order, after its filing is retrieved into the web cache, while the
+    filings of up to numPrefetch following items are retrieved"""
+    webCache = rssModelXbrl.modelManager.cntlr.webCache
+    prefetcher = webCache.prefetcher
+    urls = [filingUrl(webCache, rssItem) for rssItem in rssItems]
+    for index, url in enumerate(urls):
+        if isStopRequested():
+            return
+        if prefetcher is not None:
+            for aheadUrl in urls[index: index + numPrefetch + 1]:
+                if isHttpUrl(aheadUrl):
+                    prefetcher.prefetch(aheadUrl)
+            prefetcher.wait(url)
+        yield index
+
+scheduledItems = None # (rssModelXbrl, rssItems, processItem, hasItemAction, startedBy) of forked worker
+logHandler = None
+
+def initWorker():
+    global logHandler
+    from arelle.HttpConnectionPool import HttpConnectionPool
+    rssModelXbrl = scheduledItems[0]
+    webCache = rssModelXbrl.modelManager.cntlr.webCache
+    # retrievals and connections of the forked process are not the worker's
+    webCache._prefetcher = None
+    webCache.connectionPool = HttpConnectionPool()
+    logger = rssModelXbrl.logger
+    for handler in logger.handlers[:]: # inherited from watching process
+        logger.removeHandler(handler)
+    logger.propagate = False
+    logHandler = LogToResultHandler()
+    logger.addHandler(logHandler)
+
+def processConcurrently(index):
+    rssModelXbrl, rssItems, processItem, hasItemAction, startedBy = scheduledItems
+    startedBy[index] = os.getpid()
+    rssItem = rssItems[index]
+    result = None
+    dueActions = [] # the item action is run (on the filing loaded again) by the parent process
+    try:
+        result = processItem(rssItem, (lambda rssItem, modelXbrl: dueActions.append(True)) if hasItemAction else None)
+    except Exception as err:
+        rssModelXbrl.error("arelle.rssError",
+                           _("RSS item %(company)s, %(form)s, %(date)s, exception: %(error)s"),
+                           modelXbrl=rssModelXbrl, company=rssItem.companyName,
+                           form=rssItem.formType, date=rssItem.filingDate, error=err,
+                           exc_info=True)
+    itemResults = dict((attribute, getattr(rssItem, attribute, None)) for attribute in RESULT_ATTRIBUTES)
+    logRecords = logHandler.logRecords
+    logHandler.logRecords = []
+    return (index, logRecords, itemResults, bool(dueActions), result)
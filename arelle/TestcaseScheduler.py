@@ -0,0 +1,135 @@
+'''
+Created on Oct 22, 2013
+
+Scheduler of conformance suite testcase validation, validating the testcases of a testcases index
+(or registry) concurrently in worker processes (modelManager.validateTestcaseWorkers).
+
+Worker processes are forked after the testcases index has been loaded, so each has the index, its
+testcase documents and the controller's web cache without loading them again.  Each worker validates
+whole testcase documents (variations of a testcase often share the same DTS files), and keeps its DTS
+cache (if enabled by --dtsCache) warm for the later testcases that it validates.
+
+The status, actual results and timing of each variation are merged back into the variations of the
+validation process, and the log entries of each testcase replayed, in the order of serial validation,
+so that test reports (ViewFileTests) don't depend on the workers.
+
+Worker processes are forked, so concurrent validation is not available on Windows or from a process
+which is itself a (daemonic) worker, such as of the web server or batch mode, which validate serially.
+
+@author: Mark V Systems Limited
+(c) Copyright 2013 Mark V Systems Limited, All rights reserved.
+'''
+import os, time
+from arelle.FormulaScheduler import forkingPool, LogToResultHandler, workerResult, WorkerProcessEnded
+
+SLOWEST_VARIATIONS = 10 # reported after validating a testcases index
+
+def validateTestcases(val, testcases, numWorkers):
+    """Validates testcases, in the order given, concurrently in worker processes.
+
+    :param val: Validate object of the testcases index
+    :type val: Validate
+    :param testcases: Testcase documents to validate
+    :type testcases: [ModelDocument]
+    :param numWorkers: Number of worker processes
+    :type numWorkers: int
+    """
+    global scheduledTestcases
+    modelXbrl = val.modelXbrl
+    mp = forkingPool() if len(testcases) > 1 else None
+    if mp is None:
+        for testcase in testcases:
+            val.validateTestcase(testcase)
+        return
+    numWorkers = min(numWorkers, len(testcases))
+    modelXbrl.info("info",
+                   _("Validating %(count)s testcases concurrently in %(workers)s worker processes"),
+                   modelObject=modelXbrl, count=len(testcases), workers=numWorkers)
+    # workers are forked with the scheduled testcases (and loaded testcases index)
+    startedBy = mp.Array("i", len(testcases), lock=False) # pid of worker validating each testcase
+    scheduledTestcases = (val, testcases, startedBy)
+    pool = mp.Pool(numWorkers, initializer=initWorker)
+    try:
+        asyncResults = [pool.apply_async(validateConcurrently, (index,))
+                        for index in range(len(testcases))]
+        for index, asyncResult in enumerate(asyncResults):
+            try:
+                mergeResult(val, testcases, workerResult(asyncResult, startedBy, index))
+            except WorkerProcessEnded:
+                modelXbrl.error("exception",
+                    _("Testcase validation exception: worker process ended while validating testcase: %(testcase)s"),
+                    modelXbrl=modelXbrl, testcase=testcases[index].basename)
+        pool.close()
+    finally:
+        pool.terminate()
+        pool.join()
+        scheduledTestcases = None
+
+def mergeResult(val, testcases, result):
+    index, logRecords, variationResults, duration = result
+    modelXbrl = val.modelXbrl
+    testcase = testcases[index]
+    logger = modelXbrl.logger
+    for record in logRecords:
+        logger.handle(record)
+    for modelTestcaseVariation, variationResult in zip(getattr(testcase, "testcaseVariations", ()), variationResults):
+        (modelTestcaseVariation.status, modelTestcaseVariation.actual,
+         modelTestcaseVariation.assertions, modelTestcaseVariation.duration) = variationResult
+        modelXbrl.modelManager.viewModelObject(modelXbrl, modelTestcaseVariation.objectId())
+    modelXbrl.profileStat(testcase.basename, duration)
+
+scheduledTestcases = None # (val, testcases, startedBy) of forked worker
+logHandler = None
+
+def initWorker():
+    global logHandler
+    from arelle.HttpConnectionPool import HttpConnectionPool
+    val = scheduledTestcases[0]
+    webCache = val.modelXbrl.modelManager.cntlr.webCache
+    # retrievals and connections of the forked process are not the worker's
+    webCache._prefetcher = None
+    webCache.connectionPool = HttpConnectionPool()
+    logger = val.modelXbrl.logger
+    for handler in logger.handlers[:]: # inherited from validation process
+        logger.removeHandler(handler)
+    logger.propagate = False
+    logHandler = LogToResultHandler()
+    logger.addHandler(logHandler)
+
+def validateConcurrently(index):
+    val, testcases, startedBy = scheduledTestcases
+    startedBy[index] = os.getpid()
+    testcase = testcases[index]
+    startedAt = time.time()
+    try:
+        val.validateTestcase(testcase)
+    except Exception as err:
+        val.modelXbrl.error("exception",
+            _("Testcase validation exception: %(error)s, testcase: %(testcase)s"),
+            modelXbrl=val.modelXbrl,
+            testcase=testcase.basename, error=err,
+            exc_info=True)
+    variationResults = [(modelTestcaseVariation.status, modelTestcaseVariation.actual,
+                         modelTestcaseVariation.assertions, modelTestcaseVariation.duration)
+                        for modelTestcaseVariation in getattr(testcase, "testcaseVariations", ())]
+    logRecords = logHandler.logRecords
+    logHandler.logRecords = []
+    return (index, logRecords, variationResults, time.time() - startedAt)
+
+def logSlowestVariations(modelXbrl, testcases, count=SLOWEST_VARIATIONS):
+    """Reports the variations of the testcases which took longest to validate"""
+    variations = sorted((modelTestcaseVariation
+                         for testcase in testcases
+                         for modelTestcaseVariation in getattr(testcase, "testcaseVariations", ())
+                         if modelTestcaseVariation.duration is not None),
+                        key=lambda modelTestcaseVariation: modelTestcaseVariation.duration,
+                        reverse=True)[:count]
+    if variations:
+        modelXbrl.info("info",
+                       _("Slowest variations: %(variations)s"),
+                       modelObject=modelXbrl,
+                       variations=", ".join("{0} {1} {2:.2f} secs".format(
+                                                modelTestcaseVariation.modelDocument.basename,
+                                                modelTestcaseVariation.id,
+                                                modelTestcaseVariation.duration)
+                                            for modelTestcaseVariation in variations))
@@ -0,0 +1,211 @@
+'''
+Created on Oct 21, 2013
+
+Tracing spans of processing activities (--traceFile), exported as Chrome trace-event JSON
+(for chrome://tracing or other trace viewers) or as a summary table.
+
+A span records the wall time, CPU time and memory growth of an activity, such as loading
+(and, nested within it, discovery of each document), validation, each variable set evaluation (with those in its scope),
+and database insertion.  Spans nest by thread, so that the time of a span which isn't spent in
+nested spans is its self time.  The phases of processing marked by modelXbrl.profileStat
+(such as each phase of ValidateXbrl.validate) and by modelXbrl.profileActivity are also recorded
+as spans, which subdivide the time of their enclosing span (they aren't counted as its nested spans).
+
+When tracing isn't started, Tracing.tracer is None, span() returns a shared do-nothing span and
+traced functions are called directly, so instrumented code is not slowed down.
+
+Memory is the current resident memory of the process (DtsCache.residentMemory), so the memory of a span
+is how much it grew (or, if negative, shrank) while the span was open.
+
+@author: Mark V Systems Limited
+(c) Copyright 2013 Mark V Systems Limited, All rights reserved.
+'''
+import os, time, threading, json
+from functools import wraps
+
+try:
+    cpuTime = time.process_time
+except AttributeError: # python before 3.3
+    cpuTime = time.clock
+
+tracer = None # Tracer when tracing is started, otherwise None
+
+class NoSpan:
+    """Span used when not tracing, does nothing"""
+    def __enter__(self):
+        return self
+    def __exit__(self, *exc):
+        return False
+
+noSpan = NoSpan()
+
+def span(name, category="arelle", **args):
+    """Returns a span (context manager) of the named activity, args are shown with the span in trace viewers"""
+    if tracer is None:
+        return noSpan
+    return Span(tracer, name, category, args)
+
+def traced(name, category="arelle", spanArgs=None, isTraced=None):
+    """Decorator tracing each call of a function as a span.
+
+    :param spanArgs: Function of the call's arguments, returning a dict of args for the span
+    :type spanArgs: callable
+    :param isTraced: Function of the call's arguments, returning False for calls not to trace (such as
+        recursive calls within a traced call), if not all calls are traced
+    :type isTraced: callable
+    """
+    def decorator(function):
+        @wraps(function)
+        def tracedFunction(*args, **kwargs):
+            if tracer is None or (isTraced is not None and not isTraced(*args, **kwargs)):
+                return function(*args, **kwargs)
+            with Span(tracer, name, category, spanArgs(*args, **kwargs) if spanArgs is not None else {}):
+                return function(*args, **kwargs)
+        return tracedFunction
+    return decorator
+
+def start(cntlr):
+    """Starts tracing (if not already started), returns the tracer"""
+    global tracer
+    if tracer is None:
+        tracer = Tracer(cntlr)
+    return tracer
+
+def stop():
+    """Stops tracing, returns the tracer (with the recorded spans) or None if not tracing"""
+    global tracer
+    stoppedTracer = tracer
+    tracer = None
+    return stoppedTracer
+
+class Span:
+    __slots__ = ("tracer", "name", "category", "args", "mark", "childWall")
+
+    def __init__(self, tracer, name, category, args):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+        self.childWall = 0.0
+
+    def __enter__(self):
+        self.tracer.stack.append(self)
+        self.mark = self.tracer.mark()
+        return self
+
+    def __exit__(self, *exc):
+        tracer = self.tracer
+        stack = tracer.stack
+        if stack and stack[-1] is self:
+            stack.pop()
+        wall = tracer.record(self.name, self.category, self.mark, self.args, self.childWall)
+        if stack:
+            stack[-1].childWall += wall
+        return False
+
+class Tracer:
+    """
+    .. class:: Tracer(cntlr)
+
+    Recorder of spans, started by Tracing.start (such as by the --traceFile command line option).
+
+    :param cntlr: The controller
+    :type cntlr: Cntlr
+
+        .. attribute:: spans
+
+        List of completed spans, each a tuple of (name, category, thread id, start time, wall time, self time,
+        CPU time, memory growth (KB), args dict), times in seconds, start relative to start of tracing.
+    """
+    def __init__(self, cntlr):
+        self.cntlr = cntlr
+        self.spans = []
+        self.threadLocal = threading.local()
+        self.startedAt = time.time()
+        self.pid = os.getpid()
+        from arelle.DtsCache import residentMemory
+        self.residentMemory = residentMemory
+
+    @property
+    def stack(self):
+        """Stack of open spans of the current thread"""
+        try:
+            return self.threadLocal.stack
+        except AttributeError:
+            self.threadLocal.stack = stack = []
+            return stack
+
+    def memoryUsed(self):
+        return self.residentMemory() or 0
+
+    def mark(self):
+        """Returns the (wall time, cpu time, memory) at the start of a span"""
+        return (time.time(), cpuTime(), self.memoryUsed())
+
+    def record(self, name, category, mark, args=None, childWall=0.0):
+        """Records a span started at mark and completed now, returns its wall time"""
+        startWall, startCpu, startMem = mark
+        wall = time.time() - startWall
+        self.spans.append((name, category, threading.current_thread().ident,
+                           startWall - self.startedAt, wall, wall - childWall,
+                           cpuTime() - startCpu, self.memoryUsed() - startMem, args or {}))
+        return wall
+
+    def phase(self, obj, name, category="phase"):
+        """Records the phase completed since the prior phase of obj (if name), and marks the start of its next phase.
+
+        :param obj: Object whose phases are recorded (such as a modelXbrl), holds the mark of its current phase.
+        :param name: Name of the completed phase, or None to only mark the start of a phase.
+        """
+        attr = "_tracePhaseMark_" + category
+        if name:
+            mark = getattr(obj, attr, None)
+            if mark is not None:
+                stack = self.stack
+                if stack and stack[-1].mark[0] > mark[0]: # phase doesn't start before its enclosing span
+                    mark = stack[-1].mark
+                self.record(name, category, mark)
+        setattr(obj, attr, self.mark())
+
+    def traceEvents(self):
+        """Chrome trace-event format (complete events, times in microseconds) of the recorded spans"""
+        events = [{"name": "process_name", "ph": "M", "pid": self.pid, "tid": 0, "args": {"name": "arelle"}}]
+        for name, category, tid, start, wall, selfWall, cpu, mem, args in self.spans:
+            eventArgs = {"cpu_ms": round(cpu * 1000.0, 3), "self_ms": round(selfWall * 1000.0, 3), "memory_kb": mem}
+            eventArgs.update((key, str(value)) for key, value in args.items())
+            events.append({"name": name, "cat": category, "ph": "X", "pid": self.pid, "tid": tid,
+                           "ts": round(start * 1000000.0, 1), "dur": round(wall * 1000000.0, 1), "args": eventArgs})
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def summary(self):
+        """Returns lines of a summary table of spans, totalled by name and category, in order of decreasing total time"""
+        totals = {}
+        for name, category, tid, start, wall, selfWall, cpu, mem, args in self.spans:
+            try:
+                total = totals[(name, category)]
+            except KeyError:
+                total = totals[(name, category)] = [0, 0.0, 0.0, 0.0, 0.0, 0]
+            total[0] += 1
+            total[1] += wall
+            total[2] += selfWall
+            total[3] += cpu
+            total[4] = max(total[4], wall)
+            total[5] += mem
+        nameWidth = max([len(name) for name, category in totals] + [4])
+        catWidth = max([len(category) for name, category in totals] + [8])
+        lineFormat = "{0:<" + str(nameWidth) + "}  {1:<" + str(catWidth) + "}  {2:>7}  {3:>11}  {4:>11}  {5:>11}  {6:>11}  {7:>11}"
+        lines = [lineFormat.format(_("span"), _("category"), _("count"), _("total secs"), _("self secs"),
+                                   _("cpu secs"), _("max secs"), _("memory KB"))]
+        for (name, category), (count, wall, selfWall, cpu, maxWall, mem) in sorted(totals.items(), key=lambda item: -item[1][1]):
+            lines.append(lineFormat.format(name, category, count, "{0:.3f}".format(wall), "{0:.3f}".format(selfWall),
+                                           "{0:.3f}".format(cpu), "{0:.3f}".format(maxWall), mem))
+        return lines
+
+    def save(self, traceFile):
+        """Saves spans to traceFile, as Chrome trace-event JSON if its extension is .json, otherwise as a summary table"""
+        if traceFile.lower().endswith(".json"):
+            with open(traceFile, "w", encoding="utf-8") as fh:
+                json.dump(self.traceEvents(), fh, indent=0)
+        else:
+            with open(traceFile, "w", encoding="utf-8") as fh:
+                fh.write("\n".join(self.summary()) + "\n")
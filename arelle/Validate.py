@@ -4,7 +4,7 @@ Created on Oct 17, 2010
 @author: Mark V Systems Limited
 (c) Copyright 2010 Mark V Systems Limited, All rights reserved.
 '''
-import os, sys, traceback
+import os, sys, time, traceback
 from collections import defaultdict
 from arelle import (ModelXbrl, ModelVersReport, XbrlConst, 
                ValidateXbrl, ValidateFiling, ValidateHmrc, ValidateVersReport, ValidateFormula,
@@ -59,8 +59,15 @@ class Validate:
                 _("Validation skipped, document not successfully loaded: %(file)s"),
                 modelXbrl=self.modelXbrl, file=self.modelXbrl.modelDocument.basename)
         elif self.modelXbrl.modelDocument.type in (Type.TESTCASESINDEX, Type.REGISTRY):
-            for doc in sorted(self.modelXbrl.modelDocument.referencesDocument.keys(), key=lambda doc: doc.uri):
-                self.validateTestcase(doc)  # testcases doc's are sorted by their uri (file names), e.g., for formula
+            testcases = sorted(self.modelXbrl.modelDocument.referencesDocument.keys(), key=lambda doc: doc.uri)
+            if (self.modelXbrl.modelManager.validateTestcaseWorkers or 0) > 1:
+                from arelle.TestcaseScheduler import validateTestcases
+                validateTestcases(self, testcases, self.modelXbrl.modelManager.validateTestcaseWorkers)
+            else:
+                for doc in testcases:
+                    self.validateTestcase(doc)  # testcases doc's are sorted by their uri (file names), e.g., for formula
+            from arelle.TestcaseScheduler import logSlowestVariations
+            logSlowestVariations(self.modelXbrl, testcases)
         elif self.modelXbrl.modelDocument.type in (Type.TESTCASE, Type.REGISTRYTESTCASE):
             try:
                 self.validateTestcase(self.modelXbrl.modelDocument)
@@ -98,35 +105,49 @@ class Validate:
         
     def validateRssFeed(self):
         self.modelXbrl.info("info", "RSS Feed", modelDocument=self.modelXbrl)
+        if getattr(self.modelXbrl, "isRssItemsProcessedByPlugin", False):
+            return # items are loaded and validated by a plug-in (such as xbrlDB storing the feed by a pipeline)
+        from arelle.RssItemScheduler import processRssItems
+        processRssItems(self.modelXbrl, self.modelXbrl.modelDocument.rssItems, 
+                        self.validateRssItem, self.validatedRssItem,
+                        itemAction=self.rssItemPluginMethods if any(pluginClassMethods("Validate.RssItem")) else None)
+        
+    def validateRssItem(self, rssItem, itemAction):
         from arelle.FileSource import openFileSource
-        for rssItem in self.modelXbrl.modelDocument.rssItems:
-            self.modelXbrl.info("info", _("RSS Item %(accessionNumber)s %(formType)s %(companyName)s %(period)s"),
-                modelObject=rssItem, accessionNumber=rssItem.accessionNumber, formType=rssItem.formType, companyName=rssItem.companyName, period=rssItem.period)
-            modelXbrl = None
-            try:
-                modelXbrl = ModelXbrl.load(self.modelXbrl.modelManager, 
-                                           openFileSource(rssItem.zippedUrl, self.modelXbrl.modelManager.cntlr),
-                                           _("validating"))
-                self.instValidator.validate(modelXbrl, self.modelXbrl.modelManager.formulaOptions.typedParameters())
-                self.instValidator.close()
-                rssItem.setResults(modelXbrl)
-                self.modelXbrl.modelManager.viewModelObject(self.modelXbrl, rssItem.objectId())
-                for pluginXbrlMethod in pluginClassMethods("Validate.RssItem"):
-                    pluginXbrlMethod(self, modelXbrl, rssItem)
-                modelXbrl.close()
-                del modelXbrl  # completely dereference
-            except Exception as err:
-                self.modelXbrl.error("exception",
-                    _("RSS item validation exception: %(error)s, instance: %(instance)s"),
-                    modelXbrl=(self.modelXbrl, modelXbrl),
-                    instance=rssItem.zippedUrl, error=err,
-                    exc_info=True)
+        self.modelXbrl.info("info", _("RSS Item %(accessionNumber)s %(formType)s %(companyName)s %(period)s"),
+            modelObject=rssItem, accessionNumber=rssItem.accessionNumber, formType=rssItem.formType, companyName=rssItem.companyName, period=rssItem.period)
+        modelXbrl = None
+        try:
+            modelXbrl = ModelXbrl.load(self.modelXbrl.modelManager, 
+                                       openFileSource(rssItem.zippedUrl, self.modelXbrl.modelManager.cntlr),
+                                       _("validating"))
+            self.instValidator.validate(modelXbrl, self.modelXbrl.modelManager.formulaOptions.typedParameters())
+            self.instValidator.close()
+            rssItem.setResults(modelXbrl)
+            if itemAction is not None:
+                itemAction(rssItem, modelXbrl)
+            modelXbrl.close()
+            del modelXbrl  # completely dereference
+        except Exception as err:
+            self.modelXbrl.error("exception",
+                _("RSS item validation exception: %(error)s, instance: %(instance)s"),
+                modelXbrl=(self.modelXbrl, modelXbrl),
+                instance=rssItem.zippedUrl, error=err,
+                exc_info=True)
+            
+    def rssItemPluginMethods(self, rssItem, modelXbrl):
+        for pluginXbrlMethod in pluginClassMethods("Validate.RssItem"):
+            pluginXbrlMethod(self, modelXbrl, rssItem)
+            
+    def validatedRssItem(self, rssItem, result):
+        self.modelXbrl.modelManager.viewModelObject(self.modelXbrl, rssItem.objectId())
 
     def validateTestcase(self, testcase):
         self.modelXbrl.info("info", "Testcase", modelDocument=testcase)
         self.modelXbrl.viewModelObject(testcase.objectId())
         if hasattr(testcase, "testcaseVariations"):
             for modelTestcaseVariation in testcase.testcaseVariations:
+                startedAt = time.time()
                 # update ui thread via modelManager (running in background here)
                 self.modelXbrl.modelManager.viewModelObject(self.modelXbrl, modelTestcaseVariation.objectId())
                 # is this a versioning report?
@@ -311,6 +332,7 @@ class Validate:
                         self.determineTestStatus(modelTestcaseVariation, formulaOutputInstance)
                         formulaOutputInstance.close()
                         del formulaOutputInstance
+                modelTestcaseVariation.duration = time.time() - startedAt
                 # update ui thread via modelManager (running in background here)
                 self.modelXbrl.modelManager.viewModelObject(self.modelXbrl, modelTestcaseVariation.objectId())
                     
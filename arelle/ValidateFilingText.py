@@ -6,8 +6,10 @@ Created on Oct 17, 2010
 '''
 #import xml.sax, xml.sax.handler
 from lxml.etree import XML, DTD, SubElement, XMLSyntaxError
-import os, re, io
-from arelle import XbrlConst
+import os, re, io, codecs, heapq, hashlib
+from bisect import bisect_right
+from itertools import groupby
+from arelle import XbrlConst, XmlUtil
 from arelle.ModelObject import ModelObject
 
 XMLdeclaration = re.compile(r"<\?xml.*\?>", re.DOTALL)
@@ -15,6 +17,8 @@ XMLpattern = re.compile(r".*(<|&lt;|&#x3C;|&#60;)[A-Za-z_]+[A-Za-z0-9_:]*[^>]*(/
 CDATApattern = re.compile(r"<!\[CDATA\[(.+)\]\]")
 #EFM table 5-1 and all &xxx; patterns
 docCheckPattern = re.compile(r"&\w+;|[^0-9A-Za-z`~!@#$%&\*\(\)\.\-+ \[\]\{\}\|\\:;\"'<>,_?/=\t\n\r\m\f]") # won't match &#nnn;
+lineBreakBytesPattern = re.compile(br"\r\n|\r|\n") # as by universal newlines
+loneCarriageReturnBytesPattern = re.compile(br"\r(?!\n)")
 namedEntityPattern = re.compile("&[_A-Za-z\xC0-\xD6\xD8-\xF6\xF8-\xFF\u0100-\u02FF\u0370-\u037D\u037F-\u1FFF\u200C-\u200D\u2070-\u218F\u2C00-\u2FEF\u3001-\uD7FF\uF900-\uFDCF\uFDF0-\uFFFD]"
                                 r"[_\-\.:" 
                                 "\xB7A-Za-z0-9\xC0-\xD6\xD8-\xF6\xF8-\xFF\u0100-\u02FF\u0370-\u037D\u037F-\u1FFF\u200C-\u200D\u2070-\u218F\u2C00-\u2FEF\u3001-\uD7FF\uF900-\uFDCF\uFDF0-\uFFFD\u0300-\u036F\u203F-\u2040]*;")
@@ -381,44 +385,81 @@ xhtmlEntities = {
     '&diams;': '&#9830;',
     }
 
+# ascii entity codes other than xhtmlEntities (alternatives grouped by first letter), and runs of disallowed bytes
+# (including all non-ascii bytes), for lines to check by docCheckPattern
+docCheckEntityBytesPattern = re.compile(br"&(?!(?:" + 
+                                        b"|".join(re.escape(initial).encode("ascii") + b"(?:" +
+                                                  b"|".join(re.escape(name[1:]).encode("ascii") for name in names) + b")"
+                                                  for initial, names in groupby(sorted(entity[1:-1] for entity in xhtmlEntities),
+                                                                                key=lambda name: name[0])) +
+                                        br");)\w+;")
+docCheckAllowedBytes = b"0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz`~!@#$%&*().-+ []{}|\\:;\"'<>,_?/=\t\n\r\f"
+docCheckDisallowedBytesPattern = re.compile(b"[^" + re.escape(docCheckAllowedBytes) + b"]+")
+
 def checkfile(modelXbrl, filepath):
-    result = []
-    lineNum = 1
-    foundXmlDeclaration = False
-    file, encoding = modelXbrl.fileSource.file(filepath)
+    """Checks the document text for disallowed characters and entity codes, returning (file, encoding) for
+    parsing the document.
+    
+    The document is read once, as bytes, which are scanned by a byte pattern (line numbers are found only
+    for lines with possible violations, which are rechecked as text by docCheckPattern), and given to the
+    parser without decoding (the parser decodes per the XML declaration or byte order mark), except for
+    an archive member which isn't utf-8 and has no XML declaration.
+    """
+    file = modelXbrl.fileSource.file(filepath, binary=True)[0]
     with file as f:
-        while True:
-            line = f.readline()
-            if line == "":
-                break;
-            # check for disallowed characters or entity codes
-            for match in docCheckPattern.finditer(line):
-                text = match.group()
-                if text.startswith("&"):
-                    if not text in xhtmlEntities:
-                        modelXbrl.error(("EFM.5.02.02.06", "GFM.1.01.02"),
-                            _("Disallowed entity code %(text)s in file %(file)s line %(line)s column %(column)s"),
-                            modelDocument=filepath, text=text, file=os.path.basename(filepath), line=lineNum, column=match.start())
-                elif modelXbrl.modelManager.disclosureSystem.EFM:
-                    modelXbrl.error("EFM.5.02.01.01",
-                        _("Disallowed character '%(text)s' in file %(file)s at line %(line)s col %(column)s"),
+        document = f.read()
+    archiveFileSource = modelXbrl.fileSource.fileSourceContainingFilepath(filepath)
+    defaultEncoding = ("latin-1" # per FileSource.file for members of EDGAR archives
+                       if archiveFileSource is not None and (archiveFileSource.isEis or archiveFileSource.isXfd)
+                       else "utf-8")
+    declaredEncoding = XmlUtil.encoding(document, default=None) # by XML declaration or byte order mark
+    encoding = declaredEncoding or defaultEncoding
+    if codecs.lookup(encoding).name.startswith(("utf-16", "utf-32")):
+        text = document.decode(encoding) # not ascii compatible, scan its utf-8 encoding
+        textBytes = text.encode("utf-8")
+        textEncoding = "utf-8"
+    else:
+        if loneCarriageReturnBytesPattern.search(document): # parser's line numbers as for universal newlines
+            document = lineBreakBytesPattern.sub(b"\n", document)
+        textBytes = document
+        textEncoding = encoding
+    textStart = len(codecs.BOM_UTF8) if textBytes.startswith(codecs.BOM_UTF8) else 0
+    lineStarts = None # offsets of lines, when needed
+    lineEnd = textStart
+    # scan for entities, and (if there are any) disallowed bytes, without the cost of matching alternatives at each byte
+    matchOffsets = [(match.start() for match in docCheckEntityBytesPattern.finditer(textBytes, textStart))]
+    if textBytes.translate(None, docCheckAllowedBytes):
+        matchOffsets.append(match.start() for match in docCheckDisallowedBytesPattern.finditer(textBytes, textStart))
+    for offset in heapq.merge(*matchOffsets):
+        if offset < lineEnd:
+            continue # line has been checked
+        if lineStarts is None:
+            lineStarts = [textStart] + [lineBreak.end() for lineBreak in lineBreakBytesPattern.finditer(textBytes, textStart)]
+        lineIndex = bisect_right(lineStarts, offset) - 1
+        lineStart = lineStarts[lineIndex]
+        lineEnd = lineStarts[lineIndex + 1] if lineIndex + 1 < len(lineStarts) else len(textBytes)
+        line = textBytes[lineStart:lineEnd].decode(textEncoding)
+        lineNum = lineIndex + 1
+        # check for disallowed characters or entity codes
+        for match in docCheckPattern.finditer(line):
+            text = match.group()
+            if text.startswith("&"):
+                if not text in xhtmlEntities:
+                    modelXbrl.error(("EFM.5.02.02.06", "GFM.1.01.02"),
+                        _("Disallowed entity code %(text)s in file %(file)s line %(line)s column %(column)s"),
                         modelDocument=filepath, text=text, file=os.path.basename(filepath), line=lineNum, column=match.start())
-            if lineNum == 1:
-                xmlDeclarationMatch = XMLdeclaration.search(line)
-                if xmlDeclarationMatch: # remove it for lxml
-                    start,end = xmlDeclarationMatch.span()
-                    line = line[0:start] + line[end:]
-                    foundXmlDeclaration = True
-            result.append(line)
-            lineNum += 1
-    result = ''.join(result)
-    if not foundXmlDeclaration: # may be multiline, try again
-        xmlDeclarationMatch = XMLdeclaration.search(result)
+            elif modelXbrl.modelManager.disclosureSystem.EFM:
+                modelXbrl.error("EFM.5.02.01.01",
+                    _("Disallowed character '%(text)s' in file %(file)s at line %(line)s col %(column)s"),
+                    modelDocument=filepath, text=text, file=os.path.basename(filepath), line=lineNum, column=match.start())
+    if declaredEncoding is None and encoding != "utf-8": # parser would decode as utf-8
+        text = document.decode(encoding)
+        xmlDeclarationMatch = XMLdeclaration.search(text)
         if xmlDeclarationMatch: # remove it for lxml
             start,end = xmlDeclarationMatch.span()
-            result = result[0:start] + result[end:]
-            foundXmlDeclaration = True
-    return (io.StringIO(initial_value=result), encoding)
+            text = text[0:start] + text[end:]
+        return (io.StringIO(initial_value=text), encoding)
+    return (io.BytesIO(document), encoding)
 
 def loadDTD(modelXbrl):
     global edbodyDTD
@@ -442,105 +483,151 @@ def removeEntities(text):
     '''
     return namedEntityPattern.sub("", text)
 
+def checkTextBlock(text):
+    """Checks the html of a text block fact value, without reference to the model (so it may be checked
+    in a worker process), returning the disallowed entities and, for the value and each of its CDATA
+    sections, the list of findings (tuples of a finding type and its arguments) in document order.
+    Graphics file references are returned as findings, as their files are checked by the model's file source.
+    """
+    disallowedEntities = [match.group()
+                          for match in namedEntityPattern.finditer(text)
+                          if match.group() not in xhtmlEntities]
+    textFindings = []
+    for xmltext in [text] + CDATApattern.findall(text):
+        findings = []
+        xmlBodyWithoutEntities = "<body>\n{0}\n</body>\n".format(removeEntities(xmltext))
+        try:
+            textblockXml = XML(xmlBodyWithoutEntities)
+            if not edbodyDTD.validate( textblockXml ):
+                errors = edbodyDTD.error_log.filter_from_errors()
+                htmlError = any(e.type_name in ("DTD_INVALID_CHILD", "DTD_UNKNOWN_ATTRIBUTE") 
+                                for e in errors)
+                findings.append(("dtdError", htmlError, ', '.join(e.message for e in errors)))
+            for elt in textblockXml.iter():
+                eltTag = elt.tag
+                for attrTag, attrValue in elt.items():
+                    if ((attrTag == "href" and eltTag == "a") or 
+                        (attrTag == "src" and eltTag == "img")):
+                        if "javascript:" in attrValue:
+                            findings.append(("activeContent", attrTag, eltTag))
+                        elif attrValue.startswith("http://www.sec.gov/Archives/edgar/data/") and eltTag == "a":
+                            pass
+                        elif "http:" in attrValue or "https:" in attrValue or "ftp:" in attrValue:
+                            findings.append(("externalReference", attrTag, eltTag))
+                        if attrTag == "src":
+                            findings.append(("graphicFile", attrValue, eltTag))
+                if eltTag == "table" and any(a is not None for a in elt.iterancestors("table")):
+                    findings.append(("nestedTable",))
+        except (XMLSyntaxError,
+                UnicodeDecodeError) as err:
+            findings.append(("xmlError", str(err)))
+        textFindings.append(findings)
+    return (disallowedEntities, textFindings)
+
+def initTextBlockWorker(dtdPath):
+    global edbodyDTD
+    if edbodyDTD is None: # (forked workers have the DTD of the validating process)
+        with open(dtdPath) as fh:
+            edbodyDTD = DTD(fh)
+
+def textBlockChecks(modelXbrl, uniqueTexts):
+    """Results of checkTextBlock for each of the unique texts (in order), by worker processes per
+    modelManager.validateTextBlockWorkers, or serially if not available"""
+    numWorkers = min(modelXbrl.modelManager.validateTextBlockWorkers or 0, len(uniqueTexts))
+    mp = None
+    if numWorkers > 1:
+        from arelle.FormulaScheduler import forkingPool
+        mp = forkingPool()
+    if mp is None:
+        return [checkTextBlock(text) for text in uniqueTexts]
+    pool = mp.Pool(numWorkers, initTextBlockWorker,
+                   (os.path.join(modelXbrl.modelManager.cntlr.configDir, "edbody.dtd"),))
+    try:
+        # chunks of texts are large enough to amortize sending them, small enough to balance the workers
+        return pool.map(checkTextBlock, uniqueTexts, chunksize=max(1, len(uniqueTexts) // (numWorkers * 4)))
+    finally:
+        pool.close()
+        pool.join()
+
 def validateTextBlockFacts(modelXbrl):
     #handler = TextBlockHandler(modelXbrl)
     loadDTD(modelXbrl)
     checkedGraphicsFiles = set() #  only check any graphics file reference once per fact
     
-    for f1 in modelXbrl.facts:
-        # build keys table for 6.5.14
-        concept = f1.concept
-        if f1.xsiNil != "true" and \
-           concept is not None and \
-           concept.isTextBlock and \
-           XMLpattern.match(f1.value):
-            #handler.fact = f1
-            # test encoded entity tags
-            for match in namedEntityPattern.finditer(f1.value):
-                entity = match.group()
-                if not entity in xhtmlEntities:
-                    modelXbrl.error(("EFM.6.05.16", "GFM.1.2.15"),
-                        _("Fact %(fact)s contextID %(contextID)s has disallowed entity %(entity)s"),
-                        modelObject=f1, fact=f1.qname, contextID=f1.contextID, entity=entity, error=entity)
-            # test html
-            for xmltext in [f1.value] + CDATApattern.findall(f1.value):
-                '''
-                try:
-                    xml.sax.parseString(
-                        "<?xml version='1.0' encoding='utf-8' ?>\n<body>\n{0}\n</body>\n".format(
-                         removeEntities(xmltext)).encode('utf-8'),handler,handler)
-                except (xml.sax.SAXParseException,
-                        xml.sax.SAXException,
-                        UnicodeDecodeError) as err:
-                    # ignore errors which are not errors (e.g., entity codes checked previously
-                    if not err.endswith("undefined entity"):
-                        handler.modelXbrl.error(("EFM.6.05.15", "GFM.1.02.14"),
-                            _("Fact %(fact)s contextID %(contextID)s has text which causes the XML error %(error)s"),
-                            modelObject=f1, fact=f1.qname, contextID=f1.contextID, error=err)
-                '''
-                xmlBodyWithoutEntities = "<body>\n{0}\n</body>\n".format(removeEntities(xmltext))
-                try:
-                    textblockXml = XML(xmlBodyWithoutEntities)
-                    if not edbodyDTD.validate( textblockXml ):
-                        errors = edbodyDTD.error_log.filter_from_errors()
-                        htmlError = any(e.type_name in ("DTD_INVALID_CHILD", "DTD_UNKNOWN_ATTRIBUTE") 
-                                        for e in errors)
-                        modelXbrl.error("EFM.6.05.16" if htmlError else ("EFM.6.05.15.dtdError", "GFM.1.02.14"),
-                            _("Fact %(fact)s contextID %(contextID)s has text which causes the XML error %(error)s"),
-                            modelObject=f1, fact=f1.qname, contextID=f1.contextID, 
-                            error=', '.join(e.message for e in errors))
-                    for elt in textblockXml.iter():
-                        eltTag = elt.tag
-                        for attrTag, attrValue in elt.items():
-                            if ((attrTag == "href" and eltTag == "a") or 
-                                (attrTag == "src" and eltTag == "img")):
-                                if "javascript:" in attrValue:
-                                    modelXbrl.error("EFM.6.05.16.activeContent",
-                                        _("Fact %(fact)s of context %(contextID)s has javascript in '%(attribute)s' for <%(element)s>"),
-                                        modelObject=f1, fact=f1.qname, contextID=f1.contextID,
-                                        attribute=attrTag, element=eltTag)
-                                elif attrValue.startswith("http://www.sec.gov/Archives/edgar/data/") and eltTag == "a":
-                                    pass
-                                elif "http:" in attrValue or "https:" in attrValue or "ftp:" in attrValue:
-                                    modelXbrl.error("EFM.6.05.16.externalReference",
-                                        _("Fact %(fact)s of context %(contextID)s has an invalid external reference in '%(attribute)s' for <%(element)s>"),
+    textBlockFacts = [f1 for f1 in modelXbrl.facts
+                      if f1.xsiNil != "true" and
+                         f1.concept is not None and
+                         f1.concept.isTextBlock and
+                         XMLpattern.match(f1.value)]
+    # identical text (such as boilerplate) is checked once, by the sha1 of its value
+    textHashes = [hashlib.sha1(f1.value.encode("utf-8")).digest() for f1 in textBlockFacts]
+    uniqueTexts = {}
+    for f1, textHash in zip(textBlockFacts, textHashes):
+        if textHash not in uniqueTexts:
+            uniqueTexts[textHash] = f1.value
+    textChecks = dict(zip(uniqueTexts.keys(), textBlockChecks(modelXbrl, list(uniqueTexts.values()))))
+    
+    # findings are reported in order of the facts
+    for f1, textHash in zip(textBlockFacts, textHashes):
+        disallowedEntities, textFindings = textChecks[textHash]
+        # test encoded entity tags
+        for entity in disallowedEntities:
+            modelXbrl.error(("EFM.6.05.16", "GFM.1.2.15"),
+                _("Fact %(fact)s contextID %(contextID)s has disallowed entity %(entity)s"),
+                modelObject=f1, fact=f1.qname, contextID=f1.contextID, entity=entity, error=entity)
+        # test html
+        for findings in textFindings:
+            for finding in findings:
+                findingType = finding[0]
+                if findingType == "dtdError":
+                    htmlError, error = finding[1:]
+                    modelXbrl.error("EFM.6.05.16" if htmlError else ("EFM.6.05.15.dtdError", "GFM.1.02.14"),
+                        _("Fact %(fact)s contextID %(contextID)s has text which causes the XML error %(error)s"),
+                        modelObject=f1, fact=f1.qname, contextID=f1.contextID, error=error)
+                elif findingType == "activeContent":
+                    attrTag, eltTag = finding[1:]
+                    modelXbrl.error("EFM.6.05.16.activeContent",
+                        _("Fact %(fact)s of context %(contextID)s has javascript in '%(attribute)s' for <%(element)s>"),
+                        modelObject=f1, fact=f1.qname, contextID=f1.contextID,
+                        attribute=attrTag, element=eltTag)
+                elif findingType == "externalReference":
+                    attrTag, eltTag = finding[1:]
+                    modelXbrl.error("EFM.6.05.16.externalReference",
+                        _("Fact %(fact)s of context %(contextID)s has an invalid external reference in '%(attribute)s' for <%(element)s>"),
+                        modelObject=f1, fact=f1.qname, contextID=f1.contextID,
+                        attribute=attrTag, element=eltTag)
+                elif findingType == "graphicFile":
+                    attrValue, eltTag = finding[1:]
+                    if attrValue not in checkedGraphicsFiles:
+                        if attrValue.lower()[-4:] not in ('.jpg', '.gif'):
+                            modelXbrl.error("EFM.6.05.16.graphicFileType",
+                                _("Fact %(fact)s of context %(contextID)s references a graphics file which isn't .gif or .jpg '%(attribute)s' for <%(element)s>"),
+                                modelObject=f1, fact=f1.qname, contextID=f1.contextID,
+                                attribute=attrValue, element=eltTag)
+                        else:   # test file contents
+                            try:
+                                if validateGraphicFile(f1, attrValue) != attrValue.lower()[-3:]:
+                                    modelXbrl.error("EFM.6.05.16.graphicFileContent",
+                                        _("Fact %(fact)s of context %(contextID)s references a graphics file which doesn't have expected content '%(attribute)s' for <%(element)s>"),
                                         modelObject=f1, fact=f1.qname, contextID=f1.contextID,
-                                        attribute=attrTag, element=eltTag)
-                                if attrTag == "src" and attrValue not in checkedGraphicsFiles:
-                                    if attrValue.lower()[-4:] not in ('.jpg', '.gif'):
-                                        modelXbrl.error("EFM.6.05.16.graphicFileType",
-                                            _("Fact %(fact)s of context %(contextID)s references a graphics file which isn't .gif or .jpg '%(attribute)s' for <%(element)s>"),
-                                            modelObject=f1, fact=f1.qname, contextID=f1.contextID,
-                                            attribute=attrValue, element=eltTag)
-                                    else:   # test file contents
-                                        try:
-                                            if validateGraphicFile(f1, attrValue) != attrValue.lower()[-3:]:
-                                                modelXbrl.error("EFM.6.05.16.graphicFileContent",
-                                                    _("Fact %(fact)s of context %(contextID)s references a graphics file which doesn't have expected content '%(attribute)s' for <%(element)s>"),
-                                                    modelObject=f1, fact=f1.qname, contextID=f1.contextID,
-                                                    attribute=attrValue, element=eltTag)
-                                        except IOError as err:
-                                            modelXbrl.error("EFM.6.05.16.graphicFileError",
-                                                _("Fact %(fact)s of context %(contextID)s references a graphics file which isn't openable '%(attribute)s' for <%(element)s>, error: %(error)s"),
-                                                modelObject=f1, fact=f1.qname, contextID=f1.contextID,
-                                                attribute=attrValue, element=eltTag, error=err)
-                                    checkedGraphicsFiles.add(attrValue)
-                        if eltTag == "table" and any(a is not None for a in elt.iterancestors("table")):
-                            modelXbrl.error("EFM.6.05.16.nestedTable",
-                                _("Fact %(fact)s of context %(contextID)s has nested <table> elements."),
-                                modelObject=f1, fact=f1.qname, contextID=f1.contextID)
-                except (XMLSyntaxError,
-                        UnicodeDecodeError) as err:
-                    #if not err.endswith("undefined entity"):
+                                        attribute=attrValue, element=eltTag)
+                            except IOError as err:
+                                modelXbrl.error("EFM.6.05.16.graphicFileError",
+                                    _("Fact %(fact)s of context %(contextID)s references a graphics file which isn't openable '%(attribute)s' for <%(element)s>, error: %(error)s"),
+                                    modelObject=f1, fact=f1.qname, contextID=f1.contextID,
+                                    attribute=attrValue, element=eltTag, error=err)
+                        checkedGraphicsFiles.add(attrValue)
+                elif findingType == "nestedTable":
+                    modelXbrl.error("EFM.6.05.16.nestedTable",
+                        _("Fact %(fact)s of context %(contextID)s has nested <table> elements."),
+                        modelObject=f1, fact=f1.qname, contextID=f1.contextID)
+                elif findingType == "xmlError":
                     modelXbrl.error(("EFM.6.05.15", "GFM.1.02.14"),
                         _("Fact %(fact)s contextID %(contextID)s has text which causes the XML error %(error)s"),
-                        modelObject=f1, fact=f1.qname, contextID=f1.contextID, error=err)
-                    
-                checkedGraphicsFiles.clear()
-                
-            #handler.fact = None
-                #handler.modelXbrl = None
+                        modelObject=f1, fact=f1.qname, contextID=f1.contextID, error=finding[1])
+            checkedGraphicsFiles.clear()
     
+
 def copyHtml(sourceXml, targetHtml):
     for sourceChild in sourceXml.iterchildren():
         targetChild = SubElement(targetHtml,
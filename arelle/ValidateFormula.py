@@ -19,7 +19,7 @@ from arelle.ModelRenderingObject import (ModelRuleDefinitionNode, ModelRelations
 from arelle.ModelObject import (ModelObject)
 from arelle.ModelValue import (qname,QName)
 from arelle import (XbrlConst, XmlUtil, ModelXbrl, ModelDocument, XPathParser, XPathContext, FunctionXs,
-                    ValidateXbrlDimensions) 
+                    ValidateXbrlDimensions, Tracing) 
 
 arcroleChecks = {
     XbrlConst.equalityDefinition:   (None, 
@@ -233,6 +233,7 @@ def executeCallTest(val, name, callTuple, testTuple):
 
         val.modelXbrl.modelManager.showStatus(_("ready"), 2000)
                 
+@Tracing.traced("formula", "formula")
 def validate(val, xpathContext=None, parametersOnly=False, statusMsg='', compileOnly=False):
     for e in ("xbrl.5.1.4.3:cycles", "xbrlgene:violatedCyclesConstraint"):
         if e in val.modelXbrl.errors:
@@ -731,6 +732,8 @@ def validate(val, xpathContext=None, parametersOnly=False, statusMsg='', compile
     val.modelXbrl.profileActivity("... instances scopes and setup", minTimeToShow=1.0)
 
     val.modelXbrl.profileStat(_("formulaValidation"))
+    if val.modelXbrl.modelManager.xpathProgCache is not None:
+        val.modelXbrl.modelManager.xpathProgCache.save() # programs parsed by compilation
     if (initialErrorCount < val.modelXbrl.logCount.get(logging.getLevelName('ERROR'), 0) or
         compileOnly or 
         getattr(val, "validateFormulaCompileOnly", False)):
@@ -781,33 +784,31 @@ def validate(val, xpathContext=None, parametersOnly=False, statusMsg='', compile
         if hasattr(val, "maxFormulaRunTime") and val.maxFormulaRunTime > 0:
             maxFormulaRunTimeTimer = Timer(val.maxFormulaRunTime * 60.0, xpathContext.runTimeExceededCallback)
             maxFormulaRunTimeTimer.start()
+            maxFormulaRunTimeDeadline = time.time() + val.maxFormulaRunTime * 60.0
         else:
-            maxFormulaRunTimeTimer = None
+            maxFormulaRunTimeTimer = maxFormulaRunTimeDeadline = None
             
         # evaluate variable sets not in consistency assertions
         val.modelXbrl.profileActivity("... evaluations", minTimeToShow=1.0)
         for instanceQname in orderedInstancesList:
-            for modelVariableSet in instanceProducingVariableSets[instanceQname]:
-                # produce variable evaluations if no dependent variables-scope relationships
-                if not val.modelXbrl.relationshipSet(XbrlConst.variablesScope).toModelObject(modelVariableSet):
-                    if (not runIDs or 
-                        modelVariableSet.id in runIDs or
-                        (modelVariableSet.hasConsistencyAssertion and 
-                         any(modelRel.fromModelObject.id in runIDs
-                             for modelRel in val.modelXbrl.relationshipSet(XbrlConst.consistencyAssertionFormula).toModelObject(modelVariableSet)
-                             if isinstance(modelRel.fromModelObject, ModelConsistencyAssertion)))):
-                        from arelle.FormulaEvaluator import evaluate
-                        try:
-                            varSetId = (modelVariableSet.id or modelVariableSet.xlinkLabel)
-                            val.modelXbrl.profileActivity("... evaluating " + varSetId, minTimeToShow=10.0)
-                            val.modelXbrl.modelManager.showStatus(_("evaluating {0}").format(varSetId))
-                            val.modelXbrl.profileActivity("... evaluating " + varSetId, minTimeToShow=1.0)
-                            evaluate(xpathContext, modelVariableSet)
-                            val.modelXbrl.profileStat(modelVariableSet.localName + "_" + varSetId)
-                        except XPathContext.XPathException as err:
-                            val.modelXbrl.error(err.code,
-                                _("Variable set \n%(variableSet)s \nException: \n%(error)s"), 
-                                modelObject=modelVariableSet, variableSet=str(modelVariableSet), error=err.message)
+            modelVariableSets = [modelVariableSet
+                                 for modelVariableSet in instanceProducingVariableSets[instanceQname]
+                                 # produce variable evaluations if no dependent variables-scope relationships
+                                 if not val.modelXbrl.relationshipSet(XbrlConst.variablesScope).toModelObject(modelVariableSet) and
+                                    (not runIDs or 
+                                     modelVariableSet.id in runIDs or
+                                     (modelVariableSet.hasConsistencyAssertion and 
+                                      any(modelRel.fromModelObject.id in runIDs
+                                          for modelRel in val.modelXbrl.relationshipSet(XbrlConst.consistencyAssertionFormula).toModelObject(modelVariableSet)
+                                          if isinstance(modelRel.fromModelObject, ModelConsistencyAssertion))))]
+            if instanceQname is None and (formulaOptions.parallelWorkers or 0) > 1:
+                # assertions, after all output instances are produced, may be evaluated concurrently
+                from arelle.FormulaScheduler import evaluateVariableSets
+                evaluateVariableSets(val, xpathContext, modelVariableSets, formulaOptions.parallelWorkers,
+                                     deadline=maxFormulaRunTimeDeadline)
+            else:
+                for modelVariableSet in modelVariableSets:
+                    evaluateVariableSet(val, xpathContext, modelVariableSet)
         if maxFormulaRunTimeTimer:
             maxFormulaRunTimeTimer.cancel()
     except XPathContext.RunTimeExceededException:
@@ -861,6 +862,20 @@ def validate(val, xpathContext=None, parametersOnly=False, statusMsg='', compile
     xpathContext.close()  # dereference everything
     val.modelXbrl.profileStat(_("formulaExecutionTotal"), time.time() - timeFormulasStarted)
 
+def evaluateVariableSet(val, xpathContext, modelVariableSet):
+    from arelle.FormulaEvaluator import evaluate
+    try:
+        varSetId = (modelVariableSet.id or modelVariableSet.xlinkLabel)
+        val.modelXbrl.profileActivity("... evaluating " + varSetId, minTimeToShow=10.0)
+        val.modelXbrl.modelManager.showStatus(_("evaluating {0}").format(varSetId))
+        val.modelXbrl.profileActivity("... evaluating " + varSetId, minTimeToShow=1.0)
+        evaluate(xpathContext, modelVariableSet)
+        val.modelXbrl.profileStat(modelVariableSet.localName + "_" + varSetId)
+    except XPathContext.XPathException as err:
+        val.modelXbrl.error(err.code,
+            _("Variable set \n%(variableSet)s \nException: \n%(error)s"), 
+            modelObject=modelVariableSet, variableSet=str(modelVariableSet), error=err.message)
+
 def checkVariablesScopeVisibleQnames(val, nameVariables, definedNamesSet, modelVariableSet):
     for visibleVarSetRel in val.modelXbrl.relationshipSet(XbrlConst.variablesScope).toModelObject(modelVariableSet):
         varqname = visibleVarSetRel.variableQname # name (if any) of the formula result
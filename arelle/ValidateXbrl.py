@@ -6,7 +6,7 @@ Created on Oct 17, 2010
 '''
 import re
 from arelle import (ModelDocument, XmlUtil, XbrlUtil, XbrlConst, 
-                ValidateXbrlCalcs, ValidateXbrlDimensions, ValidateXbrlDTS, ValidateFormula, ValidateUtr)
+                ValidateXbrlCalcs, ValidateXbrlDimensions, ValidateXbrlDTS, ValidateFormula, ValidateUtr, Tracing)
 from arelle import FunctionIxt
 from arelle.ModelObject import ModelObject
 from arelle.ModelInstanceObject import ModelInlineFact
@@ -46,6 +46,7 @@ class ValidateXbrl:
         if reusable:
             self.testModelXbrl = testModelXbrl
         
+    @Tracing.traced("validate", "validation", spanArgs=lambda self, modelXbrl, *args, **kwargs: {"url": modelXbrl.uri})
     def validate(self, modelXbrl, parameters=None):
         self.parameters = parameters
         self.precisionPattern = re.compile("^([0-9]+|INF)$")
@@ -379,6 +380,11 @@ class ValidateXbrl:
                 for cntx in modelXbrl.contexts.values():
                     ValidateXbrlDimensions.checkContext(self,cntx)
                 modelXbrl.profileStat(_("validateDimensions"))
+                if modelXbrl.modelManager.collectProfileStats and hasattr(self, "dimensionalValidityCache"):
+                    modelXbrl.info("info:profileStats",
+                            _("Dimensional validity of %(hits)s facts reused, %(misses)s checked, "
+                              "for %(entries)s primary item and context signatures of %(contexts)s contexts"),
+                            modelObject=modelXbrl, **self.dimensionalValidityCache.stats)
                     
         # dimensional validity
         #concepts checks
@@ -33,6 +33,8 @@ class ValidateXbrlCalcs:
         self.itemConceptBindKeys = defaultdict(set)
         self.duplicateKeyFacts = {}
         self.duplicatedFacts = set()
+        self.roundedValues = {} # rounded value of each bound fact, rounded once for all its summations
+        self.itemGroupSums = {} # (sum of weighted rounded values, has duplicate facts) by item facts key and weight
         self.esAlFacts = defaultdict(list)
         self.esAlConceptBindKeys = defaultdict(set)
         self.conceptsInEssencesAlias = set()
@@ -97,28 +99,18 @@ class ValidateXbrlCalcs:
                         for sumConcept, modelRels in fromRelationships.items():
                             sumBindingKeys = self.sumConceptBindKeys[sumConcept]
                             dupBindingKeys = set()
-                            boundSumKeys = set()
-                            # determine boundSums
-                            for modelRel in modelRels:
-                                itemBindingKeys = self.itemConceptBindKeys[modelRel.toModelObject]
-                                boundSumKeys |= sumBindingKeys & itemBindingKeys
-                            # add up rounded items
+                            # add up rounded items, by the sums of each item concept's facts of a binding key
                             boundSums = defaultdict(decimal.Decimal) # sum of facts meeting factKey
-                            boundSummationItems = defaultdict(list) # corresponding fact refs for messages
                             for modelRel in modelRels:
                                 weight = modelRel.weightDecimal
                                 itemConcept = modelRel.toModelObject
-                                for itemBindKey in boundSumKeys:
+                                for itemBindKey in sumBindingKeys & self.itemConceptBindKeys[itemConcept]:
                                     ancestor, contextHash, unit = itemBindKey
-                                    factKey = (itemConcept, ancestor, contextHash, unit)
-                                    if factKey in self.itemFacts:
-                                        for fact in self.itemFacts[factKey]:
-                                            if fact in self.duplicatedFacts:
-                                                dupBindingKeys.add(itemBindKey)
-                                            else:
-                                                boundSums[itemBindKey] += roundFact(fact, self.inferDecimals) * weight
-                                                boundSummationItems[itemBindKey].append(wrappedFactWithWeight(fact,weight))
-                            for sumBindKey in boundSumKeys:
+                                    itemsSum, hasDuplicates = self.itemGroupSum((itemConcept, ancestor, contextHash, unit), weight)
+                                    if hasDuplicates:
+                                        dupBindingKeys.add(itemBindKey)
+                                    boundSums[itemBindKey] += itemsSum
+                            for sumBindKey in boundSums:
                                 ancestor, contextHash, unit = sumBindKey
                                 factKey = (sumConcept, ancestor, contextHash, unit)
                                 if factKey in self.sumFacts:
@@ -127,20 +119,19 @@ class ValidateXbrlCalcs:
                                         if fact in self.duplicatedFacts:
                                             dupBindingKeys.add(sumBindKey)
                                         elif sumBindKey not in dupBindingKeys:
-                                            roundedSum = roundFact(fact, self.inferDecimals)
+                                            roundedSum = self.roundedValue(fact)
                                             roundedItemsSum = roundFact(fact, self.inferDecimals, vDecimal=boundSums[sumBindKey])
-                                            if roundedItemsSum  != roundFact(fact, self.inferDecimals):
+                                            if roundedItemsSum  != roundedSum:
                                                 d = inferredDecimals(fact)
                                                 if isnan(d) or isinf(d): d = 4
                                                 self.modelXbrl.log('INCONSISTENCY', "xbrl.5.2.5.2:calcInconsistency",
                                                     _("Calculation inconsistent from %(concept)s in link role %(linkrole)s reported sum %(reportedSum)s computed sum %(computedSum)s context %(contextID)s unit %(unitID)s"),
-                                                    modelObject=[fact] + boundSummationItems[sumBindKey], 
+                                                    modelObject=[fact] + self.summationItems(modelRels, sumBindKey), 
                                                     concept=sumConcept.qname, linkrole=ELR, 
                                                     linkroleDefinition=self.modelXbrl.roleTypeDefinition(ELR),
                                                     reportedSum=Locale.format_decimal(self.modelXbrl.locale, roundedSum, 1, max(d,0)),
                                                     computedSum=Locale.format_decimal(self.modelXbrl.locale, roundedItemsSum, 1, max(d,0)), 
                                                     contextID=fact.context.id, unitID=fact.unit.id)
-                            boundSummationItems.clear() # dereference facts in list
                     elif arcrole == XbrlConst.essenceAlias:
                         for modelRel in relsSet.modelRelationships:
                             essenceConcept = modelRel.fromModelObject
@@ -186,6 +177,47 @@ class ValidateXbrlCalcs:
                                         linkroleDefinition=self.modelXbrl.roleTypeDefinition(ELR))
         self.modelXbrl.profileActivity("... find inconsistencies", minTimeToShow=1.0)
         self.modelXbrl.profileActivity() # reset
+        self.roundedValues.clear() # dereference facts
+        self.itemGroupSums.clear()
+        
+    def roundedValue(self, fact):
+        """Rounded value of a bound fact, rounded only once for all summations it takes part in"""
+        try:
+            return self.roundedValues[fact]
+        except KeyError:
+            vRounded = self.roundedValues[fact] = roundFact(fact, self.inferDecimals)
+            return vRounded
+        
+    def itemGroupSum(self, factKey, weight):
+        """Sum of weighted rounded values of the non-duplicated item facts of factKey (concept, ancestor, contextHash, unit), 
+        and whether any of its facts are duplicated.  Each group is summed once per weight, for all summations (in any 
+        link role) with its concept as an item.  
+        
+        Each rounded value is weighted before adding, as the exponent of the computed sum (e.g., of 0 vs 0.0) 
+        determines its inferred precision, so the weight's representation (not just its value) is part of the key.
+        """
+        groupKey = (factKey, str(weight))
+        try:
+            return self.itemGroupSums[groupKey]
+        except KeyError:
+            pass
+        itemsSum = ZERO
+        hasDuplicates = False
+        for fact in self.itemFacts[factKey]:
+            if fact in self.duplicatedFacts:
+                hasDuplicates = True
+            else:
+                itemsSum += self.roundedValue(fact) * weight
+        result = self.itemGroupSums[groupKey] = (itemsSum, hasDuplicates)
+        return result
+    
+    def summationItems(self, modelRels, bindKey):
+        """Item facts (wrapped with their weights) of an inconsistent summation, for its message"""
+        ancestor, contextHash, unit = bindKey
+        return [wrappedFactWithWeight(fact, modelRel.weightDecimal)
+                for modelRel in modelRels
+                for fact in self.itemFacts.get((modelRel.toModelObject, ancestor, contextHash, unit), ())
+                if fact not in self.duplicatedFacts]
     
     def bindFacts(self, facts, ancestors):
         for f in facts:
@@ -327,7 +327,63 @@ def checkFact(val, f, otherFacts=None):
             _("Fact %(fact)s context %(contextID)s dimensionally not valid"),
             modelObject=f, fact=f.qname, contextID=f.context.id)
 
+class DimensionalValidityCache(dict):
+    """Dimensional validity of facts, by primary item concept and dimensional signature of the fact's context
+    (see contextDimSignature), kept by the validator (val.dimensionalValidityCache).  Facts of a primary
+    item in contexts with the same signature are equally valid, so only one of them is checked.
+    
+        .. attribute:: hits, misses
+        
+        Counts of facts whose validity was found in the cache, and which were checked
+    """
+    def __init__(self):
+        super(DimensionalValidityCache, self).__init__()
+        self.contextSignatures = {} # of instance contexts (context prototypes aren't kept)
+        self.hits = self.misses = 0
+        
+    def contextSignature(self, context):
+        if isinstance(context, ContextPrototype):
+            return contextDimSignature(context)
+        try:
+            return self.contextSignatures[context]
+        except KeyError:
+            signature = self.contextSignatures[context] = contextDimSignature(context)
+            return signature
+        
+    @property
+    def stats(self):
+        return {"entries": len(self),
+                "contexts": len(self.contextSignatures),
+                "hits": self.hits,
+                "misses": self.misses}
+    
+def contextDimSignature(context):
+    """Hashable signature of the context's dimensional validity for any primary item: for segment and for scenario, 
+    the set of dimension concepts with their explicit member concepts, and whether there is non-dimensional content
+    """
+    return tuple((frozenset((dimConcept, None if dimConcept.isTypedDimension else modelDimValue.member)
+                            for dimConcept, modelDimValue in context.dimValues(contextElement).items()),
+                  len(context.nonDimValues(contextElement)) > 0)
+                 for contextElement in ("segment", "scenario"))
+
 def isFactDimensionallyValid(val, f, setPrototypeContextElements=False, otherFacts=None):
+    if setPrototypeContextElements and isinstance(f.context, ContextPrototype):
+        # prototype dimension values are moved to valid context elements, not cacheable
+        return findFactDimensionalValidity(val, f, setPrototypeContextElements, otherFacts)
+    try:
+        validityCache = val.dimensionalValidityCache
+    except AttributeError:
+        validityCache = val.dimensionalValidityCache = DimensionalValidityCache()
+    key = (f.concept, validityCache.contextSignature(f.context))
+    try:
+        isValid = validityCache[key]
+        validityCache.hits += 1
+    except KeyError:
+        isValid = validityCache[key] = findFactDimensionalValidity(val, f, otherFacts=otherFacts)
+        validityCache.misses += 1
+    return isValid
+
+def findFactDimensionalValidity(val, f, setPrototypeContextElements=False, otherFacts=None):
     hasElrHc = False
     for ELR, hcRels in priItemElrHcRels(val, f.concept).items():
         hasElrHc = True
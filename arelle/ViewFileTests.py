@@ -5,6 +5,7 @@ Created on Nov 28, 2010
 (c) Copyright 2010 Mark V Systems Limited, All rights reserved.
 '''
 from arelle import ModelDocument, ViewFile
+from lxml import etree
 import os
 
 def viewTests(modelXbrl, outfile, cols=None):
@@ -13,6 +14,50 @@ def viewTests(modelXbrl, outfile, cols=None):
     view.viewTestcaseIndexElement(modelXbrl.modelDocument)
     view.close()
     
+def viewTestsJUnit(modelXbrl, outfile):
+    """Writes the variation results of a testcases index (or testcase) as a JUnit XML report, with a
+    testsuite for each testcase, for continuous integration servers"""
+    modelXbrl.modelManager.showStatus(_("viewing Tests as JUnit XML"))
+    modelDocument = modelXbrl.modelDocument
+    if modelDocument.type in (ModelDocument.Type.TESTCASESINDEX, ModelDocument.Type.REGISTRY):
+        testcases = sorted(modelDocument.referencesDocument.keys(), key=lambda doc: doc.uri)
+    else:
+        testcases = [modelDocument]
+    totals = {"tests": 0, "failures": 0, "errors": 0, "skipped": 0, "time": 0.0}
+    testsuitesElt = etree.Element("testsuites", name=os.path.basename(modelDocument.uri))
+    for testcase in testcases:
+        testcaseName = os.path.splitext(testcase.basename)[0]
+        counts = {"tests": 0, "failures": 0, "errors": 0, "skipped": 0, "time": 0.0}
+        testsuiteElt = etree.SubElement(testsuitesElt, "testsuite", name=testcaseName)
+        for modelTestcaseVariation in getattr(testcase, "testcaseVariations", ()):
+            status = modelTestcaseVariation.status
+            duration = modelTestcaseVariation.duration or 0.0
+            testElt = etree.SubElement(testsuiteElt, "testcase", classname=testcaseName,
+                                       name=str(modelTestcaseVariation.id or modelTestcaseVariation.name),
+                                       time="{0:.3f}".format(duration))
+            message = _("expected {0}, actual {1}").format(
+                            modelTestcaseVariation.expected,
+                            " ".join(str(code) for code in modelTestcaseVariation.actual) or _("no errors"))
+            if not status:
+                etree.SubElement(testElt, "skipped")
+                counts["skipped"] += 1
+            elif status == "fail":
+                etree.SubElement(testElt, "failure", message=message, type=status)
+                counts["failures"] += 1
+            elif status not in ("pass", "generated"): # such as not loadable
+                etree.SubElement(testElt, "error", message=message, type=status)
+                counts["errors"] += 1
+            counts["tests"] += 1
+            counts["time"] += duration
+        for attr, count in counts.items():
+            testsuiteElt.set(attr, "{0:.3f}".format(count) if attr == "time" else str(count))
+            totals[attr] += count
+    for attr, count in totals.items():
+        testsuitesElt.set(attr, "{0:.3f}".format(count) if attr == "time" else str(count))
+    with open(outfile, "wb") as fh:
+        fh.write(etree.tostring(testsuitesElt, encoding="utf-8", xml_declaration=True, pretty_print=True))
+    modelXbrl.modelManager.showStatus(_("JUnit XML test report saved"), 2000)
+    
 class ViewTests(ViewFile.View):
     def __init__(self, modelXbrl, outfile, cols):
         super(ViewTests, self).__init__(modelXbrl, outfile, "Tests")
@@ -23,7 +68,7 @@ class ViewTests(ViewFile.View):
             if isinstance(self.cols,str): self.cols = self.cols.replace(',',' ').split()
             unrecognizedCols = []
             for col in self.cols:
-                if col not in ("Index", "Testcase", "ID", "Name", "Reference", "ReadMeFirst", "Status", "Expected","Actual"):
+                if col not in ("Index", "Testcase", "ID", "Name", "Reference", "ReadMeFirst", "Status", "Expected","Actual", "Time"):
                     unrecognizedCols.append(col)
             if unrecognizedCols:
                 self.modelXbrl.error("arelle:unrecognizedTestReportColumn",
@@ -91,6 +136,9 @@ class ViewTests(ViewFile.View):
                 cols.append(modelTestcaseVariation.expected)
             elif col == "Actual":
                 cols.append(" ".join(str(code) for code in modelTestcaseVariation.actual))
+            elif col == "Time":
+                cols.append("{0:.3f}".format(modelTestcaseVariation.duration)
+                            if modelTestcaseVariation.duration is not None else "")
             else:
                 cols.append("")
         self.addRow(cols, xmlRowElementName="variation")
@@ -10,6 +10,7 @@ from arelle import (ModelXbrl, XmlUtil, ModelVersReport, XbrlConst, ModelDocumen
 from arelle.FileSource import openFileSource
 from arelle.ModelValue import (qname, QName)
 from arelle.PluginManager import pluginClassMethods
+from arelle.RssItemScheduler import processRssItems
 from arelle.UrlUtil import parseRfcDatetime
 import datetime
 
@@ -96,110 +97,26 @@ class WatchRss:
                 for rssItem in self.rssModelXbrl.modelDocument.rssItems:
                     pubDateRssItems.append((rssItem.pubDate,rssItem.objectId()))
                 
+                # items processed in prior cycles (or before a restart) are not processed again
+                self.latestPubDate = XmlUtil.datetimeValue(rssWatchOptions.get("latestPubDate"))
+                self.latestAccessionNumbers = list(rssWatchOptions.get("latestPubDateAccessionNumbers") or ())
+                rssItems = []
                 for pubDate, rssItemObjectId in sorted(pubDateRssItems):
                     rssItem = self.rssModelXbrl.modelObject(rssItemObjectId)
-                    # update ui thread via modelManager (running in background here)
-                    self.rssModelXbrl.modelManager.viewModelObject(self.rssModelXbrl, rssItem.objectId())
-                    if self.stopRequested:
-                        break
-                    latestPubDate = XmlUtil.datetimeValue(rssWatchOptions.get("latestPubDate"))
-                    if (latestPubDate and 
-                        rssItem.pubDate < latestPubDate):
+                    if (self.latestPubDate and 
+                        (rssItem.pubDate < self.latestPubDate or
+                         (rssItem.pubDate == self.latestPubDate and rssItem.accessionNumber in self.latestAccessionNumbers))):
                         continue
-                    try:
-                        # try zipped URL if possible, else expanded instance document
-                        modelXbrl = ModelXbrl.load(self.rssModelXbrl.modelManager, 
-                                                   openFileSource(rssItem.zippedUrl, self.cntlr),
-                                                   postLoadAction)
-                        if self.stopRequested:
-                            modelXbrl.close()
-                            break
-                        
-                        emailAlert = False
-                        if modelXbrl.modelDocument is None:
-                            modelXbrl.error("arelle.rssWatch",
-                                            _("RSS item %(company)s %(form)s document not loaded: %(date)s"),
-                                            modelXbrl=modelXbrl, company=rssItem.companyName, 
-                                            form=rssItem.formType, date=rssItem.filingDate)
-                            rssItem.status = "not loadable"
-                        else:
-                            # validate schema, linkbase, or instance
-                            if self.stopRequested:
-                                modelXbrl.close()
-                                break
-                            if self.instValidator:
-                                self.instValidator.validate(modelXbrl)
-                                if modelXbrl.errors and rssWatchOptions.get("alertValiditionError"):
-                                    emailAlert = True
-                            for pluginXbrlMethod in pluginClassMethods("RssWatch.DoWatchAction"):  
-                                pluginXbrlMethod(modelXbrl, rssWatchOptions, rssItem)      
-                            # check match expression
-                            if matchPattern:
-                                for fact in modelXbrl.factsInInstance:
-                                    v = fact.value
-                                    if v is not None:
-                                        m = matchPattern.search(v)
-                                        if m:
-                                            fr, to = m.span()
-                                            msg = _("Fact Variable {0}\n context {1}\n matched text: {2}").format( 
-                                                    fact.qname, fact.contextID, v[max(0,fr-20):to+20])
-                                            modelXbrl.info("arelle.rssInfo",
-                                                           msg,
-                                                           modelXbrl=modelXbrl) # msg as code passes it through to the status
-                                            if rssWatchOptions.get("alertMatchedFactText"):
-                                                emailAlert = True
-                                        
-                            if (rssWatchOptions.get("formulaFileUri") and rssWatchOptions.get("validateFormulaAssertions") and
-                                self.instValidator): 
-                                # attach formulas
-                                ModelDocument.load(modelXbrl, rssWatchOptions["formulaFileUri"])
-                                ValidateFormula.validate(self.instValidator)
-                                
-                        rssItem.setResults(modelXbrl)
-                        modelXbrl.close()
-                        del modelXbrl  # completely dereference
-                        self.rssModelXbrl.modelManager.viewModelObject(self.rssModelXbrl, rssItem.objectId())
-                        if rssItem.assertionUnsuccessful and rssWatchOptions.get("alertAssertionUnsuccessful"):
-                            emailAlert = True
-                        
-                        msg = _("Filing CIK {0}\n "
-                                 "company {1}\n "
-                                 "published {2}\n "
-                                 "form type {3}\n "
-                                 "filing date {4}\n "
-                                 "period {5}\n "
-                                 "year end {6}\n "
-                                 "results: {7}").format(
-                                 rssItem.cikNumber,
-                                 rssItem.companyName,
-                                 rssItem.pubDate,
-                                 rssItem.formType,
-                                 rssItem.filingDate,
-                                 rssItem.period,
-                                 rssItem.fiscalYearEnd,
-                                 rssItem.status)
-                        self.rssModelXbrl.info("arelle:rssWatch", msg, modelXbrl=self.rssModelXbrl)
-                        emailAddress = rssWatchOptions.get("emailAddress")
-                        if emailAlert and emailAddress:
-                            self.rssModelXbrl.modelManager.showStatus(_("sending e-mail alert"))
-                            import smtplib
-                            from email.mime.text import MIMEText
-                            emailMsg = MIMEText(msg)
-                            emailMsg["Subject"] = _("Arelle RSS Watch alert on {0}").format(rssItem.companyName)
-                            emailMsg["From"] = emailAddress
-                            emailMsg["To"] = emailAddress
-                            smtp = smtplib.SMTP()
-                            smtp.sendmail(emailAddress, [emailAddress], emailMsg.as_string())
-                            smtp.quit()
-                        self.rssModelXbrl.modelManager.showStatus(_("RSS item {0}, {1} completed, status {2}").format(rssItem.companyName, rssItem.formType, rssItem.status), 3500)
-                        self.rssModelXbrl.modelManager.cntlr.rssWatchUpdateOption(rssItem.pubDate.strftime('%Y-%m-%dT%H:%M:%S'))
-                    except Exception as err:
-                        self.rssModelXbrl.error("arelle.rssError",
-                                                _("RSS item %(company)s, %(form)s, %(date)s, exception: %(error)s"),
-                                                modelXbrl=self.rssModelXbrl, company=rssItem.companyName, 
-                                                form=rssItem.formType, date=rssItem.filingDate, error=err,
-                                                exc_info=True)
-                    if self.stopRequested: break
+                    rssItems.append(rssItem)
+                
+                self.rssWatchOptions = rssWatchOptions
+                self.matchPattern = matchPattern
+                self.postLoadAction = postLoadAction
+                processRssItems(self.rssModelXbrl, rssItems, self.processRssItem, self.finishRssItem, 
+                                itemAction=self.doWatchActions if any(pluginClassMethods("RssWatch.DoWatchAction")) else None,
+                                isStopRequested=lambda: self.stopRequested,
+                                numWorkers=rssWatchOptions.get("validateRssWorkers"),
+                                numPrefetch=rssWatchOptions.get("rssPrefetchFilings"))
             if self.stopRequested: 
                 self.cntlr.showStatus(_("RSS watch, stop requested"), 10000)
             else:
@@ -209,4 +126,133 @@ class WatchRss:
         self.thread = None  # close thread
         self.stopRequested = False
         
-                
\ No newline at end of file
+                
+        
+    def processRssItem(self, rssItem, itemAction):
+        """Loads, validates and matches the filing of an rss item (in a worker process, if processing concurrently),
+        then has its plug-in watch actions done (by itemAction, if not None).
+
+        :returns: bool -- True if an e-mail alert is due, or None if the item wasn't processed
+        """
+        rssWatchOptions = self.rssWatchOptions
+        # update ui thread via modelManager (running in background here)
+        self.rssModelXbrl.modelManager.viewModelObject(self.rssModelXbrl, rssItem.objectId())
+        try:
+            # try zipped URL if possible, else expanded instance document
+            modelXbrl = ModelXbrl.load(self.rssModelXbrl.modelManager, 
+                                       openFileSource(rssItem.zippedUrl, self.cntlr),
+                                       self.postLoadAction)
+            if self.stopRequested:
+                modelXbrl.close()
+                return None
+            
+            emailAlert = False
+            if modelXbrl.modelDocument is None:
+                modelXbrl.error("arelle.rssWatch",
+                                _("RSS item %(company)s %(form)s document not loaded: %(date)s"),
+                                modelXbrl=modelXbrl, company=rssItem.companyName, 
+                                form=rssItem.formType, date=rssItem.filingDate)
+                rssItem.status = "not loadable"
+            else:
+                # validate schema, linkbase, or instance
+                if self.instValidator:
+                    self.instValidator.validate(modelXbrl)
+                    if modelXbrl.errors and rssWatchOptions.get("alertValiditionError"):
+                        emailAlert = True
+                # check match expression
+                if self.matchPattern:
+                    for fact in modelXbrl.factsInInstance:
+                        v = fact.value
+                        if v is not None:
+                            m = self.matchPattern.search(v)
+                            if m:
+                                fr, to = m.span()
+                                msg = _("Fact Variable {0}\n context {1}\n matched text: {2}").format( 
+                                        fact.qname, fact.contextID, v[max(0,fr-20):to+20])
+                                modelXbrl.info("arelle.rssInfo",
+                                               msg,
+                                               modelXbrl=modelXbrl) # msg as code passes it through to the status
+                                if rssWatchOptions.get("alertMatchedFactText"):
+                                    emailAlert = True
+                            
+                if (rssWatchOptions.get("formulaFileUri") and rssWatchOptions.get("validateFormulaAssertions") and
+                    self.instValidator): 
+                    # attach formulas
+                    ModelDocument.load(modelXbrl, rssWatchOptions["formulaFileUri"])
+                    ValidateFormula.validate(self.instValidator)
+                    
+            rssItem.setResults(modelXbrl)
+            # plug-in watch actions (such as storing the filing) see the items, with their results, in order of publication
+            if itemAction is not None and modelXbrl.modelDocument is not None:
+                itemAction(rssItem, modelXbrl)
+            modelXbrl.close()
+            del modelXbrl  # completely dereference
+            if rssItem.assertionUnsuccessful and rssWatchOptions.get("alertAssertionUnsuccessful"):
+                emailAlert = True
+            return emailAlert
+        except Exception as err:
+            self.rssModelXbrl.error("arelle.rssError",
+                                    _("RSS item %(company)s, %(form)s, %(date)s, exception: %(error)s"),
+                                    modelXbrl=self.rssModelXbrl, company=rssItem.companyName, 
+                                    form=rssItem.formType, date=rssItem.filingDate, error=err,
+                                    exc_info=True)
+            return None
+        
+    def doWatchActions(self, rssItem, modelXbrl):
+        for pluginXbrlMethod in pluginClassMethods("RssWatch.DoWatchAction"):  
+            pluginXbrlMethod(modelXbrl, self.rssWatchOptions, rssItem)      
+        
+    def finishRssItem(self, rssItem, emailAlert):
+        """Records a processed rss item as the latest processed (just after its watch actions, so that they
+        aren't done again on resuming), and reports its results, in order of publication"""
+        if emailAlert is None: # not processed
+            return
+        rssWatchOptions = self.rssWatchOptions
+        try:
+            # items of the same pubDate are distinguished by accession number, for resuming after a stop
+            if rssItem.pubDate == self.latestPubDate:
+                self.latestAccessionNumbers.append(rssItem.accessionNumber)
+            else:
+                self.latestPubDate = rssItem.pubDate
+                self.latestAccessionNumbers = [rssItem.accessionNumber]
+            self.rssModelXbrl.modelManager.cntlr.rssWatchUpdateOption(
+                latestPubDate=rssItem.pubDate.strftime('%Y-%m-%dT%H:%M:%S'),
+                latestPubDateAccessionNumbers=self.latestAccessionNumbers[:])
+            self.rssModelXbrl.modelManager.viewModelObject(self.rssModelXbrl, rssItem.objectId())
+            
+            msg = _("Filing CIK {0}\n "
+                     "company {1}\n "
+                     "published {2}\n "
+                     "form type {3}\n "
+                     "filing date {4}\n "
+                     "period {5}\n "
+                     "year end {6}\n "
+                     "results: {7}").format(
+                     rssItem.cikNumber,
+                     rssItem.companyName,
+                     rssItem.pubDate,
+                     rssItem.formType,
+                     rssItem.filingDate,
+                     rssItem.period,
+                     rssItem.fiscalYearEnd,
+                     rssItem.status)
+            self.rssModelXbrl.info("arelle:rssWatch", msg, modelXbrl=self.rssModelXbrl)
+            emailAddress = rssWatchOptions.get("emailAddress")
+            if emailAlert and emailAddress:
+                self.rssModelXbrl.modelManager.showStatus(_("sending e-mail alert"))
+                import smtplib
+                from email.mime.text import MIMEText
+                emailMsg = MIMEText(msg)
+                emailMsg["Subject"] = _("Arelle RSS Watch alert on {0}").format(rssItem.companyName)
+                emailMsg["From"] = emailAddress
+                emailMsg["To"] = emailAddress
+                smtp = smtplib.SMTP()
+                smtp.sendmail(emailAddress, [emailAddress], emailMsg.as_string())
+                smtp.quit()
+            self.rssModelXbrl.modelManager.showStatus(_("RSS item {0}, {1} completed, status {2}").format(rssItem.companyName, rssItem.formType, rssItem.status), 3500)
+        except Exception as err:
+            self.rssModelXbrl.error("arelle.rssError",
+                                    _("RSS item %(company)s, %(form)s, %(date)s, exception: %(error)s"),
+                                    modelXbrl=self.rssModelXbrl, company=rssItem.companyName, 
+                                    form=rssItem.formType, date=rssItem.filingDate, error=err,
+                                    exc_info=True)
@@ -4,23 +4,39 @@ Created on Oct 5, 2010
 @author: Mark V Systems Limited
 (c) Copyright 2010 Mark V Systems Limited, All rights reserved.
 '''
-import os, posixpath, sys, re, shutil, time, calendar, io, json
+import os, posixpath, sys, re, shutil, time, calendar, io, json, threading
 if sys.version[0] >= '3':
     from urllib.parse import quote, unquote
     from urllib.error import URLError, HTTPError, ContentTooShortError
     from urllib import request
     from urllib import request as proxyhandlers
+    import queue
 else: # python 2.7.2
     from urllib import quote, unquote
     from urllib import ContentTooShortError
     from urllib2 import URLError, HTTPError
     import urllib2 as proxyhandlers
+    import Queue as queue
 from arelle.FileSource import SERVER_WEB_CACHE
 from arelle.UrlUtil import isHttpUrl
+from arelle.HttpConnectionPool import HttpConnectionPool, httpclient
 addServerWebCache = None
     
 DIRECTORY_INDEX_FILE = "!~DirectoryIndex~!"
 
+def tempFilepath(filepath, suffix="tmp"):
+    """Temporary name to retrieve filepath into, unique to the process and thread (which may be one of several
+    processes, such as batch or web server workers, sharing the cache)"""
+    return "{0}.{1}.{2}.{3}".format(filepath, os.getpid(), threading.current_thread().ident, suffix)
+
+try:
+    replaceFile = os.replace # replaces an existing file (also on windows) in one step
+except AttributeError: # python before 3.3
+    def replaceFile(src, dst):
+        if sys.platform == "win32" and os.path.exists(dst):
+            os.remove(dst) # rename can't replace on windows
+        os.rename(src, dst)
+
 def proxyDirFmt(httpProxyTuple):
     if isinstance(httpProxyTuple,(tuple,list)) and len(httpProxyTuple) == 5:
         useOsProxy, urlAddr, urlPort, user, password = httpProxyTuple
@@ -52,6 +68,10 @@ def proxyTuple(url): # system, none, or http:[user[:passowrd]@]host[:port]
     user, sep, password = userpwd.partition(":")
     return (False, urlAddr, urlPort, user, password)
     
+def httpDate(timestamp):
+    from email.utils import formatdate
+    return formatdate(timestamp, usegmt=True)
+
 def lastModifiedTime(headers):
     if headers:
         headerTimeStamp = headers["last-modified"]
@@ -105,6 +125,21 @@ class WebCache:
         else:
             self.cachedUrlCheckTimes = {}
         self.cachedUrlCheckTimesModified = False
+        # entity tags (ETag headers) of cached files, for conditional requests when checking if newer
+        if cntlr.hasFileSystem:
+            self.urlETagsJsonFile = cntlr.userAppDir + os.sep + "cachedUrlETags.json"
+            try:
+                with io.open(self.urlETagsJsonFile, 'rt', encoding='utf-8') as f:
+                    self.cachedUrlETags = json.load(f)
+            except Exception:
+                self.cachedUrlETags = {}
+        else:
+            self.cachedUrlETags = {}
+        self.connectionPool = HttpConnectionPool()
+        self.openerHosts = set() # hosts requiring authentication, requested by opener
+        self.prefetchWorkers = 8 # concurrent downloads of documents found by discovery, 0 to not prefetch
+        self.prefetchWorkersPerHost = 4
+        self._prefetcher = None
             
 
     @property
@@ -115,11 +150,26 @@ class WebCache:
     def timeout(self, seconds):
         self._timeout = seconds
 
+    @property
+    def prefetcher(self):
+        """WebCachePrefetcher of documents to be discovered, or None if not prefetching (or working offline)"""
+        if self.prefetchWorkers <= 0 or self.workOffline or self.cacheDir == SERVER_WEB_CACHE:
+            return None
+        if self._prefetcher is None or self._prefetcher.maxWorkers != self.prefetchWorkers:
+            if self._prefetcher is not None: # threads of prior number of workers end
+                self._prefetcher.shutdown()
+            self._prefetcher = WebCachePrefetcher(self, self.prefetchWorkers, self.prefetchWorkersPerHost)
+        return self._prefetcher
+
     def saveUrlCheckTimes(self):
         if self.cachedUrlCheckTimesModified:
             with io.open(self.urlCheckJsonFile, 'wt', encoding='utf-8') as f:
-                jsonStr = _STR_UNICODE(json.dumps(self.cachedUrlCheckTimes, ensure_ascii=False, indent=0)) # might not be unicode in 2.7
+                # copy, as prefetch threads may be adding check times
+                jsonStr = _STR_UNICODE(json.dumps(dict(self.cachedUrlCheckTimes), ensure_ascii=False, indent=0)) # might not be unicode in 2.7
                 f.write(jsonStr)  # 2.7 gets unicode this way
+            with io.open(self.urlETagsJsonFile, 'wt', encoding='utf-8') as f:
+                jsonStr = _STR_UNICODE(json.dumps(dict(self.cachedUrlETags), ensure_ascii=False, indent=0))
+                f.write(jsonStr)
         self.cachedUrlCheckTimesModified = False
         
     def resetProxies(self, httpProxyTuple):
@@ -136,6 +186,7 @@ class WebCache:
             self.opener = proxyhandlers.build_opener(self.proxy_handler, self.ntlm_auth_handler, self.proxy_auth_handler, self.http_auth_handler)
         else:
             self.opener = proxyhandlers.build_opener(self.proxy_handler, self.proxy_auth_handler, self.http_auth_handler)
+        self.openerHosts = set()
 
         #self.opener.close()
         #self.opener = WebCacheUrlOpener(self.cntlr, proxyDirFmt(httpProxyTuple))
@@ -219,6 +270,8 @@ class WebCache:
             url = self.normalizeUrl(url, base)
         urlScheme, schemeSep, urlSchemeSpecificPart = url.partition("://")
         if schemeSep and urlScheme in ("http", "https"):
+            if self._prefetcher is not None:
+                self._prefetcher.wait(url) # if being prefetched let it complete, if only queued retrieve it here
             # form cache file name (substituting _ for any illegal file characters)
             filepath = self.urlToCacheFilepath(url)
             if self.cacheDir == SERVER_WEB_CACHE:
@@ -233,7 +286,7 @@ class WebCache:
                 filepath = filepath.replace('/', '\\')
             if self.workOffline or filenameOnly:
                 return filepath
-            filepathtmp = filepath + ".tmp"
+            filepathtmp = tempFilepath(filepath)
             fileExt = os.path.splitext(filepath)[1]
             timeNow = time.time()
             timeNowStr = time.strftime('%Y-%m-%dT%H:%M:%S UTC', time.gmtime(timeNow))
@@ -243,21 +296,11 @@ class WebCache:
                 else:
                     cachedTime = 0
                 if timeNow - cachedTime > self.maxAgeSeconds:
-                    # weekly check if newer file exists
-                    newerOnWeb = False
-                    try: # no provision here for proxy authentication!!!
-                        remoteFileTime = lastModifiedTime( self.getheaders(quotedUrl) )
-                        if remoteFileTime and remoteFileTime > os.path.getmtime(filepath):
-                            newerOnWeb = True
-                    except:
-                        pass # for now, forget about authentication here
-                    if not newerOnWeb:
-                        # update ctime by copying file and return old file
-                        self.cachedUrlCheckTimes[url] = timeNowStr
-                        self.cachedUrlCheckTimesModified = True
-                        return filepath
-                else:
-                    return filepath
+                    # weekly check if newer file exists (retrieved by the same conditional request)
+                    self.revalidate(url, quotedUrl, filepath, filepathtmp)
+                    self.cachedUrlCheckTimes[url] = timeNowStr
+                    self.cachedUrlCheckTimesModified = True
+                return filepath
             filedir = os.path.dirname(filepath)
             if not os.path.exists(filedir):
                 os.makedirs(filedir)
@@ -355,19 +398,15 @@ class WebCache:
                     self.workOffline = True
                     return filepath
                 
-                # rename temporarily named downloaded file to desired name                
-                if os.path.exists(filepath):
-                    try:
-                        os.remove(filepath)
-                    except Exception as err:
-                        self.cntlr.addToLog(_("{0} \nUnsuccessful removal of prior file {1} \nPlease remove with file manager.").format(err,filepath))
+                # rename temporarily named downloaded file to desired name (replacing any prior file)
                 try:
-                    os.rename(filepathtmp, filepath)
+                    replaceFile(filepathtmp, filepath)
                 except Exception as err:
                     self.cntlr.addToLog(_("{0} \nUnsuccessful renaming of downloaded file to active file {1} \nPlease remove with file manager.").format(err,filepath))
                 webFileTime = lastModifiedTime(headers)
                 if webFileTime: # set mtime to web mtime
                     os.utime(filepath,(webFileTime,webFileTime))
+                self.setETag(url, headers)
                 self.cachedUrlCheckTimes[url] = timeNowStr
                 self.cachedUrlCheckTimesModified = True
                 return filepath
@@ -378,6 +417,135 @@ class WebCache:
             url = url.replace('/', '\\')
         return url
     
+    def prefetchFile(self, url):
+        """Retrieves url into the cache, if not already cached, for a prefetch thread.  Retrievals which 
+        are unsuccessful (or look like a logon page) are left for getfilename, which reports errors and 
+        handles authentication.
+        """
+        filepath = self.urlToCacheFilepath(url)
+        if filepath.endswith("/"):
+            filepath += DIRECTORY_INDEX_FILE
+        if os.sep == '\\':
+            filepath = filepath.replace('/', '\\')
+        urlScheme, schemeSep, urlSchemeSpecificPart = url.partition("://")
+        quotedUrl = urlScheme + schemeSep + quote(urlSchemeSpecificPart, '/?=&')
+        filepathtmp = tempFilepath(filepath, "prefetch")
+        if os.path.exists(filepath):
+            # check if newer file exists if due, as getfilename would
+            checkTime = self.cachedUrlCheckTimes.get(url)
+            if checkTime:
+                cachedTime = calendar.timegm(time.strptime(checkTime, '%Y-%m-%dT%H:%M:%S UTC'))
+            else:
+                cachedTime = 0
+            timeNow = time.time()
+            if timeNow - cachedTime > self.maxAgeSeconds:
+                self.revalidate(url, quotedUrl, filepath, filepathtmp)
+                self.cachedUrlCheckTimes[url] = time.strftime('%Y-%m-%dT%H:%M:%S UTC', time.gmtime(timeNow))
+                self.cachedUrlCheckTimesModified = True
+            return
+        try:
+            filedir = os.path.dirname(filepath)
+            if not os.path.exists(filedir):
+                try:
+                    os.makedirs(filedir)
+                except OSError: # made by another thread
+                    pass
+            savedfile, headers, initialBytes = self.retrieve(quotedUrl, filename=filepathtmp)
+            if os.path.splitext(filepath)[1] in {".xsd", ".xml", ".xbrl"} and b"<html" in initialBytes:
+                os.remove(filepathtmp)
+                return
+            if not os.path.exists(filepath): # (unless retrieved meanwhile by getfilename)
+                replaceFile(filepathtmp, filepath)
+                webFileTime = lastModifiedTime(headers)
+                if webFileTime: # set mtime to web mtime
+                    os.utime(filepath,(webFileTime,webFileTime))
+                self.setETag(url, headers)
+                self.cachedUrlCheckTimes[url] = time.strftime('%Y-%m-%dT%H:%M:%S UTC', time.gmtime())
+                self.cachedUrlCheckTimesModified = True
+        except Exception:
+            pass
+        if os.path.exists(filepathtmp):
+            try:
+                os.remove(filepathtmp)
+            except Exception:
+                pass
+
+    def revalidate(self, url, quotedUrl, filepath, filepathtmp):
+        """Checks if a newer file than the cached file exists, replacing the cached file if so.  
+        
+        A single conditional request (If-None-Match of the cached file's entity tag, and If-Modified-Since its 
+        modification time, which is the web file's time when retrieved) either responds not modified or retrieves 
+        the file.  The retrieved file replaces the cached one if its entity tag differs from the cached file's, or 
+        if it is newer.  If the check is unsuccessful the cached file is kept.
+        """
+        requestHeaders = {"If-Modified-Since": httpDate(os.path.getmtime(filepath))}
+        cachedETag = self.cachedUrlETags.get(url)
+        if cachedETag:
+            requestHeaders["If-None-Match"] = cachedETag
+        try:
+            savedfile, headers, initialBytes = self.retrieve(quotedUrl, filename=filepathtmp, requestHeaders=requestHeaders)
+            remoteFileTime = lastModifiedTime(headers)
+            eTag = headers.get("ETag")
+            if (((eTag and cachedETag and eTag != cachedETag) or 
+                 (remoteFileTime and remoteFileTime > os.path.getmtime(filepath))) and
+                not (os.path.splitext(filepath)[1] in {".xsd", ".xml", ".xbrl"} and b"<html" in initialBytes)):
+                # newer on web, replace cached file
+                replaceFile(filepathtmp, filepath)
+                if remoteFileTime: # set mtime to web mtime
+                    os.utime(filepath,(remoteFileTime,remoteFileTime))
+                self.setETag(url, headers)
+            elif eTag and not cachedETag:
+                self.setETag(url, headers)
+        except HTTPError as err: # includes not modified (304) from opener
+            if err.code == 304:
+                self.setETag(url, err.hdrs)
+        except Exception:
+            pass # cached file is kept
+        if os.path.exists(filepathtmp):
+            try:
+                os.remove(filepathtmp)
+            except Exception:
+                pass
+
+    def setETag(self, url, headers):
+        eTag = headers.get("ETag") if headers is not None else None
+        if eTag:
+            if self.cachedUrlETags.get(url) != eTag:
+                self.cachedUrlETags[url] = eTag
+                self.cachedUrlCheckTimesModified = True
+        elif url in self.cachedUrlETags:
+            del self.cachedUrlETags[url]
+            self.cachedUrlCheckTimesModified = True
+
+    def open(self, url, data=None, requestHeaders=None):
+        """Opens url, by a pooled persistent connection if directly connected (no proxy), otherwise by the opener.
+        
+        Pooled requests accept gzip encoding.  A host requiring authentication is requested by the opener, 
+        which has the authentication handlers.  Unsuccessful responses raise HTTPError as for the opener, 
+        including not modified (304) responses to conditional requests.
+        """
+        urlScheme, schemeSep, urlSchemeSpecificPart = url.partition("://")
+        host = urlSchemeSpecificPart.partition("/")[0]
+        if (data is None and urlScheme in ("http", "https") and host not in self.openerHosts and 
+            urlScheme not in (self.proxy_handler.proxies or {})):
+            headers = dict(self.opener.addheaders)
+            headers["Accept-Encoding"] = "gzip"
+            if requestHeaders:
+                headers.update(requestHeaders)
+            try:
+                response = self.connectionPool.request(url, headers, self.timeout)
+            except (httpclient.HTTPException, EnvironmentError) as err:
+                raise URLError(err)
+            if response.status < 300:
+                return response
+            response.read() # so the connection is reusable
+            response.close()
+            if response.status in (401, 407): # authentication handlers are in the opener
+                self.openerHosts.add(host)
+            else:
+                raise HTTPError(response.geturl(), response.status, response.reason, response.info(), None)
+        return self.opener.open(proxyhandlers.Request(url, data, requestHeaders or {}), timeout=self.timeout)
+
     def reportProgress(self, blockCount, blockSize, totalSize):
         if totalSize > 0:
             self.cntlr.showStatus(_("web caching {0}: {1:.0f} of {2:.0f} KB").format(
@@ -417,11 +585,11 @@ class WebCache:
                 pass
         return None
         
-    def retrieve(self, url, filename=None, filestream=None, reporthook=None, data=None):
+    def retrieve(self, url, filename=None, filestream=None, reporthook=None, data=None, requestHeaders=None):
         # return filename, headers (in dict), initial file bytes (to detect logon requests)
         headers = None
         initialBytes = b''
-        fp = self.opener.open(url, data, timeout=self.timeout)
+        fp = self.open(url, data, requestHeaders)
         try:
             headers = fp.info()
             if filename:
@@ -465,6 +633,106 @@ class WebCache:
             tfp.seek(0)
         return filename, headers, initialBytes
 
+class WebCachePrefetcher:
+    """
+    .. class:: WebCachePrefetcher(webCache, maxWorkers, maxWorkersPerHost)
+
+    Downloads documents into the web cache by a pool of threads, ahead of their loading, so that DTS discovery 
+    (which loads documents one at a time, depth first) finds them already cached.  Documents are queued by 
+    ModelDocument.load when it parses a document referencing them.  getfilename waits for a document which is 
+    being prefetched, then proceeds as usual, retrieving any document which couldn't be prefetched, or which
+    is still queued (so that a document needed now doesn't wait for the downloads queued ahead of it).
+
+    :param webCache: The web cache
+    :type webCache: WebCache
+    :param maxWorkers: Maximum number of concurrent downloads
+    :type maxWorkers: int
+    :param maxWorkersPerHost: Maximum number of concurrent downloads from any one host
+    :type maxWorkersPerHost: int
+    """
+    def __init__(self, webCache, maxWorkers, maxWorkersPerHost):
+        self.webCache = webCache
+        self.maxWorkers = maxWorkers
+        self.maxWorkersPerHost = maxWorkersPerHost
+        self.queue = queue.Queue()
+        self.lock = threading.Lock()
+        self.pending = {} # threading.Event by url of each url queued or being retrieved
+        self.queued = set() # urls queued, not yet taken by a worker (or by wait)
+        self.requested = set() # urls ever queued (not queued again)
+        self.hostSemaphores = {}
+        self.workers = []
+        self.isShutdown = False
+
+    def prefetch(self, url):
+        """Queues url (an http or https url, normalized and mapped as getfilename's url) for retrieval"""
+        with self.lock:
+            if url in self.requested or self.isShutdown:
+                return
+            self.requested.add(url)
+            self.queued.add(url)
+            self.pending[url] = threading.Event()
+            if len(self.workers) < self.maxWorkers and len(self.workers) < len(self.pending):
+                worker = threading.Thread(target=self.work, name="webCachePrefetch{0}".format(len(self.workers)))
+                worker.daemon = True
+                self.workers.append(worker)
+                worker.start()
+        self.queue.put(url)
+
+    def wait(self, url):
+        """Waits until url is retrieved, if it is being retrieved.  If it is still queued it is taken
+        from the queue, without waiting, to be retrieved by the caller."""
+        with self.lock:
+            if url in self.queued:
+                self.queued.discard(url)
+                event = self.pending.pop(url, None)
+                if event is not None:
+                    event.set() # any other waiters also proceed
+                return
+            event = self.pending.get(url)
+        if event is not None:
+            event.wait()
+
+    def shutdown(self):
+        """Ends the worker threads, after their current retrievals, and releases waiters of queued urls"""
+        with self.lock:
+            self.isShutdown = True
+            for url in self.queued:
+                event = self.pending.pop(url, None)
+                if event is not None:
+                    event.set()
+            self.queued.clear()
+            workers = self.workers
+        for worker in workers:
+            self.queue.put(None) # each worker ends on taking a None
+
+    def hostSemaphore(self, url):
+        host = url.partition("://")[2].partition("/")[0]
+        with self.lock:
+            try:
+                return self.hostSemaphores[host]
+            except KeyError:
+                semaphore = self.hostSemaphores[host] = threading.BoundedSemaphore(self.maxWorkersPerHost)
+                return semaphore
+
+    def work(self):
+        while True:
+            url = self.queue.get()
+            if url is None: # shutdown
+                break
+            with self.lock:
+                if url not in self.queued: # taken by wait (or shutdown) to be retrieved by its caller
+                    continue
+                self.queued.discard(url)
+            try:
+                if not self.webCache.workOffline:
+                    with self.hostSemaphore(url):
+                        self.webCache.prefetchFile(url)
+            finally:
+                with self.lock:
+                    event = self.pending.pop(url, None)
+                if event is not None:
+                    event.set()
+
 '''
 class WebCacheUrlOpener(request.FancyURLopener):
     def __init__(self, cntlr, proxies=None):
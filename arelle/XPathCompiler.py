@@ -0,0 +1,538 @@
+'''
+Created on Oct 18, 2013
+
+Compiles XPath programs (the exprStack of XPathParser.parse) into Python closures, so that evaluation
+doesn't re-dispatch every program step (by its type and operation name) each time a variable set,
+filter or message expression is evaluated.
+
+Each step of a program is compiled into a closure step(xc, contextItem, resultStack) with the same
+semantics as the step's case of XPathContext.evaluate; operations compile their argument programs
+recursively.  At compile time, arithmetic and value comparisons of numeric literals (including
+negative literals) are folded into constants, fn: and xfi: functions are bound to their
+implementations, and variable references become direct lookups of the in-scope variables.
+Custom function signatures are still checked first, at evaluation, as they depend on the DTS.
+
+A compiled program doesn't depend on the XPathContext (or instance) it is evaluated for, so it is kept
+on the program's ProgHeader and shared by all evaluations of the program, including of other instances
+using the DTS from the DtsCache.  Programs which can't be compiled are interpreted by XPathContext.evaluate.
+
+@author: Mark V Systems Limited
+(c) Copyright 2013 Mark V Systems Limited, All rights reserved.
+'''
+from __future__ import division  # expect 3.2 integer division even in 2.7
+import operator
+from decimal import Decimal
+from arelle.XPathParser import (VariableRef, QNameDef, OperationDef, RangeDecl, Expr, ProgHeader)
+from arelle.XPathContext import (XPathException, FunctionNumArgs, FunctionArgType, FunctionNotAvailable,
+                                 VALUE_OPS, GENERALCOMPARISON_OPS, NODECOMPARISON_OPS, COMBINING_OPS,
+                                 LOGICAL_OPS, UNARY_OPS, FORSOMEEVERY_OPS, PATH_OPS)
+from arelle import (XbrlConst, XmlUtil, FunctionXs, FunctionFn, FunctionXfi, FunctionIxt, FunctionCustom)
+from arelle.FunctionUtil import testTypeCompatiblity
+from arelle.ModelObject import ModelObject
+from arelle.ModelValue import qname, QName, DateTime, AnyURI
+
+KIND_TEST_NAMES = {'attribute', 'comment', 'document-node', 'element', 'item', 'node',
+                   'processing-instruction', 'schema-attribute', 'schema-element', 'text'}
+ARITHMETIC_OPS = {'+', '-', '*', 'div', 'idiv', 'mod'}
+VALUE_OPERATORS = {'+': operator.add, '-': operator.sub, '*': operator.mul,
+                   'div': operator.truediv, 'idiv': operator.floordiv, 'mod': operator.mod,
+                   'gt': operator.gt, 'ge': operator.ge, 'eq': operator.eq,
+                   'ne': operator.ne, 'lt': operator.lt, 'le': operator.le,
+                   'to': lambda op1, op2: _RANGE( _INT(op1), _INT(op2) + 1 )}
+GENERALCOMPARISON_OPERATORS = {'>': operator.gt, '>=': operator.ge, '=': operator.eq,
+                               '!=': operator.ne, '<': operator.lt, '<=': operator.le}
+NO_CONSTANT = object()
+
+def compile(exprStack):
+    """Compiles an XPath program (starting with its ProgHeader).
+
+    :returns: function(xc, contextItem) -> resultStack, or None if the program can't be compiled
+    """
+    try:
+        return compiledStack(exprStack, None)
+    except (AttributeError, IndexError, KeyError, TypeError):
+        return None
+
+def compiledStack(exprStack, parentOp):
+    steps = []
+    constants = [] # constant value of each step (for folding), or NO_CONSTANT
+    setsProgHeader = False
+    for p in exprStack:
+        if isinstance(p, ProgHeader):
+            setsProgHeader = True
+        step, constant = compiledStep(p, parentOp, constants[-1] if constants else NO_CONSTANT)
+        if step is None:
+            continue
+        if constant is not NO_CONSTANT and isinstance(p, OperationDef) and p.name in VALUE_OPS:
+            # folded binary operation replaces its (constant) first operand
+            steps.pop()
+            constants.pop()
+        steps.append(step)
+        constants.append(constant)
+    if len(steps) == 1 and not setsProgHeader:
+        step = steps[0]
+        def run(xc, contextItem):
+            resultStack = []
+            step(xc, contextItem if contextItem is not None else xc.contextItem, resultStack)
+            return resultStack
+        run.constant = constants[0]
+    else:
+        steps = tuple(steps)
+        def run(xc, contextItem):
+            resultStack = []
+            if contextItem is None: contextItem = xc.contextItem
+            for step in steps:
+                step(xc, contextItem, resultStack)
+            if setsProgHeader:
+                xc.progHeader = None
+            return resultStack
+        run.constant = NO_CONSTANT
+    return run
+
+def compiledStep(p, parentOp, priorConstant):
+    """Compiles a program step.
+
+    :returns: (step, constant) -- step function (None if the step doesn't evaluate anything) and
+        the step's constant value (or NO_CONSTANT)
+    """
+    if isinstance(p,QNameDef) or (p == '*' and parentOp in ('/', '//')): # path step QName or wildcard
+        return axisStep(p, parentOp), NO_CONSTANT
+    elif isinstance(p,_STR_NUM_TYPES):
+        return constantStep(p), p
+    elif isinstance(p,VariableRef):
+        return variableStep(p), NO_CONSTANT
+    elif isinstance(p,OperationDef):
+        op = p.name
+        if isinstance(op, QNameDef): # function call
+            return functionCallStep(p, parentOp), NO_CONSTANT
+        elif op in VALUE_OPS:
+            return valueOperationStep(p, priorConstant)
+        elif op in GENERALCOMPARISON_OPS:
+            return generalComparisonStep(p), NO_CONSTANT
+        elif op in NODECOMPARISON_OPS:
+            return nodeComparisonStep(p), NO_CONSTANT
+        elif op in COMBINING_OPS:
+            return combiningStep(p), NO_CONSTANT
+        elif op in LOGICAL_OPS:
+            return logicalStep(p), NO_CONSTANT
+        elif op in UNARY_OPS:
+            return unaryStep(p)
+        elif op == 'instance':
+            return instanceStep(p), NO_CONSTANT
+        elif op == 'sequence':
+            return sequenceStep(p), NO_CONSTANT
+        elif op == 'predicate':
+            return predicateStep(p), NO_CONSTANT
+        elif op in FORSOMEEVERY_OPS: # for, some, every
+            return rangeVarsStep(p), NO_CONSTANT
+        elif op == 'if':
+            return ifStep(p), NO_CONSTANT
+        elif op == '.':
+            return contextItemStep(), NO_CONSTANT
+        elif op == '..':
+            return parentStep(), NO_CONSTANT
+        elif op in PATH_OPS:
+            return pathStep(p), NO_CONSTANT
+    elif isinstance(p,ProgHeader):
+        return progHeaderStep(p), NO_CONSTANT
+    return None, NO_CONSTANT # no result
+
+def axisStep(p, parentOp):
+    def step(xc, contextItem, resultStack):
+        if len(resultStack) == 0 or not xc.isNodeSequence(resultStack[-1]):
+            resultStack.append( [ contextItem, ] )
+        resultStack.append( xc.flattenSequence( xc.stepAxis(parentOp, p, resultStack.pop()) ) )
+    return step
+
+def constantStep(value):
+    def step(xc, contextItem, resultStack):
+        resultStack.append( [ value, ] )
+    return step
+
+def variableStep(p):
+    name = p.name
+    def step(xc, contextItem, resultStack):
+        inScopeVars = xc.inScopeVars
+        if name in inScopeVars:
+            result = inScopeVars[name]
+            if result is not None:
+                resultStack.append( xc.flattenSequence( result ) )
+    return step
+
+def functionCallStep(p, parentOp):
+    op = p.name
+    args = compiledStack(p.args, None)
+    function = builtInFunction(p, parentOp)
+    def step(xc, contextItem, resultStack):
+        argValues = args(xc, contextItem)
+        try:
+            if op in xc.modelXbrl.modelCustomFunctionSignatures:
+                result = FunctionCustom.call(xc, p, op, contextItem, argValues)
+            else:
+                result = function(xc, contextItem, argValues, resultStack)
+        except FunctionNumArgs:
+            raise XPathException(p, 'err:XPST0017', _('Number of arguments do not match signature arity: {0}').format(op))
+        except FunctionArgType as err:
+            raise XPathException(p, err.errCode, _('Argument {0} does not match expected type {1} for {2} {3}.')
+                                 .format(err.argNum, err.expectedType, op, err.foundObject))
+        except FunctionNotAvailable:
+            raise XPathException(p, 'err:XPST0017', _('Function named {0} does not have a custom or built-in implementation.').format(op))
+        if result is not None:
+            resultStack.append( xc.flattenSequence( result ) )
+    return step
+
+def builtInFunction(p, parentOp):
+    """Function implementing a (non-custom) function call, bound at compile time"""
+    op = p.name
+    ns = op.namespaceURI; localname = op.localName
+    if op.unprefixed and localname in KIND_TEST_NAMES:
+        def kindTest(xc, contextItem, args, resultStack):
+            # step axis operation
+            if len(resultStack) == 0 or not xc.isNodeSequence(resultStack[-1]):
+                if isinstance(contextItem, (tuple,list)):
+                    resultStack.append( contextItem )
+                else:
+                    resultStack.append( [ contextItem, ] )
+            return xc.stepAxis(parentOp, p, resultStack.pop() )
+        return kindTest
+    elif op.unprefixed or ns == XbrlConst.fn:
+        fnFunction = FunctionFn.fnFunctions.get(localname)
+        if fnFunction is None:
+            return lambda xc, contextItem, args, resultStack: FunctionFn.call(xc, p, localname, contextItem, args)
+        def fn(xc, contextItem, args, resultStack):
+            try:
+                return fnFunction(xc, p, contextItem, args)
+            except FunctionFn.fnFunctionNotAvailable:
+                raise FunctionNotAvailable("fn:{0}".format(localname))
+        return fn
+    elif ns == XbrlConst.xfi or ns == XbrlConst.xff:
+        xfiFunction = FunctionXfi.xfiFunctions.get(localname)
+        if xfiFunction is None:
+            return lambda xc, contextItem, args, resultStack: FunctionXfi.call(xc, p, localname, args)
+        def xfi(xc, contextItem, args, resultStack):
+            try:
+                return xfiFunction(xc, p, args)
+            except FunctionXfi.xfiFunctionNotAvailable:
+                raise FunctionNotAvailable("xfi:{0}".format(localname))
+        return xfi
+    elif ns == XbrlConst.xsd:
+        return lambda xc, contextItem, args, resultStack: FunctionXs.call(xc, p, localname, args)
+    elif ns in FunctionIxt.ixtNamespaceURIs:
+        return lambda xc, contextItem, args, resultStack: FunctionIxt.call(xc, p, localname, args)
+    def notIdentified(xc, contextItem, args, resultStack):
+        raise XPathException(p, 'err:XPST0017', _('Function call not identified: {0}.').format(op))
+    return notIdentified
+
+def valueOperation(xc, p, op, op1, op2):
+    testTypeCompatiblity( xc, p, op, op1, op2 )
+    if type(op1) != type(op2) and op in ARITHMETIC_OPS:
+        # check if type promotion needed (Decimal-float, not needed for integer-Decimal)
+        if isinstance(op1,Decimal) and isinstance(op2,float):
+            op1 = float(op1) # per http://http://www.w3.org/TR/xpath20/#dt-type-promotion 1b
+        elif isinstance(op2,Decimal) and isinstance(op1,float):
+            op2 = float(op2)
+    try:
+        return VALUE_OPERATORS[op](op1, op2)
+    except ZeroDivisionError:
+        raise XPathException(p, 'err:FOAR0001', _('Attempt to divide by zero: {0} {1} {2}.')
+                             .format(op1, op, op2))
+
+def isNumericConstant(value):
+    return value is not NO_CONSTANT and isinstance(value, _NUM_TYPES)
+
+def valueOperationStep(p, priorConstant):
+    op = p.name
+    args = compiledStack(p.args, None)
+    if op != 'to' and isNumericConstant(priorConstant) and isNumericConstant(args.constant):
+        try:
+            result = valueOperation(None, p, op, priorConstant, args.constant)
+            return constantStep(result), result
+        except XPathException:
+            pass # e.g., division by zero is raised when evaluated
+    def step(xc, contextItem, resultStack):
+        # binary arithmetic operations and value comparisons
+        s1 = xc.atomize( p, resultStack.pop() ) if len(resultStack) > 0 else []
+        s2 = xc.atomize( p, args(xc, contextItem) )
+        if len(s1) > 1 or len(s2) > 1:
+            raise XPathException(p, 'err:XPTY0004', _("Value operation '{0}' sequence length error").format(op))
+        if len(s1) == 0 or len(s2) == 0:
+            resultStack.append( [] )
+        else:
+            resultStack.append( xc.flattenSequence( valueOperation(xc, p, op, s1[0], s2[0]) ) )
+    return step, NO_CONSTANT
+
+def generalComparisonStep(p):
+    compare = GENERALCOMPARISON_OPERATORS[p.name]
+    args = compiledStack(p.args, None)
+    def step(xc, contextItem, resultStack):
+        s1 = xc.atomize( p, resultStack.pop() ) if len(resultStack) > 0 else []
+        s2 = xc.atomize( p, args(xc, contextItem) )
+        result = []
+        for op1 in s1:
+            for op2 in s2:
+                result = compare(op1, op2)
+                if result:
+                    break
+            if result:
+                break
+        resultStack.append( xc.flattenSequence( result ) )
+    return step
+
+def nodeComparisonStep(p):
+    op = p.name
+    args = compiledStack(p.args, None)
+    def step(xc, contextItem, resultStack):
+        s1 = resultStack.pop() if len(resultStack) > 0 else []
+        s2 = args(xc, contextItem)
+        if len(s1) > 1 or len(s2) > 1 or not xc.isNodeSequence(s1) or not xc.isNodeSequence(s2[0]):
+            raise XPathException(p, 'err:XPTY0004', _('Node comparison sequence error'))
+        if len(s1) == 0 or len(s2[0]) == 0:
+            result = []
+        else:
+            n1 = s1[0]
+            n2 = s2[0][0]
+            result = False;
+            for op1 in s1:
+                for op2 in s2:
+                    if op == 'is':
+                        result = n1 == n2
+                    elif op == '>>':
+                        result = op1 > op2
+                    elif op == '<<':
+                        result = op1 <= op2
+                if result:
+                    break
+        resultStack.append( xc.flattenSequence( result ) )
+    return step
+
+def combiningStep(p):
+    op = p.name
+    args = compiledStack(p.args, None)
+    def step(xc, contextItem, resultStack):
+        s1 = resultStack.pop() if len(resultStack) > 0 else []
+        s2 = xc.flattenSequence(args(xc, contextItem))
+        if not xc.isNodeSequence(s1) or not xc.isNodeSequence(s2):
+            raise XPathException(p, 'err:XPTY0004', _('Node operation sequence error'))
+        if op == 'intersect':
+            resultset = set(s1) & set(s2)
+        elif op == 'except':
+            resultset = set(s1) - set(s2)
+        else: # 'union' or '|'
+            resultset = set(s1) | set(s2)
+        # convert to a list in document order
+        resultStack.append( xc.flattenSequence( xc.documentOrderedNodes(resultset) ) )
+    return step
+
+def logicalStep(p):
+    isAnd = p.name == 'and'
+    args = compiledStack(p.args, None)
+    def step(xc, contextItem, resultStack):
+        if len(resultStack) == 0:
+            result = []
+        else:
+            # both operands are evaluated (as interpreted), no short circuit
+            op1 = xc.effectiveBooleanValue( p, resultStack.pop() )
+            op2 = xc.effectiveBooleanValue( p, args(xc, contextItem) )
+            result = (op1 and op2) if isAnd else (op1 or op2)
+        resultStack.append( xc.flattenSequence( result ) )
+    return step
+
+def unaryStep(p):
+    isMinus = p.name == 'u-'
+    args = compiledStack(p.args, None)
+    if isNumericConstant(args.constant):
+        result = -args.constant if isMinus else args.constant
+        return constantStep(result), result
+    def step(xc, contextItem, resultStack):
+        s1 = xc.atomize( p, args(xc, contextItem) )
+        if len(s1) > 1:
+            raise XPathException(p, 'err:XPTY0004', _('Unary expression sequence length error'))
+        if len(s1) == 0:
+            result = []
+        else:
+            result = -s1[0] if isMinus else s1[0]
+        resultStack.append( xc.flattenSequence( result ) )
+    return step, NO_CONSTANT
+
+def instanceStep(p):
+    occurenceIndicator = p.args[1] if len(p.args) > 1 else None
+    t = p.args[0] if len(p.args) > 0 else None
+    tType = None
+    if isinstance(t, QNameDef) and t.namespaceURI == XbrlConst.xsd:
+        tType = {"integer": _INT_TYPES,
+                 "string": _STR_BASE,
+                 "decimal": Decimal,
+                 "double": float,
+                 "float": float,
+                 "boolean": bool,
+                 "QName": QName,
+                 "anyURI": AnyURI,
+                 "date": DateTime,
+                 "dateTime": DateTime,
+                 }.get(t.localName)
+    def step(xc, contextItem, resultStack):
+        result = False
+        s1 = xc.flattenSequence( resultStack.pop() ) if len(resultStack) > 0 else []
+        arity = len(s1)
+        if len(p.args) > 1:
+            if (occurenceIndicator == '?' and arity in (0,1) ) or \
+               (occurenceIndicator == '+' and arity >= 1) or \
+               (occurenceIndicator == '*'):
+                result = True
+        elif arity == 1:
+            result = True
+        if result and len(p.args) > 0:
+            for x in s1:
+                if tType:
+                    result = isinstance(x, tType)
+                    if result and tType == DateTime:
+                        result = x.dateOnly == (t.localName == "date")
+                elif isinstance(t, OperationDef):
+                    if t.name == "element":
+                        if isinstance(x,ModelObject):
+                            if len(t.args) >= 1:
+                                qn = t.args[0]
+                                if qn== '*' or (isinstance(qn,QNameDef) and qn == x):
+                                    result = True
+                                    if len(t.args) >= 2 and isinstance(t.args[1],QNameDef):
+                                        modelXbrl = x.modelDocument.modelXbrl
+                                        modelConcept = modelXbrl.qnameConcepts.get(qname(x))
+                                        if not modelConcept.instanceOfType(t.args[1]):
+                                            result = False
+                        else:
+                            result = False
+                    # elif t.name == "item" comes here and result stays True
+                if not result:
+                    break
+        resultStack.append( xc.flattenSequence( result ) )
+    return step
+
+def sequenceStep(p):
+    args = compiledStack(p.args, None)
+    def step(xc, contextItem, resultStack):
+        resultStack.append( xc.flattenSequence( args(xc, contextItem) ) )
+    return step
+
+def predicateStep(p):
+    args = compiledStack(p.args, None)
+    def step(xc, contextItem, resultStack):
+        targetSequence = []
+        if len(resultStack) > 0:
+            sourcePosition = 0
+            for item in resultStack.pop():
+                sourcePosition += 1
+                predicateResult = args(xc, item)
+                if len(predicateResult) == 1: predicateResult = predicateResult[0] # first result
+                if len(predicateResult) == 1 and isinstance(predicateResult[0],_NUM_TYPES):
+                    result = predicateResult[0]
+                    if isinstance(result, bool):  # note that bool is subclass of int
+                        if result:
+                            targetSequence.append(item)
+                    elif sourcePosition == result:
+                        targetSequence.append(item)
+                elif xc.effectiveBooleanValue(p, predicateResult):
+                    targetSequence.append(item)
+        resultStack.append( xc.flattenSequence( targetSequence ) )
+    return step
+
+def rangeVarsStep(p):
+    op = p.name
+    clauses = [] # (RangeDecl or Expr, range variable qname or expr name, compiled program)
+    for arg in p.args:
+        if isinstance(arg, RangeDecl):
+            clauses.append((RangeDecl, arg.rangeVar.name, compiledStack(arg.bindingSeq, None), arg))
+        elif isinstance(arg, Expr):
+            clauses.append((Expr, arg.name, compiledStack(arg.expr, None), arg))
+        else:
+            clauses.append((None, None, None, arg))
+    def step(xc, contextItem, resultStack):
+        result = []
+        evaluateRangeVars(xc, op, clauses, 0, contextItem, result)
+        resultStack.append( xc.flattenSequence( result ) )
+    return step
+
+def evaluateRangeVars(xc, op, clauses, i, contextItem, result):
+    clauseType, name, prog, p = clauses[i]
+    if clauseType is RangeDecl:
+        r = prog(xc, contextItem)
+        if len(r) == 1: # should be an expr single
+            r = r[0]
+            if isinstance(r, (tuple,list,set)):
+                if len(r) == 1 and isinstance(r[0],_RANGE):
+                    r = r[0]
+                inScopeVars = xc.inScopeVars
+                hasPrevValue = name in inScopeVars
+                if hasPrevValue:
+                    prevValue = inScopeVars[name]
+                for rv in r:
+                    inScopeVars[name] = rv
+                    evaluateRangeVars(xc, op, clauses, i + 1, contextItem, result)
+                    if op != 'for' and len(result) > 0:
+                        break # short circuit evaluation
+                if op == 'every' and len(result) == 0:
+                    result.append( True )   # true if no false result returned during iteration
+                if hasPrevValue:
+                    inScopeVars[name] = prevValue
+    elif clauseType is Expr:
+        if name == 'return':
+            result.append( prog(xc, contextItem) )
+        elif name == 'satisfies':
+            boolresult = xc.effectiveBooleanValue(p, prog(xc, contextItem))
+            if (op == 'every') != boolresult:
+                # stop short circuit eval
+                result.append( boolresult )
+
+def ifStep(p):
+    test = compiledStack(p.args[0].expr[0], None)
+    thenArgs = compiledStack(p.args[1].args, None)
+    elseArgs = compiledStack(p.args[2].args, None)
+    def step(xc, contextItem, resultStack):
+        if xc.effectiveBooleanValue( p, test(xc, contextItem) ):
+            result = thenArgs(xc, contextItem)
+        else:
+            result = elseArgs(xc, contextItem)
+        resultStack.append( xc.flattenSequence( result ) )
+    return step
+
+def contextItemStep():
+    def step(xc, contextItem, resultStack):
+        if contextItem is not None:
+            resultStack.append( xc.flattenSequence( contextItem ) )
+    return step
+
+def parentStep():
+    def step(xc, contextItem, resultStack):
+        result = XmlUtil.parent(contextItem)
+        if result is not None:
+            resultStack.append( xc.flattenSequence( result ) )
+    return step
+
+def pathStep(p):
+    op = p.name
+    fromRoot = op in ('rootChild', 'rootDescendant')
+    if fromRoot:
+        op = '/' if op == 'rootChild' else '//'
+    # contains QNameDefs and predicates
+    args = compiledStack(p.args, op)
+    def step(xc, contextItem, resultStack):
+        if fromRoot:
+            # fix up for multi-instance
+            resultStack.append( [xc.inputXbrlInstance.xmlDocument,] )
+        if len(resultStack) > 0:
+            innerFocusNodes = resultStack.pop()
+        else:
+            innerFocusNodes = contextItem
+        navSequence = []
+        for innerFocusNode in xc.flattenSequence(innerFocusNodes):
+            navSequence += args(xc, innerFocusNode)
+        resultStack.append( xc.flattenSequence( xc.documentOrderedNodes(xc.flattenSequence(navSequence)) ) )
+    return step
+
+def progHeaderStep(p):
+    from arelle.ModelFormulaObject import Trace
+    setsTraceType = p.traceType not in (Trace.MESSAGE, Trace.CUSTOM_FUNCTION)
+    def step(xc, contextItem, resultStack):
+        xc.progHeader = p
+        if setsTraceType:
+            xc.traceType = p.traceType
+    return step
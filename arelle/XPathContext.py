@@ -128,6 +128,16 @@ class XPathContext:
         return self.modelXbrl.modelManager.formulaOptions
         
     def evaluate(self, exprStack, contextItem=None, resultStack=None, parentOp=None):
+        if resultStack is None and parentOp is None and exprStack and isinstance(exprStack[0], ProgHeader):
+            # whole program, evaluate by its compiled closures (compiled on first evaluation)
+            progHeader = exprStack[0]
+            try:
+                compiledProg = progHeader.compiledProg
+            except AttributeError:
+                from arelle import XPathCompiler
+                compiledProg = progHeader.compiledProg = XPathCompiler.compile(exprStack)
+            if compiledProg is not None:
+                return compiledProg(self, contextItem)
         if resultStack is None: resultStack =  []
         if contextItem is None: contextItem = self.contextItem
         setProgHeader = False
@@ -13,13 +13,13 @@ if sys.version[0] >= '3':
     from arelle.pyparsing.pyparsing_py3 import (Word, Keyword, alphas, ParseException, ParseSyntaxException,
                  Literal, CaselessLiteral,
                  Combine, Optional, nums, Or, Forward, Group, ZeroOrMore, StringEnd, alphanums,
-                 ParserElement, quotedString, delimitedList, Suppress, Regex)
+                 ParserElement, ParseResults, quotedString, delimitedList, Suppress, Regex)
 else:
     # installed for python 2.7 and clean packages, otherwise use tweaked version
     from arelle.pyparsing.pyparsing_py2 import (Word, Keyword, alphas, ParseException, ParseSyntaxException,
                  Literal, CaselessLiteral,
                  Combine, Optional, nums, Or, Forward, Group, ZeroOrMore, StringEnd, alphanums,
-                 ParserElement, quotedString, delimitedList, Suppress, Regex)
+                 ParserElement, ParseResults, quotedString, delimitedList, Suppress, Regex)
 from arelle.Locale import format_string
 import time, xml.dom
 from decimal import Decimal
@@ -32,7 +32,9 @@ debug_flag=True
 exprStack = []
 xmlElement = None
 modelXbrl = None
+hasParseError = False # an error was reported in parsing the current expression
 xbrlResource = None
+customFunctionQnames = [] # custom function calls of expression being parsed
 
 class ProgHeader:
     def __init__(self, modelObject, name, element, sourceStr, traceType):
@@ -78,6 +80,8 @@ class QNameDef(ModelValue.QName):
         self.axis = (axis or None) # store "" from rpartition of step as None
     def __hash__(self):
         return self.qnameValueHash
+    def __reduce__(self):
+        return (QNameDef, (self.loc, self.prefix, self.namespaceURI, self.localName, self.isAttribute, self.axis))
     def __repr__(self):
         return ("{0}QName({1})".format('@' if self.isAttribute else '',str(self)))
     def __eq__(self,other):
@@ -97,11 +101,18 @@ axesSupported = {"", "child", "descendant", "attribute", "self", "descendant-or-
                  "following-sibling", "following", "namespace", "parent", "ancestor",
                  "preceding-sibling", "preceding", "ancestor-or-self"}
 
+def parseError(*args, **kwargs):
+    # errors in the expression (unlike those of the DTS, such as missing custom function signatures,
+    # which are checked again when a cached program is used) prevent caching its program
+    global hasParseError
+    hasParseError = True
+    modelXbrl.error(*args, **kwargs)
+
 def pushQName( sourceStr, loc, toks ):
     step = toks[0]
     axis, sep, qname = step.rpartition("::") # axes are not splitting correctly
     if axis not in axesSupported:
-        modelXbrl.error("err:XPST0010",
+        parseError("err:XPST0010",
             _("Axis %(axis)s is not supported in %(step)s"),
             modelObject=xmlElement,
             axis=axis, step=step)
@@ -118,7 +129,7 @@ def pushQName( sourceStr, loc, toks ):
                     if len(exprStack) == 0 or exprStack[-1] != q:
                         exprStack.append( q )
                     return q
-                modelXbrl.error("err:XPST0081",
+                parseError("err:XPST0081",
                     _("QName prefix not defined for %(name)s"),
                     modelObject=xmlElement,
                     name=qname)
@@ -126,7 +137,7 @@ def pushQName( sourceStr, loc, toks ):
             
         if (nsLocalname == (XbrlConst.xff,"uncovered-aspect","xff") and
             xmlElement.localName not in ("formula", "consistencyAssertion", "valueAssertion", "message")):
-                modelXbrl.error("xffe:invalidFunctionUse",
+                parseError("xffe:invalidFunctionUse",
                     _("Function %(name)s cannot be used on an XPath expression associated with a %(name2)s"),
                     modelObject=xmlElement,
                     name=qname, name2=xmlElement.localName)
@@ -186,7 +197,7 @@ class OperationDef:
                     prefix = toks1[:-2]
                     ns = XmlUtil.xmlns(xmlElement, prefix)
                     if ns is None:
-                        modelXbrl.error("err:XPST0081",
+                        parseError("err:XPST0081",
                             _("wildcard prefix not defined for %(token)s"),
                             modelObject=xmlElement,
                             token=toks1)
@@ -244,14 +255,18 @@ def pushFunction( sourceStr, loc, toks ):
         if (not name.unprefixed and 
             ns not in {XbrlConst.fn, XbrlConst.xfi, XbrlConst.xff, XbrlConst.xsd} and
             not ns.startswith("http://www.xbrl.org/inlineXBRL/transformation")):
-            if name not in modelXbrl.modelCustomFunctionSignatures:
-                modelXbrl.error("xbrlve:noCustomFunctionSignature",
-                    _("No custom function signature for %(custFunction)s in %(resource)s"),
-                    modelObject=xmlElement,
-                    resource=xmlElement.localName,
-                    custFunction=name)
+            customFunctionQnames.append(name)
+            checkCustomFunctionSignature(name)
     return operation
 
+def checkCustomFunctionSignature(name):
+    if name not in modelXbrl.modelCustomFunctionSignatures:
+        modelXbrl.error("xbrlve:noCustomFunctionSignature",
+            _("No custom function signature for %(custFunction)s in %(resource)s"),
+            modelObject=xmlElement,
+            resource=xmlElement.localName,
+            custFunction=name)
+
 def pushSequence( sourceStr, loc, toks ):
     operation = OperationDef(sourceStr, loc, 'sequence', toks, False)
     if len(toks) == 0:  # empty sequence
@@ -296,7 +311,7 @@ class VariableRef:
 def pushVarRef( sourceStr, loc, toks ):
     qname = ModelValue.qname(xmlElement, toks[0][1:], noPrefixIsNoNamespace=True)
     if qname is None:
-        modelXbrl.error("err:XPST0081",
+        parseError("err:XPST0081",
             _("QName prefix not defined for variable reference $%(variable)s"),
             modelObject=xmlElement,
             variable=toks[0][1:])
@@ -688,6 +703,8 @@ def parse(modelObject, xpathExpression, element, name, traceType):
     exprStack = []
     global xmlElement
     xmlElement = element
+    global customFunctionQnames
+    customFunctionQnames = []
     returnProg = None
 
     # throws ParseException
@@ -712,7 +729,22 @@ def parse(modelObject, xpathExpression, element, name, traceType):
                 source=normalizedExpr)
             exprStack.append( ProgHeader(modelObject,name,element,normalizedExpr,traceType) )
 
-            L = xpathExpr.parseString( normalizedExpr, parseAll=True )
+            progCache = getattr(modelXbrl.modelManager, "xpathProgCache", None)
+            progKey = progCache.key(normalizedExpr, element) if progCache is not None else None
+            cachedProg = progCache.get(progKey) if progKey is not None else None
+            if cachedProg is not None:
+                progSteps, customFunctionQnames = cachedProg
+                exprStack.extend(progSteps)
+                for customFunctionQname in customFunctionQnames:
+                    checkCustomFunctionSignature(customFunctionQname)
+            else:
+                global hasParseError
+                hasParseError = False
+                
+                L = xpathExpr.parseString( normalizedExpr, parseAll=True )
+                
+                if progKey is not None and not hasParseError: # (a ParseException isn't cached either)
+                    progCache.put(progKey, exprStack[1:], customFunctionQnames)
             
             #modelXbrl.error( _("AST {0} {1}").format(name, L),
             #    "info", "formula:trace")
@@ -756,6 +788,7 @@ def parse(modelObject, xpathExpression, element, name, traceType):
     exprStack = [] # dereference
     xmlElement = None
     modelXbrl = None
+    customFunctionQnames = []
     return returnProg
 
 def variableReferencesSet(exprStack, element):
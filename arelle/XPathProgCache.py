@@ -0,0 +1,166 @@
+'''
+Created on Oct 19, 2013
+
+Persistent cache of parsed XPath programs (of formula, filter, message, precondition and table
+linkbase expressions), so that loading the same formula linkbases again, in this or a later run,
+doesn't parse their expressions again with the (slow) pyparsing grammar.
+
+A program is keyed by its normalized expression text, the local name of the expression's element
+and the element's in-scope namespace bindings (which resolve the expression's QName prefixes).  Only
+programs parsed without errors are cached.  Function calls needing a custom function signature are
+checked again for each DTS using a cached program.
+
+The cache file (xpathProgs.cache in the user application directory) is discarded when it was written
+by another version of Arelle (or of python).  Each program is kept pickled, so it is unpickled into new
+objects for each expression using it.
+
+@author: Mark V Systems Limited
+(c) Copyright 2013 Mark V Systems Limited, All rights reserved.
+'''
+import os, sys, pickle
+try:
+    import copyreg
+except ImportError:
+    import copy_reg as copyreg
+from collections import OrderedDict
+from arelle import Version
+from arelle.XPathParser import ParseResults
+
+CACHE_VERSION = "{0} python {1[0]}.{1[1]} format 1".format(Version.version, sys.version_info)
+
+# pyparsing results (such as operation arguments) of programs are cached as lists
+copyreg.pickle(ParseResults, lambda parseResults: (list, (list(parseResults),)))
+
+class XPathProgCache:
+    """
+    .. class:: XPathProgCache(cntlr, maxEntries)
+
+    Persistent cache of parsed XPath programs, owned by the modelManager (as modelManager.xpathProgCache)
+    when enabled.  The cache file is read on first use and written (when changed) after formula compilation.
+
+    :param cntlr: The controller (the cache file is in its userAppDir)
+    :type cntlr: Cntlr
+    :param maxEntries: Maximum number of programs to keep (the least recently added are dropped)
+    :type maxEntries: int
+
+        .. attribute:: hits, misses
+
+        Counts of expressions whose program was found in the cache, and which were parsed
+    """
+    def __init__(self, cntlr, maxEntries=100000):
+        self.cacheFile = os.path.join(cntlr.userAppDir, "xpathProgs.cache")
+        self.maxEntries = maxEntries
+        self.progs = None # OrderedDict of pickled programs by key, when loaded
+        self.loadedTime = None # modification time of cache file when loaded
+        self.isModified = False
+        self.invalidated = False # cache file was discarded (written by another version)
+        self.hits = self.misses = 0
+
+    def load(self):
+        self.progs = OrderedDict()
+        self.loadedTime = None
+        progs = self.readCacheFile()
+        if progs is not None:
+            self.progs = progs
+
+    def readCacheFile(self):
+        """Pickled programs of the cache file, or None if it doesn't exist or is of another version"""
+        try:
+            with open(self.cacheFile, "rb") as fh:
+                version, progs = pickle.load(fh)
+            self.loadedTime = os.path.getmtime(self.cacheFile)
+        except (EnvironmentError, EOFError, ValueError, TypeError, AttributeError, ImportError,
+                pickle.UnpicklingError):
+            return None
+        if version != CACHE_VERSION:
+            self.invalidated = True
+            return None
+        return progs
+
+    def key(self, normalizedExpr, element):
+        """Key of an expression, or None if its element's namespace bindings aren't known"""
+        try:
+            return (normalizedExpr,
+                    element.localName,
+                    tuple(sorted((prefix or "", namespaceURI) for prefix, namespaceURI in element.nsmap.items())))
+        except AttributeError: # not an lxml element (such as the static function context)
+            return None
+
+    def get(self, key):
+        """Cached program for key.
+
+        :returns: ([program steps], [custom function QNames]) or None if not cached
+        """
+        if self.progs is None:
+            self.load()
+        pickledProg = self.progs.get(key)
+        if pickledProg is not None:
+            try:
+                prog = pickle.loads(pickledProg)
+                self.hits += 1
+                return prog
+            except (EOFError, ValueError, TypeError, AttributeError, ImportError, pickle.UnpicklingError):
+                del self.progs[key]
+        self.misses += 1
+        return None
+
+    def put(self, key, progSteps, customFunctionQnames):
+        """Caches the program steps (following the ProgHeader) of an expression parsed without errors"""
+        if self.progs is None:
+            self.load()
+        try:
+            self.progs[key] = pickle.dumps((progSteps, customFunctionQnames), pickle.HIGHEST_PROTOCOL)
+            self.isModified = True
+        except (pickle.PicklingError, TypeError, AttributeError, RuntimeError): # RuntimeError: recursion depth
+            pass # not picklable, it is parsed each time
+        while len(self.progs) > self.maxEntries:
+            self.progs.popitem(last=False)
+
+    def save(self):
+        """Writes the cache file if programs were added, merging programs added to it by other processes"""
+        if not self.isModified:
+            return
+        try:
+            if self.loadedTime is None or (os.path.exists(self.cacheFile) and
+                                           os.path.getmtime(self.cacheFile) != self.loadedTime):
+                otherProgs = self.readCacheFile()
+                if otherProgs:
+                    otherProgs.update(self.progs)
+                    self.progs = otherProgs
+                    while len(self.progs) > self.maxEntries:
+                        self.progs.popitem(last=False)
+            tempFile = "{0}.{1}".format(self.cacheFile, os.getpid())
+            with open(tempFile, "wb") as fh:
+                pickle.dump((CACHE_VERSION, self.progs), fh, pickle.HIGHEST_PROTOCOL)
+            if sys.platform == "win32" and os.path.exists(self.cacheFile):
+                os.remove(self.cacheFile) # rename can't replace on windows
+            os.rename(tempFile, self.cacheFile)
+            self.loadedTime = os.path.getmtime(self.cacheFile)
+            self.isModified = False
+        except EnvironmentError:
+            pass # cache is not saved (such as read-only userAppDir)
+
+    def clear(self):
+        self.progs = OrderedDict()
+        self.isModified = False
+        self.loadedTime = None
+        try:
+            os.remove(self.cacheFile)
+        except EnvironmentError:
+            pass
+
+    @property
+    def stats(self):
+        if self.progs is None:
+            self.load()
+        try:
+            fileSize = os.path.getsize(self.cacheFile)
+        except EnvironmentError:
+            fileSize = 0
+        return {"programs": len(self.progs),
+                "maxPrograms": self.maxEntries,
+                "fileSize": fileSize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidated": self.invalidated,
+                "cacheFile": self.cacheFile}
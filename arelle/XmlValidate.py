@@ -76,6 +76,7 @@ predefinedAttributeTypes = {
     qname("{http://www.w3.org/XML/1998/namespace}xml:space"):("NCName",{"enumeration":{"default","preserve"}})}
 
 xAttributesSharedEmptyDict = {}
+attrTagQnames = {} # qnames of attribute clark notation tags, shared by validations
 
 def validate(modelXbrl, elt, recurse=True, attrQname=None, ixFacts=False):
     global ModelInlineValueObject
@@ -83,6 +84,7 @@ def validate(modelXbrl, elt, recurse=True, attrQname=None, ixFacts=False):
         from arelle.ModelInstanceObject import ModelInlineValueObject
     isIxFact = isinstance(elt, ModelInlineValueObject)
     facets = None
+    validator = None
 
     # attrQname can be provided for attributes that are global and LAX
     if (not hasattr(elt,"xValid") or elt.xValid == UNVALIDATED) and (not isIxFact or ixFacts):
@@ -95,7 +97,7 @@ def validate(modelXbrl, elt, recurse=True, attrQname=None, ixFacts=False):
                 baseXsdType = "noContent"
             else:
                 baseXsdType = modelConcept.baseXsdType
-                facets = modelConcept.facets
+                validator = modelConcept.valueValidator # compiled for the concept's type and facets
         elif qnElt == XbrlConst.qnXbrldiExplicitMember: # not in DTS
             baseXsdType = "QName"
             type = None
@@ -134,7 +136,7 @@ def validate(modelXbrl, elt, recurse=True, attrQname=None, ixFacts=False):
                 elt.sValue = elt.xValue = text = INVALIDixVALUE
                 elt.xValid = INVALID
             if text is not INVALIDixVALUE:
-                validateValue(modelXbrl, elt, None, baseXsdType, text, isNillable, isNil, facets)
+                validateValue(modelXbrl, elt, None, baseXsdType, text, isNillable, isNil, validator=validator)
                 # note that elt.sValue and elt.xValue are not innerText but only text elements on specific element (or attribute)
             if type is not None:
                 definedAttributes = type.attributes
@@ -144,9 +146,13 @@ def validate(modelXbrl, elt, recurse=True, attrQname=None, ixFacts=False):
         # validate attributes
         # find missing attributes for default values
         for attrTag, attrValue in elt.items():
-            qn = qname(attrTag, noPrefixIsNoNamespace=True)
+            try:
+                qn = attrTagQnames[attrTag]
+            except KeyError:
+                qn = attrTagQnames[attrTag] = qname(attrTag, noPrefixIsNoNamespace=True)
             baseXsdAttrType = None
             facets = None
+            validator = None
             if attrQname is not None: # validate all attributes and element
                 if attrQname != qn:
                     continue
@@ -160,12 +166,14 @@ def validate(modelXbrl, elt, recurse=True, attrQname=None, ixFacts=False):
                     modelAttr = None
                 if modelAttr is not None:
                     baseXsdAttrType = modelAttr.baseXsdType
-                    facets = modelAttr.facets
+                    if baseXsdAttrType is not None: # else validated per fallbacks below
+                        validator = modelAttr.valueValidator
             if baseXsdAttrType is None: # look for global attribute definition
                 attrObject = modelXbrl.qnameAttributes.get(qn)
                 if attrObject is not None:
                     baseXsdAttrType = attrObject.baseXsdType
-                    facets = attrObject.facets
+                    if baseXsdAttrType is not None:
+                        validator = attrObject.valueValidator
                 elif attrTag == "{http://xbrl.org/2006/xbrldi}dimension": # some fallbacks?
                     baseXsdAttrType = "QName"
                 elif attrTag == "id":
@@ -179,7 +187,7 @@ def validate(modelXbrl, elt, recurse=True, attrQname=None, ixFacts=False):
                         baseXsdAttrType = "string"
                 elif qn in predefinedAttributeTypes:
                     baseXsdAttrType, facets = predefinedAttributeTypes[qn]
-            validateValue(modelXbrl, elt, attrTag, baseXsdAttrType, attrValue, facets=facets)
+            validateValue(modelXbrl, elt, attrTag, baseXsdAttrType, attrValue, facets=facets, validator=validator)
         # if no attributes assigned above, there won't be an xAttributes, if so assign a shared dict to save memory
         try:
             elt.xAttributes
@@ -214,7 +222,7 @@ def validate(modelXbrl, elt, recurse=True, attrQname=None, ixFacts=False):
                 # add default attribute values
                 for attrQname in (type.defaultAttributeQnames - presentAttributes):
                     modelAttr = type.attributes[attrQname]
-                    validateValue(modelXbrl, elt, attrQname.clarkNotation, modelAttr.baseXsdType, modelAttr.default, facets=modelAttr.facets)
+                    validateValue(modelXbrl, elt, attrQname.clarkNotation, modelAttr.baseXsdType, modelAttr.default, validator=modelAttr.valueValidator)
             if recurse:
                 global validateElementSequence, modelGroupCompositorTitle
                 if validateElementSequence is None:
@@ -246,215 +254,32 @@ def validate(modelXbrl, elt, recurse=True, attrQname=None, ixFacts=False):
             if isinstance(child, ModelObject):     
                 validate(modelXbrl, child, recurse, attrQname, ixFacts)
 
-def validateValue(modelXbrl, elt, attrTag, baseXsdType, value, isNillable=False, isNil=False, facets=None):
-    if baseXsdType:
-        try:
-            '''
-            if (len(value) == 0 and attrTag is None and not isNillable and 
-                baseXsdType not in ("anyType", "string", "normalizedString", "token", "NMTOKEN", "anyURI", "noContent")):
-                raise ValueError("missing value for not nillable element")
-            '''
-            xValid = VALID
-            whitespaceReplace = (baseXsdType == "normalizedString")
-            whitespaceCollapse = (not whitespaceReplace and baseXsdType != "string")
-            isList = baseXsdType in {"IDREFS", "ENTITIES", "NMTOKENS"}
-            if isList:
-                baseXsdType = baseXsdType[:-1] # remove plural
-            pattern = baseXsdTypePatterns.get(baseXsdType)
-            if facets:
-                if "pattern" in facets:
-                    pattern = facets["pattern"]
-                    # note multiple patterns are or'ed togetner, which isn't yet implemented!
-                if "whiteSpace" in facets:
-                    whitespaceReplace, whitespaceCollapse = {"preserve":(False,False), "replace":(True,False), "collapse":(False,True)}[facets["whiteSpace"]]
-            if whitespaceReplace:
-                value = normalizeWhitespacePattern.sub(' ', value)
-            elif whitespaceCollapse:
-                value = collapseWhitespacePattern.sub(' ', value.strip())
-            if baseXsdType == "noContent":
-                if len(value) > 0 and not value.isspace():
-                    raise ValueError("value content not permitted")
-                # note that sValue and xValue are not innerText but only text elements on specific element (or attribute)
-                xValue = sValue = None
-                xValid = VALID_NO_CONTENT # notify others that element may contain subelements (for stringValue needs)
-            elif not value and isNil and isNillable: # rest of types get None if nil/empty value
-                xValue = sValue = None
-            else:
-                if pattern is not None:
-                    if ((isList and any(pattern.match(v) is None for v in value.split())) or
-                        (not isList and pattern.match(value) is None)):
-                        raise ValueError("pattern facet " + facets["pattern"].pattern if facets and "pattern" in facets else "pattern mismatch")
-                if facets:
-                    if "enumeration" in facets and value not in facets["enumeration"]:
-                        raise ValueError("{0} is not in {1}".format(value, facets["enumeration"]))
-                    if "length" in facets and len(value) != facets["length"]:
-                        raise ValueError("length {0}, expected {1}".format(len(value), facets["length"]))
-                    if "minLength" in facets and len(value) < facets["minLength"]:
-                        raise ValueError("length {0}, minLength {1}".format(len(value), facets["minLength"]))
-                    if "maxLength" in facets and len(value) > facets["maxLength"]:
-                        raise ValueError("length {0}, maxLength {1}".format(len(value), facets["maxLength"]))
-                if baseXsdType in {"string", "normalizedString", "language", "token", "NMTOKEN","Name","NCName","IDREF","ENTITY"}:
-                    xValue = sValue = value
-                elif baseXsdType == "ID":
-                    xValue = sValue = value
-                    xValid = VALID_ID
-                elif baseXsdType == "anyURI":
-                    if value:  # allow empty strings to be valid anyURIs
-                        if UrlUtil.relativeUrlPattern.match(value) is None:
-                            raise ValueError("IETF RFC 2396 4.3 syntax")
-                    # encode PSVI xValue similarly to Xerces and other implementations
-                    xValue = anyURI(UrlUtil.anyUriQuoteForPSVI(value))
-                    sValue = value
-                elif baseXsdType in ("decimal", "float", "double"):
-                    sValue = float(value) # s-value uses Number (float) representation, tested before decimal is tested
-                    if baseXsdType == "decimal":
-                        xValue = Decimal(value)
-                    else:
-                        xValue = sValue
-                    if facets:
-                        if "totalDigits" in facets and len(value.replace(".","")) > facets["totalDigits"]:
-                            raise ValueError("totalDigits facet {0}".format(facets["totalDigits"]))
-                        if "fractionDigits" in facets and ( '.' in value and
-                            len(value[value.index('.') + 1:]) > facets["fractionDigits"]):
-                            raise ValueError("fraction digits facet {0}".format(facets["fractionDigits"]))
-                        if "maxInclusive" in facets and xValue > facets["maxInclusive"]:
-                            raise ValueError(" > maxInclusive {0}".format(facets["maxInclusive"]))
-                        if "maxExclusive" in facets and xValue >= facets["maxExclusive"]:
-                            raise ValueError(" >= maxInclusive {0}".format(facets["maxExclusive"]))
-                        if "minInclusive" in facets and xValue < facets["minInclusive"]:
-                            raise ValueError(" < minInclusive {0}".format(facets["minInclusive"]))
-                        if "minExclusive" in facets and xValue <= facets["minExclusive"]:
-                            raise ValueError(" <= minExclusive {0}".format(facets["minExclusive"]))
-                elif baseXsdType in {"integer",
-                                     "nonPositiveInteger","negativeInteger","nonNegativeInteger","positiveInteger",
-                                     "long","unsignedLong",
-                                     "int","unsignedInt",
-                                     "short","unsignedShort",
-                                     "byte","unsignedByte"}:
-                    xValue = sValue = _INT(value)
-                    if ((baseXsdType in {"nonNegativeInteger","unsignedLong","unsignedInt"} 
-                         and xValue < 0) or
-                        (baseXsdType == "nonPositiveInteger" and xValue > 0) or
-                        (baseXsdType == "positiveInteger" and xValue <= 0) or
-                        (baseXsdType == "byte" and not -128 <= xValue < 127) or
-                        (baseXsdType == "unsignedByte" and not 0 <= xValue < 255) or
-                        (baseXsdType == "short" and not -32768 <= xValue < 32767) or
-                        (baseXsdType == "unsignedShort" and not 0 <= xValue < 65535) or
-                        (baseXsdType == "positiveInteger" and xValue <= 0)):
-                        raise ValueError("{0} is not {1}".format(value, baseXsdType))
-                    if facets:
-                        if "totalDigits" in facets and len(value.replace(".","")) > facets["totalDigits"]:
-                            raise ValueError("totalDigits facet {0}".format(facets["totalDigits"]))
-                        if "fractionDigits" in facets and ( '.' in value and
-                            len(value[value.index('.') + 1:]) > facets["fractionDigits"]):
-                            raise ValueError("fraction digits facet {0}".format(facets["fractionDigits"]))
-                        if "maxInclusive" in facets and xValue > facets["maxInclusive"]:
-                            raise ValueError(" > maxInclusive {0}".format(facets["maxInclusive"]))
-                        if "maxExclusive" in facets and xValue >= facets["maxExclusive"]:
-                            raise ValueError(" >= maxInclusive {0}".format(facets["maxExclusive"]))
-                        if "minInclusive" in facets and xValue < facets["minInclusive"]:
-                            raise ValueError(" < minInclusive {0}".format(facets["minInclusive"]))
-                        if "minExclusive" in facets and xValue <= facets["minExclusive"]:
-                            raise ValueError(" <= minExclusive {0}".format(facets["minExclusive"]))
-                elif baseXsdType == "boolean":
-                    if value in ("true", "1"):  
-                        xValue = sValue = True
-                    elif value in ("false", "0"): 
-                        xValue = sValue = False
-                    else: raise ValueError
-                elif baseXsdType == "QName":
-                    xValue = qname(elt, value, castException=ValueError, prefixException=ValueError)
-                    sValue = value
-                    ''' not sure here, how are explicitDimensions validated, but bad units not?
-                    if xValue.namespaceURI in modelXbrl.namespaceDocs:
-                        if (xValue not in modelXbrl.qnameConcepts and 
-                            xValue not in modelXbrl.qnameTypes and
-                            xValue not in modelXbrl.qnameAttributes and
-                            xValue not in modelXbrl.qnameAttributeGroups):
-                            raise ValueError("qname not defined " + str(xValue))
-                    '''
-                elif baseXsdType in ("XBRLI_DECIMALSUNION", "XBRLI_PRECISIONUNION"):
-                    xValue = sValue = value if value == "INF" else _INT(value)
-                elif baseXsdType in ("XBRLI_NONZERODECIMAL"):
-                    xValue = sValue = _INT(value)
-                    if xValue == 0:
-                        raise ValueError("invalid value")
-                elif baseXsdType == "XBRLI_DATEUNION":
-                    xValue = dateTime(value, type=DATEUNION, castException=ValueError)
-                    sValue = value
-                elif baseXsdType == "dateTime":
-                    xValue = dateTime(value, type=DATETIME, castException=ValueError)
-                    sValue = value
-                elif baseXsdType == "date":
-                    xValue = dateTime(value, type=DATE, castException=ValueError)
-                    sValue = value
-                elif baseXsdType == "regex-pattern":
-                    # for facet compiling
-                    try:
-                        sValue = value
-                        if value in xmlSchemaPatterns:
-                            xValue = xmlSchemaPatterns[value]
-                        else:
-                            if r"\i" in value or r"\c" in value:
-                                value = value.replace(r"\i", iNameChar).replace(r"\c", cNameChar)
-                            xValue = re.compile(value + "$") # must match whole string
-                    except Exception as err:
-                        raise ValueError(err)
-                else:
-                    if baseXsdType in lexicalPatterns:
-                        match = lexicalPatterns[baseXsdType].match(value)
-                        if match is None:
-                            raise ValueError("lexical pattern mismatch")
-                        if baseXsdType == "gMonthDay":
-                            month, day, zSign, zHrMin, zHr, zMin = match.groups()
-                            if int(day) > {2:29, 4:30, 6:30, 9:30, 11:30, 1:31, 3:31, 5:31, 7:31, 8:31, 10:31, 12:31}[int(month)]:
-                                raise ValueError("invalid day {0} for month {1}".format(day, month))
-                            xValue = gMonthDay(month, day)
-                        elif baseXsdType == "gYearMonth":
-                            year, month, zSign, zHrMin, zHr, zMin = match.groups()
-                            xValue = gYearMonth(year, month)
-                        elif baseXsdType == "gYear":
-                            year, zSign, zHrMin, zHr, zMin = match.groups()
-                            xValue = gYear(year)
-                        elif baseXsdType == "gMonth":
-                            month, zSign, zHrMin, zHr, zMin = match.groups()
-                            xValue = gMonth(month)
-                        elif baseXsdType == "gDay":
-                            day, zSign, zHrMin, zHr, zMin = match.groups()
-                            xValue = gDay(day)
-                        else:
-                            xValue = value
-                    else: # no lexical pattern, forget compiling value
-                        xValue = value
-                    sValue = value
-        except (ValueError, InvalidOperation) as err:
-            if ModelInlineValueObject is not None and isinstance(elt, ModelInlineValueObject):
-                errElt = "{0} fact {1}".format(elt.elementQname, elt.qname)
-            else:
-                errElt = elt.elementQname
-            if attrTag:
-                modelXbrl.error("xmlSchema:valueError",
-                    _("Element %(element)s attribute %(attribute)s type %(typeName)s value error: %(value)s, %(error)s"),
-                    modelObject=elt,
-                    element=errElt,
-                    attribute=XmlUtil.clarkNotationToPrefixedName(elt,attrTag,isAttribute=True),
-                    typeName=baseXsdType,
-                    value=value,
-                    error=err)
-            else:
-                modelXbrl.error("xmlSchema:valueError",
-                    _("Element %(element)s type %(typeName)s value error: %(value)s, %(error)s"),
-                    modelObject=elt,
-                    element=errElt,
-                    typeName=baseXsdType,
-                    value=value,
-                    error=err)
-            xValue = None
-            sValue = value
-            xValid = INVALID
-    else:
-        xValue = sValue = None
-        xValid = UNKNOWN
+def validateValue(modelXbrl, elt, attrTag, baseXsdType, value, isNillable=False, isNil=False, facets=None, validator=None):
+    if validator is None: # not provided by the type definition (concept or attribute) of the value
+        validator = valueValidator(baseXsdType, facets)
+    value, xValid, xValue, sValue, err = validator(elt, value, isNil and isNillable)
+    if err is not None:
+        if ModelInlineValueObject is not None and isinstance(elt, ModelInlineValueObject):
+            errElt = "{0} fact {1}".format(elt.elementQname, elt.qname)
+        else:
+            errElt = elt.elementQname
+        if attrTag:
+            modelXbrl.error("xmlSchema:valueError",
+                _("Element %(element)s attribute %(attribute)s type %(typeName)s value error: %(value)s, %(error)s"),
+                modelObject=elt,
+                element=errElt,
+                attribute=XmlUtil.clarkNotationToPrefixedName(elt,attrTag,isAttribute=True),
+                typeName=baseXsdType,
+                value=value,
+                error=err)
+        else:
+            modelXbrl.error("xmlSchema:valueError",
+                _("Element %(element)s type %(typeName)s value error: %(value)s, %(error)s"),
+                modelObject=elt,
+                element=errElt,
+                typeName=baseXsdType,
+                value=value,
+                error=err)
     if attrTag:
         try:  # dynamically allocate attributes (otherwise given shared empty set)
             xAttributes = elt.xAttributes
@@ -466,6 +291,345 @@ def validateValue(modelXbrl, elt, attrTag, baseXsdType, value, isNillable=False,
         elt.xValue = xValue
         elt.sValue = sValue
 
+valueValidators = {} # compiled validators of types without facets, by baseXsdType
+facetsValueValidators = {} # (facets, compiled validator) of module-level facets (such as of ix attributes), by id of facets and baseXsdType
+
+def valueValidator(baseXsdType, facets=None):
+    """Returns the validator of values of baseXsdType (with facets), compiled on first use.
+    
+    Validators of types with facets are kept by their type definitions (valueValidator of
+    ModelConcept and ModelAttribute), those of types without facets, and of facets passed without
+    a type definition (such as of predefined or ix attributes, which are not created per use), by
+    this module.
+    
+    :param baseXsdType: Base xsd type localName (or XBRLI_ pseudo type), or None if unknown
+    :type baseXsdType: str
+    :param facets: Facets of the type definition, or None
+    :type facets: dict
+    :returns: function(elt, value, isNil) -- returning (value, xValid, xValue, sValue, error), where value
+        is after whitespace processing, isNil is True for a nil value of a nillable element, and error is
+        None if valid
+    """
+    if facets:
+        key = (id(facets), baseXsdType)
+        try:
+            return facetsValueValidators[key][1]
+        except KeyError:
+            validator = compileValueValidator(baseXsdType, facets)
+            facetsValueValidators[key] = (facets, validator) # facets kept so their id isn't reused
+            return validator
+    try:
+        return valueValidators[baseXsdType]
+    except KeyError:
+        validator = valueValidators[baseXsdType] = compileValueValidator(baseXsdType, None)
+        return validator
+
+def compileValueValidator(baseXsdType, facets):
+    if not baseXsdType:
+        def validator(elt, value, isNil):
+            return (value, UNKNOWN, None, None, None)
+        return validator
+    whitespaceReplace = (baseXsdType == "normalizedString")
+    whitespaceCollapse = (not whitespaceReplace and baseXsdType != "string")
+    isList = baseXsdType in {"IDREFS", "ENTITIES", "NMTOKENS"}
+    if isList:
+        baseXsdType = baseXsdType[:-1] # remove plural
+    pattern = baseXsdTypePatterns.get(baseXsdType)
+    patternError = "pattern mismatch"
+    if facets:
+        if "pattern" in facets:
+            pattern = facets["pattern"]
+            patternError = "pattern facet " + pattern.pattern
+            # note multiple patterns are or'ed togetner, which isn't yet implemented!
+        if "whiteSpace" in facets:
+            whitespaceReplace, whitespaceCollapse = {"preserve":(False,False), "replace":(True,False), "collapse":(False,True)}[facets["whiteSpace"]]
+    if whitespaceReplace:
+        normalize = lambda value: normalizeWhitespacePattern.sub(' ', value)
+    elif whitespaceCollapse:
+        normalize = lambda value: collapseWhitespacePattern.sub(' ', value.strip())
+    else:
+        normalize = None
+        
+    if baseXsdType == "noContent":
+        def validator(elt, value, isNil):
+            if normalize is not None:
+                value = normalize(value)
+            if len(value) > 0 and not value.isspace():
+                return (value, INVALID, None, value, ValueError("value content not permitted"))
+            # note that sValue and xValue are not innerText but only text elements on specific element (or attribute)
+            return (value, VALID_NO_CONTENT, None, None, None) # notify others that element may contain subelements (for stringValue needs)
+        return validator
+    
+    # checks of the (whitespace processed) value, before converting it
+    checks = []
+    if pattern is not None:
+        if isList:
+            def checkPattern(value):
+                if any(pattern.match(v) is None for v in value.split()):
+                    raise ValueError(patternError)
+        else:
+            def checkPattern(value):
+                if pattern.match(value) is None:
+                    raise ValueError(patternError)
+        checks.append(checkPattern)
+    if facets:
+        if "enumeration" in facets:
+            enumeration = facets["enumeration"]
+            def checkEnumeration(value):
+                if value not in enumeration:
+                    raise ValueError("{0} is not in {1}".format(value, enumeration))
+            checks.append(checkEnumeration)
+        if "length" in facets:
+            length = facets["length"]
+            def checkLength(value):
+                if len(value) != length:
+                    raise ValueError("length {0}, expected {1}".format(len(value), length))
+            checks.append(checkLength)
+        if "minLength" in facets:
+            minLength = facets["minLength"]
+            def checkMinLength(value):
+                if len(value) < minLength:
+                    raise ValueError("length {0}, minLength {1}".format(len(value), minLength))
+            checks.append(checkMinLength)
+        if "maxLength" in facets:
+            maxLength = facets["maxLength"]
+            def checkMaxLength(value):
+                if len(value) > maxLength:
+                    raise ValueError("length {0}, maxLength {1}".format(len(value), maxLength))
+            checks.append(checkMaxLength)
+    checks = tuple(checks)
+    
+    convert = valueConverter(baseXsdType)
+    
+    # checks of the converted value of numeric types
+    valueChecks = []
+    if facets and (baseXsdType in ("decimal", "float", "double") or baseXsdType in integerTypes):
+        if "totalDigits" in facets:
+            totalDigits = facets["totalDigits"]
+            def checkTotalDigits(value, xValue):
+                if len(value.replace(".","")) > totalDigits:
+                    raise ValueError("totalDigits facet {0}".format(totalDigits))
+            valueChecks.append(checkTotalDigits)
+        if "fractionDigits" in facets:
+            fractionDigits = facets["fractionDigits"]
+            def checkFractionDigits(value, xValue):
+                if '.' in value and len(value[value.index('.') + 1:]) > fractionDigits:
+                    raise ValueError("fraction digits facet {0}".format(fractionDigits))
+            valueChecks.append(checkFractionDigits)
+        if "maxInclusive" in facets:
+            maxInclusive = facets["maxInclusive"]
+            def checkMaxInclusive(value, xValue):
+                if xValue > maxInclusive:
+                    raise ValueError(" > maxInclusive {0}".format(maxInclusive))
+            valueChecks.append(checkMaxInclusive)
+        if "maxExclusive" in facets:
+            maxExclusive = facets["maxExclusive"]
+            def checkMaxExclusive(value, xValue):
+                if xValue >= maxExclusive:
+                    raise ValueError(" >= maxInclusive {0}".format(maxExclusive))
+            valueChecks.append(checkMaxExclusive)
+        if "minInclusive" in facets:
+            minInclusive = facets["minInclusive"]
+            def checkMinInclusive(value, xValue):
+                if xValue < minInclusive:
+                    raise ValueError(" < minInclusive {0}".format(minInclusive))
+            valueChecks.append(checkMinInclusive)
+        if "minExclusive" in facets:
+            minExclusive = facets["minExclusive"]
+            def checkMinExclusive(value, xValue):
+                if xValue <= minExclusive:
+                    raise ValueError(" <= minExclusive {0}".format(minExclusive))
+            valueChecks.append(checkMinExclusive)
+    valueChecks = tuple(valueChecks)
+    
+    def validator(elt, value, isNil):
+        if normalize is not None:
+            value = normalize(value)
+        if not value and isNil: # rest of types get None if nil/empty value
+            return (value, VALID, None, None, None)
+        try:
+            for check in checks:
+                check(value)
+            xValid, xValue, sValue = convert(elt, value)
+            for check in valueChecks:
+                check(value, xValue)
+        except (ValueError, InvalidOperation) as err:
+            return (value, INVALID, None, value, err)
+        return (value, xValid, xValue, sValue, None)
+    return validator
+
+# value converters, functions(elt, value) returning (xValid, xValue, sValue) or raising ValueError
+
+def convertString(elt, value):
+    return (VALID, value, value)
+
+def convertID(elt, value):
+    return (VALID_ID, value, value)
+
+def convertAnyURI(elt, value):
+    if value:  # allow empty strings to be valid anyURIs
+        if UrlUtil.relativeUrlPattern.match(value) is None:
+            raise ValueError("IETF RFC 2396 4.3 syntax")
+    # encode PSVI xValue similarly to Xerces and other implementations
+    return (VALID, anyURI(UrlUtil.anyUriQuoteForPSVI(value)), value)
+
+def convertDecimal(elt, value):
+    sValue = float(value) # s-value uses Number (float) representation, tested before decimal is tested
+    return (VALID, Decimal(value), sValue)
+
+def convertFloat(elt, value):
+    xValue = float(value)
+    return (VALID, xValue, xValue)
+
+def convertBoolean(elt, value):
+    if value in ("true", "1"):  
+        return (VALID, True, True)
+    elif value in ("false", "0"): 
+        return (VALID, False, False)
+    raise ValueError
+
+def convertQName(elt, value):
+    ''' not sure here, how are explicitDimensions validated, but bad units not?
+    if xValue.namespaceURI in modelXbrl.namespaceDocs:
+        if (xValue not in modelXbrl.qnameConcepts and 
+            xValue not in modelXbrl.qnameTypes and
+            xValue not in modelXbrl.qnameAttributes and
+            xValue not in modelXbrl.qnameAttributeGroups):
+            raise ValueError("qname not defined " + str(xValue))
+    '''
+    return (VALID, qname(elt, value, castException=ValueError, prefixException=ValueError), value)
+
+def convertDecimalsUnion(elt, value):
+    xValue = value if value == "INF" else _INT(value)
+    return (VALID, xValue, xValue)
+
+def convertNonzeroDecimal(elt, value):
+    xValue = _INT(value)
+    if xValue == 0:
+        raise ValueError("invalid value")
+    return (VALID, xValue, xValue)
+
+def convertDateUnion(elt, value):
+    return (VALID, dateTime(value, type=DATEUNION, castException=ValueError), value)
+
+def convertDateTime(elt, value):
+    return (VALID, dateTime(value, type=DATETIME, castException=ValueError), value)
+
+def convertDate(elt, value):
+    return (VALID, dateTime(value, type=DATE, castException=ValueError), value)
+
+def convertRegexPattern(elt, value):
+    # for facet compiling
+    try:
+        if value in xmlSchemaPatterns:
+            return (VALID, xmlSchemaPatterns[value], value)
+        pattern = value
+        if r"\i" in pattern or r"\c" in pattern:
+            pattern = pattern.replace(r"\i", iNameChar).replace(r"\c", cNameChar)
+        return (VALID, re.compile(pattern + "$"), value) # must match whole string
+    except Exception as err:
+        raise ValueError(err)
+
+def convertGMonthDay(elt, value):
+    match = lexicalPatterns["gMonthDay"].match(value)
+    if match is None:
+        raise ValueError("lexical pattern mismatch")
+    month, day, zSign, zHrMin, zHr, zMin = match.groups()
+    if int(day) > {2:29, 4:30, 6:30, 9:30, 11:30, 1:31, 3:31, 5:31, 7:31, 8:31, 10:31, 12:31}[int(month)]:
+        raise ValueError("invalid day {0} for month {1}".format(day, month))
+    return (VALID, gMonthDay(month, day), value)
+
+def convertGYearMonth(elt, value):
+    match = lexicalPatterns["gYearMonth"].match(value)
+    if match is None:
+        raise ValueError("lexical pattern mismatch")
+    year, month, zSign, zHrMin, zHr, zMin = match.groups()
+    return (VALID, gYearMonth(year, month), value)
+
+def convertGYear(elt, value):
+    match = lexicalPatterns["gYear"].match(value)
+    if match is None:
+        raise ValueError("lexical pattern mismatch")
+    year, zSign, zHrMin, zHr, zMin = match.groups()
+    return (VALID, gYear(year), value)
+
+def convertGMonth(elt, value):
+    match = lexicalPatterns["gMonth"].match(value)
+    if match is None:
+        raise ValueError("lexical pattern mismatch")
+    month, zSign, zHrMin, zHr, zMin = match.groups()
+    return (VALID, gMonth(month), value)
+
+def convertGDay(elt, value):
+    match = lexicalPatterns["gDay"].match(value)
+    if match is None:
+        raise ValueError("lexical pattern mismatch")
+    day, zSign, zHrMin, zHr, zMin = match.groups()
+    return (VALID, gDay(day), value)
+
+valueConverters = {
+    "string": convertString, "normalizedString": convertString, "language": convertString, "token": convertString,
+    "NMTOKEN": convertString, "Name": convertString, "NCName": convertString, "IDREF": convertString, "ENTITY": convertString,
+    "ID": convertID,
+    "anyURI": convertAnyURI,
+    "decimal": convertDecimal,
+    "float": convertFloat,
+    "double": convertFloat,
+    "boolean": convertBoolean,
+    "QName": convertQName,
+    "XBRLI_DECIMALSUNION": convertDecimalsUnion,
+    "XBRLI_PRECISIONUNION": convertDecimalsUnion,
+    "XBRLI_NONZERODECIMAL": convertNonzeroDecimal,
+    "XBRLI_DATEUNION": convertDateUnion,
+    "dateTime": convertDateTime,
+    "date": convertDate,
+    "regex-pattern": convertRegexPattern,
+    "gMonthDay": convertGMonthDay,
+    "gYearMonth": convertGYearMonth,
+    "gYear": convertGYear,
+    "gMonth": convertGMonth,
+    "gDay": convertGDay,
+    }
+
+# (minInclusive, maxExclusive) of integer types, None if unbounded
+integerTypes = {
+    "integer": (None, None),
+    "nonPositiveInteger": (None, 1),
+    "negativeInteger": (None, None),
+    "nonNegativeInteger": (0, None),
+    "positiveInteger": (1, None),
+    "long": (None, None),
+    "unsignedLong": (0, None),
+    "int": (None, None),
+    "unsignedInt": (0, None),
+    "short": (-32768, 32767),
+    "unsignedShort": (0, 65535),
+    "byte": (-128, 127),
+    "unsignedByte": (0, 255),
+    }
+
+def valueConverter(baseXsdType):
+    if baseXsdType in valueConverters:
+        return valueConverters[baseXsdType]
+    if baseXsdType in integerTypes:
+        minValue, maxValue = integerTypes[baseXsdType]
+        def convertInteger(elt, value):
+            xValue = _INT(value)
+            if (minValue is not None and xValue < minValue) or (maxValue is not None and xValue >= maxValue):
+                raise ValueError("{0} is not {1}".format(value, baseXsdType))
+            return (VALID, xValue, xValue)
+        return convertInteger
+    if baseXsdType in lexicalPatterns:
+        lexicalPattern = lexicalPatterns[baseXsdType]
+        def convertLexical(elt, value):
+            if lexicalPattern.match(value) is None:
+                raise ValueError("lexical pattern mismatch")
+            return (VALID, value, value)
+        return convertLexical
+    return convertString # no lexical pattern, forget compiling value
+
+whiteSpaceFacets = {"enumeration": {"replace","preserve","collapse"}}
+
 def validateFacet(typeElt, facetElt):
     facetName = facetElt.localName
     value = facetElt.get("value")
@@ -477,7 +641,7 @@ def validateFacet(typeElt, facetElt):
         facets = None
     elif facetName == "whiteSpace":
         baseXsdType = "string"
-        facets = {"enumeration": {"replace","preserve","collapse"}}
+        facets = whiteSpaceFacets
     elif facetName == "pattern":
         baseXsdType = "regex-pattern"
         facets = None
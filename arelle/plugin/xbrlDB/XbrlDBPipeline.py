@@ -0,0 +1,263 @@
+'''
+Pipelined storing of the filings of an RSS feed (such as for a backfill of EDGAR monthly feeds) into an XBRL database.
+
+Filings are loaded (and validated, per the command line options) by a number of worker processes, so that
+the CPU-bound parsing and validation of filings proceeds in parallel.  In each worker process the loaded
+filings are passed, by a bounded queue, to database writer threads, which store each filing, in its own
+transaction, using connections shared from a pool (kept open between filings), while the worker loads its
+next filing.  The queue holds at most one filing per writer, limiting the memory of loaded filings waiting
+to be stored.
+
+The outcome of each filing is appended to a progress ledger file (one JSON object per line), when
+requested, and filings already stored per the ledger are skipped, so that an interrupted backfill
+may be resumed by repeating its command.
+
+Worker processes are forked (as by CntlrBatch), and messages of their loading, validation and storing
+are forwarded to the log of the controller.
+
+(c) Copyright 2013 Mark V Systems Limited, California US, All rights reserved.
+Mark V copyright applies to this software, which is licensed according to the terms of Arelle(r).
+'''
+import os, sys, io, json, time, logging, multiprocessing, threading, traceback
+if sys.version[0] >= '3':
+    import queue
+else:
+    import Queue as queue
+from arelle.Locale import format_string
+
+RSSITEM_ATTRIBUTES = ("accessionNumber", "acceptanceDatetime", "filingDate", "cikNumber", "companyName",
+                      "assignedSic", "htmlUrl", "url", "zippedUrl", "formType")
+
+class RssItemValues():
+    """Values of an rss item, as needed for storing its filing, which (unlike the ModelRssItem) may be
+    sent to a worker process"""
+    def __init__(self, values):
+        for attribute, value in values.items():
+            setattr(self, attribute, value)
+
+class Ledger():
+    """Progress ledger, filings stored by prior runs are identified by accession number (or url)"""
+    def __init__(self, ledgerFile):
+        self.storedFilings = set()
+        if ledgerFile and os.path.exists(ledgerFile):
+            with io.open(ledgerFile, "rt", encoding="utf-8") as fh:
+                for line in fh:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue # incomplete line of an interrupted run
+                    if entry.get("status") == "stored":
+                        self.storedFilings.add(entry.get("filing"))
+        self.file = io.open(ledgerFile, "at", encoding="utf-8") if ledgerFile else None
+
+    def record(self, result):
+        if self.file is not None:
+            self.file.write(json.dumps(result, default=str) + "\n")
+            self.file.flush()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+def filingKey(rssItem):
+    return rssItem.accessionNumber or rssItem.zippedUrl
+
+def ingestRssFeed(cntlr, options, modelXbrl, insertIntoDB, dbArgs, validate, usesConnectionPool=False):
+    """Stores the filings of the RSS feed modelXbrl into the database, per options.storeToXbrlDbWorkers,
+    options.storeToXbrlDbWriters and options.storeToXbrlDbLedger.
+
+    :returns: bool -- True if all filings (not already stored per the ledger) were stored
+    """
+    startedAt = time.time()
+    ledger = Ledger(options.storeToXbrlDbLedger)
+    filings = []
+    for rssItem in modelXbrl.modelDocument.rssItems:
+        if filingKey(rssItem) not in ledger.storedFilings:
+            filings.append(dict((attribute, getattr(rssItem, attribute, None))
+                                for attribute in RSSITEM_ATTRIBUTES))
+    numSkipped = len(modelXbrl.modelDocument.rssItems) - len(filings)
+    if not filings:
+        cntlr.addToLog(_("All {0} filings of the feed have been stored, per ledger {1}").format(
+                       numSkipped, options.storeToXbrlDbLedger), messageCode="info", file=modelXbrl.uri)
+        ledger.close()
+        return True
+    numWorkers = min(options.storeToXbrlDbWorkers, len(filings))
+    numWriters = options.storeToXbrlDbWriters or 1
+    cntlr.addToLog(_("Storing {0} filings ({1} previously stored) by {2} workers with {3} database writers each").format(
+                   len(filings), numSkipped, numWorkers, numWriters), messageCode="info", file=modelXbrl.uri)
+    optionValues = dict((name, value) for name, value in vars(options).items() if not name.startswith("_"))
+    optionValues.update(entrypointFile=None, batchFile=None, storeToXbrlDb=None, validate=validate, keepOpen=True)
+    taskQueue = multiprocessing.Queue()
+    resultQueue = multiprocessing.Queue()
+    for filing in filings:
+        taskQueue.put(filing)
+    for i in range(numWorkers):
+        taskQueue.put(None) # end of filings
+    workers = [multiprocessing.Process(target=ingestionWorker,
+                                       args=(optionValues, insertIntoDB, dbArgs, usesConnectionPool, numWriters,
+                                             taskQueue, resultQueue))
+               for i in range(numWorkers)]
+    for worker in workers:
+        worker.daemon = True
+        worker.start()
+    numStored = numFailed = numFinishedWorkers = 0
+    try:
+        while numFinishedWorkers < numWorkers:
+            try:
+                result = resultQueue.get(timeout=10)
+            except queue.Empty:
+                if not any(worker.is_alive() for worker in workers):
+                    break # workers ended without reporting
+                continue
+            for entry in result.pop("log", ()):
+                level = logging.getLevelName(entry["level"].upper())
+                cntlr.addToLog(entry["text"], messageCode=entry["code"], file=entry["file"],
+                               level=level if isinstance(level, int) else logging.INFO)
+            if "filing" not in result: # worker finished
+                numFinishedWorkers += 1
+                continue
+            if result["status"] == "stored":
+                numStored += 1
+            else:
+                numFailed += 1
+            ledger.record(result)
+            cntlr.addToLog(_("Filing {0} {1} in {2:.2f} secs ({3} of {4} filings)").format(
+                           result["filing"], result["status"], result["time"], numStored + numFailed, len(filings)),
+                           messageCode="info", file=result["url"])
+    except KeyboardInterrupt:
+        for worker in workers:
+            worker.terminate()
+        raise
+    finally:
+        for worker in workers:
+            worker.join()
+        ledger.close()
+    elapsed = time.time() - startedAt
+    cntlr.addToLog(format_string(cntlr.modelManager.locale,
+                                 _("stored %s of %s filings (%s failed) to database in %.2f secs (%.2f filings per sec)"),
+                                 (numStored, len(filings), numFailed, elapsed, numStored / elapsed if elapsed else 0)),
+                   messageCode="info", file=modelXbrl.uri)
+    return numStored == len(filings)
+
+def ingestionWorker(optionValues, insertIntoDB, dbArgs, usesConnectionPool, numWriters, taskQueue, resultQueue):
+    from arelle import CntlrBatch
+    from arelle.Cntlr import LogFormatter
+    CntlrBatch.initWorker(optionValues) # controller (with plug-ins) kept for all filings of this worker
+    cntlr = CntlrBatch.cntlr
+    cntlr.logHandler.setFormatter(LogFormatter("%(message)s")) # messages are formatted by the controller's log
+    modelManager = cntlr.modelManager
+    if usesConnectionPool:
+        from .XbrlPublicPostgresDB import DBConnectionPool
+        connectionPool = DBConnectionPool(maxIdle=numWriters)
+        dbArgs = dict(dbArgs, connectionPool=connectionPool)
+    else:
+        connectionPool = None
+    logHandler = cntlr.logHandler
+    filingQueue = queue.Queue(maxsize=numWriters)
+    storedQueue = queue.Queue() # loaded filings (modelXbrls) to be closed when stored
+
+    def logEntries(thread=None):
+        # messages logged since prior call by the thread (loading and validating, or a writer), or by any thread
+        logHandler.acquire() # writers may be logging
+        try:
+            if thread is None:
+                logRecords = logHandler.logRecordBuffer
+                logHandler.logRecordBuffer = []
+            else:
+                logRecords = [logRec for logRec in logHandler.logRecordBuffer if logRec.thread == thread]
+                logHandler.logRecordBuffer = [logRec for logRec in logHandler.logRecordBuffer if logRec.thread != thread]
+        finally:
+            logHandler.release()
+        return [{"code": logRec.messageCode,
+                 "level": logRec.levelname.lower(),
+                 "file": logRec.refs[0].get("href", "") if logRec.refs else "",
+                 "text": logHandler.format(logRec)}
+                for logRec in logRecords]
+
+    def finishResult(result):
+        levels = [entry["level"] for entry in result["log"]]
+        result["errors"] = sum(1 for level in levels if "error" in level)
+        result["warnings"] = sum(1 for level in levels if "warning" in level or "inconsistency" in level)
+        resultQueue.put(result)
+
+    def closeStoredFilings():
+        # modelXbrls are closed by the worker (not the writers), as closing (of DtsCache entries) isn't thread safe
+        while True:
+            try:
+                storedModelXbrl = storedQueue.get_nowait()
+            except queue.Empty:
+                break
+            storedModelXbrl.close()
+
+    def dbWriter():
+        while True:
+            filing = filingQueue.get()
+            if filing is None:
+                break
+            modelXbrl, rssItem, result = filing
+            startedAt = time.time()
+            try:
+                insertIntoDB(modelXbrl, rssItem=rssItem, **dbArgs)
+                result["status"] = "stored"
+            except Exception as ex:
+                result["status"] = "failed"
+                result["error"] = "{0}: {1}".format(ex.__class__.__name__, ex)
+                modelXbrl.error("xpDB:exception",
+                                _("Storing filing %(filing)s failed: %(exception)s: %(error)s \n%(traceback)s"),
+                                modelObject=modelXbrl, filing=result["filing"], exception=ex.__class__.__name__,
+                                error=str(ex), traceback=traceback.format_tb(sys.exc_info()[2]))
+            result["storeTime"] = round(time.time() - startedAt, 3)
+            result["time"] = round(result["loadTime"] + result["storeTime"], 3)
+            result["log"].extend(logEntries(threading.current_thread().ident)) # messages of storing this filing
+            storedQueue.put(modelXbrl)
+            finishResult(result)
+
+    writers = [threading.Thread(target=dbWriter) for i in range(numWriters)]
+    for writer in writers:
+        writer.daemon = True
+        writer.start()
+    filingOptionValues = CntlrBatch.filingOptionValues
+    while True:
+        filing = taskQueue.get()
+        closeStoredFilings()
+        if filing is None:
+            break
+        rssItem = RssItemValues(filing)
+        result = {"filing": filingKey(rssItem),
+                  "url": rssItem.zippedUrl,
+                  "formType": rssItem.formType,
+                  "companyName": rssItem.companyName,
+                  "worker": os.getpid()}
+        startedAt = time.time()
+        try:
+            cntlr.run(CntlrBatch.Options(dict(filingOptionValues, entrypointFile=rssItem.zippedUrl)))
+        except Exception as err:
+            cntlr.addToLog(_("[Exception] Failed to load filing: \n{0} \n{1}").format(
+                        err,
+                        traceback.format_tb(sys.exc_info()[2])), file=rssItem.zippedUrl)
+        # the loaded filing (kept open) is handed to a writer, and no longer the modelManager's to use or close
+        modelXbrl = modelManager.modelXbrl
+        if modelXbrl is not None:
+            while modelXbrl in modelManager.loadedModelXbrls:
+                modelManager.loadedModelXbrls.remove(modelXbrl)
+            modelManager.modelXbrl = None
+        result["loadTime"] = round(time.time() - startedAt, 3)
+        result["log"] = logEntries(threading.current_thread().ident) # messages of loading and validating this filing
+        if modelXbrl is None or modelXbrl.modelDocument is None:
+            result["status"] = "failed"
+            result["error"] = _("filing not loaded")
+            result["time"] = result["loadTime"]
+            if modelXbrl is not None:
+                modelXbrl.close()
+            finishResult(result)
+        else:
+            filingQueue.put((modelXbrl, rssItem, result)) # waits while writers are busy with prior filings
+    for writer in writers:
+        filingQueue.put(None)
+    for writer in writers:
+        writer.join()
+    closeStoredFilings()
+    if connectionPool is not None:
+        connectionPool.close()
+    resultQueue.put({"worker": os.getpid(), "log": logEntries()})
@@ -39,11 +39,11 @@ windows
 
 '''
 
-import os, sys, io, re, time, datetime
+import os, sys, io, re, time, datetime, random
 from math import isnan, isinf
 from pg8000 import DBAPI
 from pg8000.errors import CursorClosedError, ConnectionClosedError, InterfaceError, ProgrammingError
-import socket
+import socket, threading
 from arelle.ModelDocument import Type
 from arelle.ModelDtsObject import ModelConcept, ModelResource
 from arelle.ModelValue import qname, dateTime
@@ -54,22 +54,48 @@ from arelle import UrlUtil, XbrlConst
 TRACESQLFILE = None
 #TRACESQLFILE = r"c:\temp\sqltrace.log"  # uncomment to trace SQL on connection (very big file!!!)
 
+# a filing's transaction which conflicts with that of a filing stored concurrently (inserting the same
+# uris, qnames, documents, etc., into uniquely indexed tables) is rolled back and retried, when the
+# other filing's rows are committed (and found as existing)
+RETRIED_SQLSTATES = {"23505": "unique_violation", "40P01": "deadlock_detected", "40001": "serialization_failure"}
+MAX_INSERT_ATTEMPTS = 5
+
 def insertIntoDB(modelXbrl, 
                  user=None, password=None, host=None, port=None, database=None, timeout=None,
-                 rssItem=None):
-    xpgdb = None
-    try:
-        xpgdb = XbrlPostgresDatabaseConnection(modelXbrl, user, password, host, port, database, timeout)
-        xpgdb.verifyTables()
-        xpgdb.insertXbrl(rssItem=rssItem)
-        xpgdb.close()
-    except Exception as ex:
-        if xpgdb is not None:
-            try:
-                xpgdb.close(rollback=True)
-            except Exception as ex2:
-                pass
-        raise # reraise original exception with original traceback    
+                 rssItem=None, connectionPool=None):
+    attempt = 0
+    while True:
+        attempt += 1
+        xpgdb = None
+        try:
+            xpgdb = XbrlPostgresDatabaseConnection(modelXbrl, user, password, host, port, database, timeout, connectionPool)
+            xpgdb.verifyTables()
+            xpgdb.insertXbrl(rssItem=rssItem)
+            xpgdb.close()
+            return
+        except Exception as ex:
+            if xpgdb is not None:
+                try:
+                    xpgdb.close(rollback=True)
+                except Exception as ex2:
+                    pass
+            code = sqlState(ex)
+            if code not in RETRIED_SQLSTATES or attempt >= MAX_INSERT_ATTEMPTS:
+                raise # reraise original exception with original traceback    
+            modelXbrl.info("xpgDB:retry",
+                           _("Storing %(filing)s conflicted with a filing stored concurrently (%(sqlState)s %(condition)s), retrying"),
+                           modelObject=modelXbrl, filing=modelXbrl.uri, sqlState=code, condition=RETRIED_SQLSTATES[code])
+            time.sleep(random.uniform(0.1, 1.0) * attempt) # let the other filing's transaction complete
+        
+def sqlState(ex):
+    # SQLSTATE of a pg8000 exception from the server (whose args are the server's severity, code and message,
+    # or, in later pg8000 versions, a dict of the server's message fields), else None
+    for arg in getattr(ex, "args", ()):
+        if isinstance(arg, dict):
+            return arg.get("C")
+        if isinstance(arg, _STR_BASE) and len(arg) == 5 and arg[:2].isdigit(): # (not severity, such as ERROR)
+            return arg
+    return None
     
 def isDBPort(host, port, timeout=10):
     # determine if postgres port
@@ -130,6 +156,25 @@ def dbNum(num):
 def dbStr(s):
     return "'" + str(s).replace("'","''").replace('%', '%%') + "'"
 
+def dbCopyText(col):
+    # column value in COPY text format
+    if col is None:
+        return "\\N"
+    elif isinstance(col, bool):
+        return 't' if col else 'f'
+    elif isinstance(col, (int,float)):
+        return str(col)
+    return str(col).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+def dbTypedRows(tableRows, colTypeFunction):
+    return tuple(tuple(None if colValue == "NULL" or colValue is None else
+                       colTypeFunction[i](colValue)  # convert to int, datetime, etc
+                       for i, colValue in enumerate(row))
+                 for row in tableRows)
+
+COPY_MIN_ROWS = 1000 # tables of at least this many rows are bulk loaded by COPY
+COPY_BATCH_SIZE = 4 * 1024 * 1024 # bytes of COPY data sent per batch
+
 class XPDBException(Exception):
     def __init__(self, code, message, **kwargs ):
         self.code = code
@@ -141,14 +186,58 @@ class XPDBException(Exception):
             
 
 
-class XbrlPostgresDatabaseConnection():
-    def __init__(self, modelXbrl, user, password, host, port, database, timeout):
-        self.modelXbrl = modelXbrl
-        self.disclosureSystem = modelXbrl.modelManager.disclosureSystem
-        self.conn = DBAPI.connect(user=user, password=password, host=host, 
+class DBConnectionPool():
+    # connections kept open between filings, for database writers (threads) storing many filings into the same
+    # database, each filing using a connection (in its own transaction) returned to the pool when stored
+    def __init__(self, maxIdle=4):
+        self.maxIdle = maxIdle
+        self.lock = threading.Lock()
+        self.idleConnections = {} # by connection parameters
+        self.verifiedDatabases = set() # tables verified (once per database)
+        
+    def connection(self, user, password, host, port, database, timeout):
+        key = (user, password, host, port, database, timeout)
+        with self.lock:
+            idleConnections = self.idleConnections.get(key)
+            if idleConnections:
+                return key, idleConnections.pop()
+        return key, DBAPI.connect(user=user, password=password, host=host, 
                                   port=int(port or 5432), 
                                   database=database, 
                                   socket_timeout=timeout or 60)
+        
+    def release(self, key, conn):
+        with self.lock:
+            idleConnections = self.idleConnections.setdefault(key, [])
+            if len(idleConnections) < self.maxIdle:
+                idleConnections.append(conn)
+                return
+        conn.close()
+        
+    def close(self):
+        with self.lock:
+            connections = [conn
+                           for idleConnections in self.idleConnections.values()
+                           for conn in idleConnections]
+            self.idleConnections.clear()
+        for conn in connections:
+            try:
+                conn.close()
+            except (InterfaceError, ConnectionClosedError, socket.error):
+                pass
+
+class XbrlPostgresDatabaseConnection():
+    def __init__(self, modelXbrl, user, password, host, port, database, timeout, connectionPool=None):
+        self.modelXbrl = modelXbrl
+        self.disclosureSystem = modelXbrl.modelManager.disclosureSystem
+        self.connectionPool = connectionPool
+        if connectionPool is not None:
+            self.connectionKey, self.conn = connectionPool.connection(user, password, host, port, database, timeout)
+        else:
+            self.conn = DBAPI.connect(user=user, password=password, host=host, 
+                                      port=int(port or 5432), 
+                                      database=database, 
+                                      socket_timeout=timeout or 60)
         self.tableColTypes = {}
         self.accessionId = "(None)"
                 
@@ -157,7 +246,10 @@ class XbrlPostgresDatabaseConnection():
             self.closeCursor()
             if rollback:
                 self.rollback()
-            self.conn.close()
+            if self.connectionPool is not None and not rollback: # (a failed connection may not be reusable)
+                self.connectionPool.release(self.connectionKey, self.conn)
+            else:
+                self.conn.close()
             self.__dict__.clear() # dereference everything
         except Exception as ex:
             self.__dict__.clear() # dereference everything
@@ -199,6 +291,9 @@ class XbrlPostgresDatabaseConnection():
             pass
         
     def verifyTables(self):
+        if self.connectionPool is not None:
+            if self.connectionKey[2:5] in self.connectionPool.verifiedDatabases:
+                return # verified by a prior filing
         missingTables = XBRLDBTABLES - self.tablesInDB()
         # if no tables, initialize database
         if missingTables == XBRLDBTABLES:
@@ -208,6 +303,8 @@ class XbrlPostgresDatabaseConnection():
             raise XPDBException("xpgDB:MissingTables",
                                 _("The following tables are missing: %(missingTableNames)s"),
                                 missingTableNames=', '.join(t for t in sorted(missingTables))) 
+        if self.connectionPool is not None:
+            self.connectionPool.verifiedDatabases.add(self.connectionKey[2:5])
             
     def execute(self, sql, commit=False, close=True, fetch=True):
         cursor = self.cursor
@@ -371,6 +468,9 @@ class XbrlPostgresDatabaseConnection():
             raise XPDBException("xpgDB:MissingColumnDefinition",
                                 _("Table %(table)s column definition missing: %(missingColumnName)s"),
                                 table=table, missingColumnName=str(err)) 
+        if len(data) >= COPY_MIN_ROWS:
+            return dbTypedRows(self.bulkLoad(table, newCols, matchCols, returningCols, data, commit, comparisonOperator, checkIfExisting),
+                               colTypeFunction)
         rowValues = []
         for row in data:
             colValues = []
@@ -429,10 +529,72 @@ WITH row_values (%(newCols)s) AS (
             with io.open(TRACESQLFILE, "a", encoding='utf-8') as fh:
                 fh.write("\n\n>>> accession {0} table {1} result row count {2}\n{3}\n"
                          .format(self.accessionId, table, len(tableRows), '\n'.join(str(r) for r in tableRows)))
-        return tuple(tuple(None if colValue == "NULL" or colValue is None else
-                           colTypeFunction[i](colValue)  # convert to int, datetime, etc
-                           for i, colValue in enumerate(row))
-                     for row in tableRows)
+        return dbTypedRows(tableRows, colTypeFunction)
+        
+    def bulkLoad(self, table, newCols, matchCols, returningCols, data, commit, comparisonOperator, checkIfExisting):
+        # rows are streamed by COPY, in batches of bounded size, into a temporary staging table, and inserted
+        # into table (and ids of new and existing rows returned) by a set-based statement, so that large tables,
+        # such as of facts, don't become giant SQL statements of row literals
+        startedAt = time.time()
+        stagingTable = "staging_" + table
+        # a staging table left by a failed bulk load on this (pooled) connection is dropped, and
+        # otherwise the staging table is dropped after loading or when its transaction commits
+        self.execute("DROP TABLE IF EXISTS pg_temp.%s;" % stagingTable, close=False, fetch=False)
+        self.execute("CREATE TEMPORARY TABLE %(stagingTable)s ON COMMIT DROP AS SELECT %(newCols)s FROM %(table)s WITH NO DATA;" %
+                     {"stagingTable": stagingTable, "table": table, "newCols": ', '.join(newCols)},
+                     close=False, fetch=False)
+        copySql = "COPY %s (%s) FROM STDIN" % (stagingTable, ', '.join(newCols))
+        copyData = io.BytesIO()
+        for i, row in enumerate(data):
+            copyData.write(('\t'.join(dbCopyText(col) for col in row) + '\n').encode('utf-8'))
+            if copyData.tell() >= COPY_BATCH_SIZE:
+                self.showStatus("bulk loading {0} ({1} of {2} rows)".format(table, i + 1, len(data)))
+                copyData.seek(0)
+                self.cursor.copy_from(copyData, query=copySql)
+                copyData = io.BytesIO()
+        if copyData.tell():
+            copyData.seek(0)
+            self.cursor.copy_from(copyData, query=copySql)
+        copyData = None
+        if checkIfExisting:
+            self.execute("ANALYZE %s;" % stagingTable, close=False, fetch=False) # for matching existing rows
+        sql = ('''
+WITH insertions AS (
+  INSERT INTO %(table)s (%(newCols)s)
+  SELECT %(newCols)s
+  FROM %(stagingTable)s v''' + ('''
+  WHERE NOT EXISTS (SELECT 1 
+                    FROM %(table)s x 
+                    WHERE %(match)s)''' if checkIfExisting else '') + '''
+  RETURNING %(returningCols)s
+)
+(''' + ('''
+   SELECT %(x_returningCols)s
+   FROM %(table)s x JOIN %(stagingTable)s v ON (%(match)s)
+) UNION ( ''' if checkIfExisting else '') + '''
+   SELECT %(returningCols)s
+   FROM insertions
+);''') %     {"table": table,
+             "stagingTable": stagingTable,
+             "newCols": ', '.join(newCols),
+             "returningCols": ', '.join(returningCols),
+             "x_returningCols": ', '.join('x.{0}'.format(c) for c in returningCols),
+             "match": ' AND '.join('x.{0} {1} v.{0}'.format(col, comparisonOperator) 
+                                for col in matchCols)
+             }
+        if TRACESQLFILE:
+            with io.open(TRACESQLFILE, "a", encoding='utf-8') as fh:
+                fh.write("\n\n>>> accession {0} table {1} bulk loaded row count {2}\n"
+                         .format(self.accessionId, table, len(data)))
+                fh.write(sql)
+        tableRows = self.execute(sql, close=False)
+        self.execute("DROP TABLE %s;" % stagingTable, commit=commit, close=False, fetch=False)
+        elapsed = time.time() - startedAt
+        self.modelXbrl.profileStat(_("XbrlPublicDB: bulk load {0}").format(table), elapsed)
+        self.modelXbrl.modelManager.addToLog(_("bulk loaded {0} rows into {1} in {2:.2f} secs, {3:.0f} rows/sec").format(
+                                             len(data), table, elapsed, len(data) / elapsed if elapsed else 0),
+                                             messageCode="info", file=self.modelXbrl.uri)
+        return tableRows
         
     def insertXbrl(self, rssItem):
         try:
@@ -14,6 +14,7 @@ and does not apply to the XBRL US Database schema and description.
 '''
 
 import time, os, io, sys, logging
+from arelle import Tracing
 from arelle.Locale import format_string
 from .XbrlPublicPostgresDB import insertIntoDB as insertIntoPostgresDB, isDBPort as isPostgresPort
 from .XbrlSemanticGraphDB import insertIntoDB as insertIntoRexsterDB, isDBPort as isRexsterPort
@@ -98,7 +99,7 @@ def xbrlDBmenuEntender(cntlr, menu):
     # add log handler
     logging.getLogger("arelle").addHandler(LogToDbHandler())    
     
-def storeIntoDB(dbConnection, modelXbrl, rssItem=None):
+def dbConnectionArgs(dbConnection):
     host = port = user = password = db = timeout = dbType = None
     if isinstance(dbConnection, (list, tuple)): # variable length list
         if len(dbConnection) > 0: host = dbConnection[0]
@@ -109,24 +110,45 @@ def storeIntoDB(dbConnection, modelXbrl, rssItem=None):
         if len(dbConnection) > 5 and dbConnection[5] and dbConnection[5].isdigit(): 
             timeout = int(dbConnection[5])
         if len(dbConnection) > 6: dbType = dbConnection[6]
+    return host, port, user, password, db, timeout, dbType
 
-    startedAt = time.time()
+def dbInsertMethod(modelXbrl, host, port, db, dbType):
     if dbType in dbTypes:
-        insertIntoDB = dbTypes[dbType]
+        return dbTypes[dbType]
     elif isPostgresPort(host, port):
-        insertIntoDB = insertIntoPostgresDB
+        return insertIntoPostgresDB
     elif isRexsterPort(host, port):
-        insertIntoDB = insertIntoRexsterDB
+        return insertIntoRexsterDB
     elif isRdfPort(host, port, db):
-        insertIntoDB = insertIntoRdfDB
-    else:
-        modelXbrl.modelManager.addToLog('Server at "{0}:{1}" is not recognized to be either a Postgres or a Rexter service.'.format(host, port))
+        return insertIntoRdfDB
+    modelXbrl.modelManager.addToLog('Server at "{0}:{1}" is not recognized to be either a Postgres or a Rexter service.'.format(host, port))
+    return None
+
+def storeIntoDB(dbConnection, modelXbrl, rssItem=None):
+    host, port, user, password, db, timeout, dbType = dbConnectionArgs(dbConnection)
+
+    startedAt = time.time()
+    insertIntoDB = dbInsertMethod(modelXbrl, host, port, db, dbType)
+    if insertIntoDB is None:
         return
-    insertIntoDB(modelXbrl, host=host, port=port, user=user, password=password, database=db, timeout=timeout, rssItem=rssItem)
+    with Tracing.span("storeIntoDB", "database", host=host, database=db, dbType=dbType or insertIntoDB.__module__.rpartition('.')[2]):
+        insertIntoDB(modelXbrl, host=host, port=port, user=user, password=password, database=db, timeout=timeout, rssItem=rssItem)
     modelXbrl.modelManager.addToLog(format_string(modelXbrl.modelManager.locale, 
                           _("stored to database in %.2f secs"), 
                           time.time() - startedAt), messageCode="info", file=modelXbrl.uri)
 
+def storeRssFeedIntoDB(cntlr, options, modelXbrl):
+    # filings of the feed loaded by worker processes and stored by their database writers
+    from .XbrlDBPipeline import ingestRssFeed
+    host, port, user, password, db, timeout, dbType = dbConnectionArgs(options.storeToXbrlDb.split(","))
+    insertIntoDB = dbInsertMethod(modelXbrl, host, port, db, dbType)
+    if insertIntoDB is None:
+        return
+    ingestRssFeed(cntlr, options, modelXbrl, insertIntoDB,
+                  dict(host=host, port=port, user=user, password=password, database=db, timeout=timeout),
+                  validate=modelXbrl.xbrlDBpipelineValidate,
+                  usesConnectionPool=insertIntoDB is insertIntoPostgresDB)
+
 def xbrlDBcommandLineOptionExtender(parser):
     # extend command line options to import sphinx files into DTS for validation
     parser.add_option("--store-to-XBRL-DB", 
@@ -135,19 +157,50 @@ def xbrlDBcommandLineOptionExtender(parser):
                       help=_("Store into XBRL DB.  "
                              "Provides connection string: host,port,user,password,database[,timeout[,{postgres|rexster|rdfDB}]]. "
                              "Autodetects database type unless 7th parameter is provided.  "))
+    parser.add_option("--store-to-XBRL-DB-workers", 
+                      action="store", 
+                      type="int",
+                      dest="storeToXbrlDbWorkers", 
+                      help=_("Store the filings of an RSS feed into XBRL DB by this number of worker processes, "
+                             "which load (and validate, if requested) filings in parallel, "
+                             "each passing its loaded filings to database writers.  "
+                             "The writers and ledger options apply only with this option."))
+    parser.add_option("--store-to-XBRL-DB-writers", 
+                      action="store", 
+                      type="int",
+                      dest="storeToXbrlDbWriters", 
+                      help=_("Number of database writers (threads, sharing pooled database connections) of each worker process "
+                             "storing RSS feed filings (default is 1)."))
+    parser.add_option("--store-to-XBRL-DB-ledger", 
+                      action="store", 
+                      dest="storeToXbrlDbLedger", 
+                      help=_("File recording the outcome of storing each RSS feed filing (one JSON object per line), "
+                             "filings already stored per this file are skipped, to resume an interrupted run."))
     
     logging.getLogger("arelle").addHandler(LogToDbHandler())    
 
 def xbrlDBCommandLineXbrlLoaded(cntlr, options, modelXbrl):
     from arelle.ModelDocument import Type
     if modelXbrl.modelDocument.type == Type.RSSFEED and getattr(options, "storeToXbrlDb", False):
-        modelXbrl.xbrlDBconnection = options.storeToXbrlDb.split(",")
+        if getattr(options, "storeToXbrlDbWorkers", None):
+            # filings are validated by the pipeline's workers, not one at a time by validation of the feed
+            modelXbrl.xbrlDBpipelineValidate = options.validate
+            modelXbrl.isRssItemsProcessedByPlugin = True
+        else:
+            if getattr(options, "storeToXbrlDbLedger", None) or getattr(options, "storeToXbrlDbWriters", None):
+                modelXbrl.warning("xpDB:options",
+                                  _("The --store-to-XBRL-DB-ledger and --store-to-XBRL-DB-writers options require --store-to-XBRL-DB-workers, "
+                                    "filings of the feed are stored one at a time without a ledger"),
+                                  modelXbrl=modelXbrl)
+            modelXbrl.xbrlDBconnection = options.storeToXbrlDb.split(",")
     
 def xbrlDBCommandLineXbrlRun(cntlr, options, modelXbrl):
     from arelle.ModelDocument import Type
     if modelXbrl.modelDocument.type != Type.RSSFEED and getattr(options, "storeToXbrlDb", False):
         dbConnection = options.storeToXbrlDb.split(",")
         storeIntoDB(dbConnection, modelXbrl)
+    elif hasattr(modelXbrl, "xbrlDBpipelineValidate"):
+        storeRssFeedIntoDB(cntlr, options, modelXbrl)
         
 def xbrlDBvalidateRssItem(val, modelXbrl, rssItem):
     if hasattr(val.modelXbrl, 'xbrlDBconnection'):
@@ -202,6 +255,8 @@ class LogToDbHandler(logging.Handler):
         return entries
     
     def emit(self, logRecord):
+        if hasattr(logRecord, "resolveArguments"): # resolve ModelXbrl message arguments while model objects are loaded
+            logRecord.resolveArguments()
         self.logRecordBuffer.append(logRecord)
         
  
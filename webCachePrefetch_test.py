@@ -0,0 +1,159 @@
+'''
+Created on Oct 28, 2013
+
+Tests of the web cache prefetcher (WebCache.WebCachePrefetcher), retrieving documents from a local http
+server, which serves each document after a delay, into a temporary web cache directory.
+
+$ py.test webCachePrefetch_test.py
+
+@author: Mark V Systems Limited
+(c) Copyright 2013 Mark V Systems Limited, All rights reserved.
+'''
+import os, threading, time
+
+try:
+    import pytest
+except ImportError:
+    print ('Please install pytest\neasy_install -U pytest')
+    exit()
+
+try:
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+    from socketserver import ThreadingMixIn
+except ImportError: # python 2
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+    from SocketServer import ThreadingMixIn
+
+from arelle import Cntlr
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+class DelayedRequestHandler(BaseHTTPRequestHandler):
+    """Serves a small xml document for any path, after the server's delay, recording requests"""
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append(self.path)
+            server.active += 1
+            server.maxActive = max(server.maxActive, server.active)
+        try:
+            time.sleep(server.delay)
+            content = '<?xml version="1.0"?>\n<doc path="{0}"/>\n'.format(self.path).encode('utf-8')
+            self.send_response(200)
+            self.send_header("Content-Type", "text/xml")
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture(scope="module")
+def httpServer():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), DelayedRequestHandler)
+    server.lock = threading.Lock()
+    serverThread = threading.Thread(target=server.serve_forever)
+    serverThread.daemon = True
+    serverThread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def server(httpServer):
+    httpServer.requests = []
+    httpServer.active = httpServer.maxActive = 0
+    httpServer.delay = 0.2
+    return httpServer
+
+@pytest.fixture
+def webCache(tmpdir):
+    cntlr = Cntlr.Cntlr(logFileName="logToBuffer")
+    webCache = cntlr.webCache
+    webCache.cacheDir = str(tmpdir.mkdir("cache"))
+    webCache.workOffline = False
+    yield webCache
+    if webCache._prefetcher is not None:
+        webCache._prefetcher.shutdown()
+
+def urls(server, name, number):
+    return ["http://127.0.0.1:{0}/{1}{2}.xml".format(server.server_address[1], name, i) for i in range(number)]
+
+def test_parallel_prefetch(server, webCache):
+    """Queued documents are retrieved concurrently, up to the number of workers per host"""
+    webCache.prefetchWorkers = 8
+    webCache.prefetchWorkersPerHost = 4
+    prefetcher = webCache.prefetcher
+    prefetchUrls = urls(server, "parallel", 12)
+    startedAt = time.time()
+    for url in prefetchUrls:
+        prefetcher.prefetch(url)
+    for url in prefetchUrls:
+        prefetcher.wait(url)
+    elapsed = time.time() - startedAt
+    assert 1 < server.maxActive <= 4
+    assert elapsed < len(prefetchUrls) * server.delay / 2
+    assert all(os.path.exists(webCache.urlToCacheFilepath(url)) for url in prefetchUrls)
+    # prefetched documents are found in the cache, without requesting them again
+    for url in prefetchUrls:
+        assert webCache.getfilename(url) == webCache.urlToCacheFilepath(url)
+    assert sorted(server.requests) == sorted(url.partition(str(server.server_address[1]))[2] for url in prefetchUrls)
+
+def test_demanded_url_still_queued(server, webCache):
+    """A document demanded while still queued is taken from the queue and retrieved by its caller
+    without waiting for the retrievals queued ahead of it, and isn't retrieved again by a worker"""
+    server.delay = 0.5
+    webCache.prefetchWorkers = 2
+    webCache.prefetchWorkersPerHost = 2
+    prefetcher = webCache.prefetcher
+    prefetchUrls = urls(server, "queued", 10)
+    for url in prefetchUrls:
+        prefetcher.prefetch(url)
+    demandedUrl = prefetchUrls[-1]
+    startedAt = time.time()
+    prefetcher.wait(demandedUrl) # still queued, doesn't wait
+    assert time.time() - startedAt < server.delay
+    assert webCache.getfilename(demandedUrl) == webCache.urlToCacheFilepath(demandedUrl)
+    assert time.time() - startedAt < 3 * server.delay
+    for url in prefetchUrls:
+        prefetcher.wait(url)
+    demandedPath = demandedUrl.partition(str(server.server_address[1]))[2]
+    assert server.requests.count(demandedPath) == 1
+    assert len(server.requests) == len(prefetchUrls)
+
+def test_replaced_prefetcher_shutdown(server, webCache):
+    """A prefetcher replaced (on changing the number of workers) is shut down: its waiters of queued
+    documents proceed, it accepts no more documents, and its worker threads end"""
+    webCache.prefetchWorkers = 4
+    webCache.prefetchWorkersPerHost = 4
+    priorPrefetcher = webCache.prefetcher
+    prefetchUrls = urls(server, "replaced", 20)
+    for url in prefetchUrls:
+        priorPrefetcher.prefetch(url)
+    priorWorkers = list(priorPrefetcher.workers)
+    assert len(priorWorkers) == 4
+    webCache.prefetchWorkers = 2
+    prefetcher = webCache.prefetcher
+    assert prefetcher is not priorPrefetcher
+    assert priorPrefetcher.isShutdown
+    startedAt = time.time()
+    for url in prefetchUrls: # waiters of queued urls proceed, those being retrieved complete
+        priorPrefetcher.wait(url)
+    assert time.time() - startedAt < 2 * server.delay
+    priorPrefetcher.prefetch(urls(server, "afterShutdown", 1)[0])
+    assert len(priorPrefetcher.workers) == 4
+    for worker in priorWorkers:
+        worker.join(5)
+        assert not worker.is_alive()
+    # the new prefetcher retrieves documents
+    newUrls = urls(server, "new", 4)
+    for url in newUrls:
+        prefetcher.prefetch(url)
+    for url in newUrls:
+        prefetcher.wait(url)
+    assert all(os.path.exists(webCache.urlToCacheFilepath(url)) for url in newUrls)
+    assert len(server.requests) < len(prefetchUrls) + len(newUrls)
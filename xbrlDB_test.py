@@ -0,0 +1,197 @@
+'''
+Created on Oct 25, 2013
+
+Tests of storing filings into the XBRL Public Postgres database (plug-in xbrlDB), which run when a local
+PostgreSQL database is reachable, per environment variable XBRLDB_TEST_CONNECTION (host,port,user,password,database),
+and are otherwise skipped.  The database is initialized (by the plug-in's DDL) if it has no tables, e.g.:
+
+$ XBRLDB_TEST_CONNECTION=localhost,5432,postgres,secret,xbrldbtest py.test xbrlDB_test.py
+
+@author: Mark V Systems Limited
+(c) Copyright 2013 Mark V Systems Limited, All rights reserved.
+'''
+import os, threading, datetime
+
+try:
+    import pytest
+except ImportError:
+    print ('Please install pytest\neasy_install -U pytest')
+    exit()
+
+pg8000 = pytest.importorskip("pg8000")
+
+from arelle import Cntlr, ModelXbrl
+
+SCHEMA = '''<?xml version="1.0" encoding="utf-8"?>
+<schema xmlns="http://www.w3.org/2001/XMLSchema" xmlns:xbrli="http://www.xbrl.org/2003/instance"
+    targetNamespace="http://example.com/xbrlDBtest" elementFormDefault="qualified">
+  <import namespace="http://www.xbrl.org/2003/instance" schemaLocation="http://www.xbrl.org/2003/xbrl-instance-2003-12-31.xsd"/>
+{0}
+</schema>
+'''
+CONCEPT = '''  <element name="Item{0}" id="t_Item{0}" type="xbrli:monetaryItemType" substitutionGroup="xbrli:item"
+      xbrli:periodType="instant" nillable="true"/>'''
+INSTANCE = '''<?xml version="1.0" encoding="utf-8"?>
+<xbrli:xbrl xmlns:xbrli="http://www.xbrl.org/2003/instance" xmlns:link="http://www.xbrl.org/2003/linkbase"
+    xmlns:xlink="http://www.w3.org/1999/xlink" xmlns:iso4217="http://www.xbrl.org/2003/iso4217"
+    xmlns:t="http://example.com/xbrlDBtest">
+  <link:schemaRef xlink:type="simple" xlink:href="test.xsd"/>
+  <xbrli:context id="c">
+    <xbrli:entity><xbrli:identifier scheme="http://www.sec.gov/CIK">{0}</xbrli:identifier></xbrli:entity>
+    <xbrli:period><xbrli:instant>2013-09-30</xbrli:instant></xbrli:period>
+  </xbrli:context>
+  <xbrli:unit id="u"><xbrli:measure>iso4217:USD</xbrli:measure></xbrli:unit>
+{1}
+</xbrli:xbrl>
+'''
+FACT = '''  <t:Item{0} contextRef="c" unitRef="u" decimals="0">{1}</t:Item{0}>'''
+
+class RssItem():
+    """Values of an rss item needed for storing its filing"""
+    def __init__(self, accessionNumber, cik):
+        self.accessionNumber = accessionNumber
+        self.acceptanceDatetime = datetime.datetime(2013, 10, 25, 10, 0, 0)
+        self.filingDate = datetime.date(2013, 10, 25)
+        self.cikNumber = cik
+        self.companyName = "Test Co {0}".format(cik)
+        self.assignedSic = 0
+        self.htmlUrl = self.url = "http://example.com/{0}/".format(accessionNumber)
+
+@pytest.fixture(scope="module")
+def dbConnection():
+    connection = os.environ.get("XBRLDB_TEST_CONNECTION")
+    if not connection:
+        pytest.skip("XBRLDB_TEST_CONNECTION (host,port,user,password,database) of a local PostgreSQL is not set")
+    host, port, user, password, database = (connection.split(",") + [None] * 5)[:5]
+    try:
+        conn = pg8000.DBAPI.connect(host=host, port=int(port or 5432), user=user, password=password, database=database)
+    except Exception as err:
+        pytest.skip("PostgreSQL {0} is not reachable: {1}".format(connection, err))
+    conn.close()
+    return dict(host=host, port=port, user=user, password=password, database=database)
+
+@pytest.fixture(scope="module")
+def cntlr():
+    cntlr = Cntlr.Cntlr(logFileName="logToBuffer")
+    cntlr.webCache.workOffline = True # xbrl schemas are in the arelle resources
+    return cntlr
+
+def dbRows(dbConnection, sql):
+    conn = pg8000.DBAPI.connect(host=dbConnection["host"], port=int(dbConnection["port"] or 5432),
+                                user=dbConnection["user"], password=dbConnection["password"],
+                                database=dbConnection["database"])
+    try:
+        cursor = conn.cursor()
+        cursor.execute(sql)
+        return cursor.fetchall()
+    finally:
+        conn.close()
+
+def test_overlapping_filings_stored_concurrently(tmpdir, cntlr, dbConnection):
+    """Filings of a shared DTS (new to the database) stored concurrently, each in its own transaction, which
+    insert the same uris, qnames, documents and elements, are all stored (conflicting transactions are retried)"""
+    from arelle.plugin.xbrlDB.XbrlPublicPostgresDB import insertIntoDB
+    runId = datetime.datetime.now().strftime("%Y%m%d%H%M%S%f")
+    numFilings = 6
+    testDir = tmpdir.mkdir("overlap" + runId)
+    # a new namespace for each run, so that its rows aren't already in the database
+    testDir.join("test.xsd").write(SCHEMA.replace("xbrlDBtest", "xbrlDBtest/" + runId).format(
+                                   "\n".join(CONCEPT.format(i) for i in range(200))))
+    modelXbrls = []
+    for i in range(numFilings):
+        instanceFile = testDir.join("inst{0}.xml".format(i))
+        instanceFile.write(INSTANCE.replace("xbrlDBtest", "xbrlDBtest/" + runId).format(
+                           9000 + i, "\n".join(FACT.format(j, 1000 * i + j) for j in range(200))))
+        modelXbrl = ModelXbrl.load(cntlr.modelManager, str(instanceFile))
+        assert modelXbrl.modelDocument is not None
+        modelXbrls.append(modelXbrl)
+    accessionNumbers = ["{0}-{1}".format(runId, i) for i in range(numFilings)]
+    errors = []
+    def store(modelXbrl, accessionNumber, cik):
+        try:
+            insertIntoDB(modelXbrl, rssItem=RssItem(accessionNumber, cik), **dbConnection)
+        except Exception as err:
+            errors.append(err)
+    storers = [threading.Thread(target=store, args=(modelXbrl, accessionNumber, 9000 + i))
+               for i, (modelXbrl, accessionNumber) in enumerate(zip(modelXbrls, accessionNumbers))]
+    for storer in storers:
+        storer.start()
+    for storer in storers:
+        storer.join()
+    for modelXbrl in modelXbrls:
+        modelXbrl.close()
+    assert errors == []
+    storedAccessions = dbRows(dbConnection,
+                              "SELECT filing_accession_number FROM accession WHERE filing_accession_number LIKE '{0}-%'"
+                              .format(runId))
+    assert sorted(row[0] for row in storedAccessions) == sorted(accessionNumbers)
+    # shared rows are stored once
+    assert dbRows(dbConnection,
+                  "SELECT count(*) FROM qname WHERE namespace = 'http://example.com/xbrlDBtest/{0}'".format(runId)
+                  )[0][0] == 200
+
+def stagingTables(db):
+    # temporary staging tables of this database connection's session
+    return db.execute("SELECT c.relname FROM pg_class c "
+                      "WHERE c.relnamespace = pg_my_temp_schema() AND c.relname LIKE 'staging_%%';",
+                      close=False)
+
+def test_bulk_load_staging_table(tmpdir, cntlr, dbConnection):
+    """Tables of at least COPY_MIN_ROWS rows are copied into a staging_<table> and inserted from it, returning ids
+    of new and existing rows, and a failed bulk load leaves no staging table on its (pooled) connection"""
+    from arelle.plugin.xbrlDB.XbrlPublicPostgresDB import XbrlPostgresDatabaseConnection, DBConnectionPool, COPY_MIN_ROWS
+    runId = datetime.datetime.now().strftime("%Y%m%d%H%M%S%f")
+    testDir = tmpdir.mkdir("bulk" + runId)
+    testDir.join("test.xsd").write(SCHEMA.format(CONCEPT.format(0)))
+    instanceFile = testDir.join("inst.xml")
+    instanceFile.write(INSTANCE.format(9000, FACT.format(0, 1)))
+    modelXbrl = ModelXbrl.load(cntlr.modelManager, str(instanceFile))
+    connectionPool = DBConnectionPool()
+    db = XbrlPostgresDatabaseConnection(modelXbrl, timeout=None, connectionPool=connectionPool, **dbConnection)
+    try:
+        db.verifyTables()
+        uris = ["http://example.com/{0}/uri{1}".format(runId, i) for i in range(2 * COPY_MIN_ROWS)]
+        # COPY into staging_uri and INSERT ... SELECT of new rows, returning their ids
+        firstIds = dict((uri, uriId)
+                        for uriId, uri in db.getTable('uri', 'uri_id', ('uri',), ('uri',),
+                                                      tuple((uri,) for uri in uris[:COPY_MIN_ROWS]),
+                                                      checkIfExisting=True))
+        assert sorted(firstIds.keys()) == sorted(uris[:COPY_MIN_ROWS])
+        assert len(set(firstIds.values())) == COPY_MIN_ROWS
+        assert stagingTables(db) == ()
+        db.commit()
+        # ids of existing rows are returned along with ids of the newly inserted rows
+        secondIds = dict((uri, uriId)
+                         for uriId, uri in db.getTable('uri', 'uri_id', ('uri',), ('uri',),
+                                                       tuple((uri,) for uri in uris),
+                                                       checkIfExisting=True))
+        assert sorted(secondIds.keys()) == sorted(uris)
+        assert all(secondIds[uri] == uriId for uri, uriId in firstIds.items())
+        assert len(set(secondIds.values())) == len(uris)
+        db.commit()
+        # a failed bulk load (uri column value too long), rolled back, leaves no staging table
+        failedUris = ["http://example.com/{0}/failed{1}".format(runId, i) for i in range(COPY_MIN_ROWS)]
+        with pytest.raises(Exception):
+            db.getTable('uri', 'uri_id', ('uri',), ('uri',),
+                        tuple((uri,) for uri in failedUris + ["http://example.com/" + "x" * 2048]),
+                        checkIfExisting=True)
+        db.rollback()
+        db.closeCursor()
+        conn = db.conn
+        db.close() # returns the connection to the pool
+        db = XbrlPostgresDatabaseConnection(modelXbrl, timeout=None, connectionPool=connectionPool, **dbConnection)
+        assert db.conn is conn
+        assert stagingTables(db) == ()
+        assert db.execute("SELECT count(*) FROM uri WHERE uri LIKE 'http://example.com/{0}/failed%%';".format(runId),
+                          close=False)[0][0] == 0
+        # a bulk load on the reused connection succeeds
+        assert len(db.getTable('uri', 'uri_id', ('uri',), ('uri',),
+                               tuple((uri,) for uri in failedUris),
+                               checkIfExisting=True)) == COPY_MIN_ROWS
+        assert stagingTables(db) == ()
+        db.commit()
+    finally:
+        if not db.isClosed:
+            db.close(rollback=True)
+        connectionPool.close()
+        modelXbrl.close()